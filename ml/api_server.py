@@ -3,54 +3,54 @@ Focus Detection API Server
 Runs on port 5001, provides inference endpoint for the web app.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import torch
 import numpy as np
-import base64
-from io import BytesIO
-from PIL import Image
 import sys
 import os
+import time
 
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from ml.model import get_model
-from ml.config import MODEL_PATH, CLASS_NAMES
+from ml.preprocessing import decode_base64, decode_image_bytes
+from ml.serving import STAGES, batch_pixels, predict_pixels, format_prediction, format_batch, health
+from ml import metrics, serving
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
 
-# Load model once at startup
-print("Loading focus detection model...")
-try:
-    model = get_model(pretrained_path=str(MODEL_PATH))
-    model.eval()
-    print(f"Model loaded successfully from {MODEL_PATH}")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
-
-
-def preprocess_image(image_data):
-    """Convert base64 image to model input tensor."""
-    # Decode base64
-    image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-    image = Image.open(BytesIO(image_bytes))
-    
-    # Convert to grayscale
-    image = image.convert('L')
-    
-    # Resize to 48x48
-    image = image.resize((48, 48))
-    
-    # Convert to numpy and normalize
-    img_array = np.array(image, dtype=np.float32) / 255.0
-    
-    # Add batch and channel dimensions [1, 1, 48, 48]
-    tensor = torch.from_numpy(img_array).unsqueeze(0).unsqueeze(0)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unknown'
+    metrics.REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    if response.status_code >= 400:
+        metrics.ERRORS.inc(endpoint=endpoint)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+
+@app.teardown_request
+def finish_request(exc):
+    # Runs even when a handler raises, so the gauge never leaks
+    if 'request_start' in g:
+        metrics.IN_FLIGHT.dec()
+
+
+def preprocess_batch(req):
+    """Decode a binary batch request to uint8 pixels [N, 48, 48] (see decode_frames)."""
+    frame_format = req.args.get('format', 'image')
     
-    return tensor
+    if req.files:
+        parts = [part.read() for key in req.files for part in req.files.getlist(key)]
+        return batch_pixels(frame_format, parts=parts)
+    return batch_pixels(frame_format, body=req.get_data(cache=False))
 
 
 @app.route('/api/focus/check', methods=['POST'])
@@ -60,48 +60,96 @@ def check_focus():
     Expects: { "image": "base64_encoded_image" }
     Returns: { "prediction": "focused"|"distracted", "confidence": 0.0-1.0 }
     """
-    if model is None:
-        return jsonify({'error': 'Model not loaded'}), 500
+    if serving.batcher is None:
+        body, status = serving.unavailable()
+        return jsonify(body), status
     
     try:
         data = request.get_json()
         if not data or 'image' not in data:
             return jsonify({'error': 'No image provided'}), 400
         
-        # Preprocess image
-        tensor = preprocess_image(data['image'])
+        # Decode base64
+        with STAGES['decode'].time():
+            image_bytes = decode_base64(data['image'])
+        
+        # Decode image to 48x48 grayscale pixels [1, 48, 48]
+        with STAGES['preprocess'].time():
+            pixels = decode_image_bytes(image_bytes)[np.newaxis]
+        
+        # Run inference (cached for repeated frames, batched with other in-flight requests)
+        with STAGES['inference'].time():
+            probabilities = predict_pixels(pixels)
         
-        # Run inference
-        with torch.no_grad():
-            output = model(tensor)
-            probabilities = torch.softmax(output, dim=1)
-            
-            focused_prob = probabilities[0][0].item()
-            distracted_prob = probabilities[0][1].item()
-            
-            prediction = 'focused' if focused_prob > distracted_prob else 'distracted'
-            confidence = max(focused_prob, distracted_prob)
+        with STAGES['serialize'].time():
+            response = jsonify(format_prediction(probabilities[0]))
         
-        return jsonify({
-            'prediction': prediction,
-            'confidence': round(confidence, 3),
-            'focused_prob': round(focused_prob, 3),
-            'distracted_prob': round(distracted_prob, 3),
-        })
+        return response
         
     except Exception as e:
         print(f"Error during inference: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/focus/check/batch', methods=['POST'])
+def check_focus_batch():
+    """
+    Endpoint to check focus level for many frames in one binary request.
+    Expects: multipart file parts or a raw body (see preprocessing.decode_frames)
+    Returns: { "classes": ["focused", "distracted"], "probs": [[p_focused, p_distracted], ...] }
+    """
+    if serving.batcher is None:
+        body, status = serving.unavailable()
+        return jsonify(body), status
+    
+    try:
+        with STAGES['preprocess'].time():
+            pixels = preprocess_batch(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        with STAGES['inference'].time():
+            probabilities = predict_pixels(pixels)
+        
+        with STAGES['serialize'].time():
+            response = jsonify(format_batch(probabilities))
+        
+        return response
+        
+    except Exception as e:
+        print(f"Error during batch inference: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/focus/health', methods=['GET'])
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint."""
-    return jsonify({
-        'status': 'ok',
-        'model_loaded': model is not None,
-    })
+    """Health check endpoint (503 until the model is loaded and warmed up)."""
+    body = health()
+    return jsonify(body), 200 if body['ready'] else 503
+
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """
+    Reload the model file and swap it in without dropping in-flight requests.
+    Requires: Authorization: Bearer <ADMIN_TOKEN> (disabled when ADMIN_TOKEN is unset)
+    """
+    if not serving.authorized(request.headers.get('Authorization')):
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    try:
+        return jsonify(serving.reload())
+    except Exception as e:
+        print(f"Error reloading model: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,366 @@
+"""
+Focus Detection ASGI Server
+Async serving mode for the same endpoints as api_server.py, run with uvicorn.
+
+Connections are handled on an asyncio event loop, so one instance can hold
+thousands of idle keep-alive connections. CPU-bound decoding runs on a
+bounded thread pool and inference awaits the shared micro-batcher. Requests
+beyond ASGI_MAX_CONCURRENCY are rejected immediately with 503 instead of
+queueing.
+
+/api/focus/stream keeps one WebSocket open per session: clients send binary
+frames and get one prediction back per frame, smoothed over the session's
+recent frames on the server.
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.datastructures import UploadFile
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route, WebSocketRoute
+from starlette.websockets import WebSocketDisconnect
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.preprocessing import decode_base64, decode_image_bytes, decode_frames, pixels_to_input
+from ml.serving import STAGES, batch_pixels, format_prediction, format_batch, health
+from ml.smoothing import TemporalSmoother
+from ml import metrics, serving
+from ml.config import (
+    ASGI_MAX_CONCURRENCY, ASGI_EXECUTOR_WORKERS, ASGI_KEEPALIVE_SECONDS,
+    ASGI_MAX_STREAMS, ASGI_STREAM_IDLE_SECONDS, SMOOTHING_WINDOW,
+)
+
+MAX_CONCURRENCY = int(os.environ.get('MAX_CONCURRENCY', ASGI_MAX_CONCURRENCY))
+EXECUTOR_WORKERS = int(os.environ.get('EXECUTOR_WORKERS', ASGI_EXECUTOR_WORKERS))
+MAX_STREAMS = int(os.environ.get('MAX_STREAMS', ASGI_MAX_STREAMS))
+STREAM_IDLE_SECONDS = float(os.environ.get('STREAM_IDLE_SECONDS', ASGI_STREAM_IDLE_SECONDS))
+STREAM_WINDOW = int(os.environ.get('STREAM_SMOOTHING_WINDOW', SMOOTHING_WINDOW))
+
+# CPU-bound decoding runs here, never on the event loop
+executor = ThreadPoolExecutor(max_workers=EXECUTOR_WORKERS, thread_name_prefix='focus-decode')
+
+# Metric endpoint labels, matching the Flask endpoint names
+ENDPOINTS = {
+    '/api/focus/check': 'check_focus',
+    '/api/focus/check/batch': 'check_focus_batch',
+    '/api/focus/health': 'health_check',
+    '/health': 'health_check',
+    '/metrics': 'metrics_endpoint',
+    '/admin/reload': 'admin_reload',
+}
+
+# Always answered, even when inference capacity is exhausted
+EXEMPT_PATHS = {'/api/focus/health', '/health', '/metrics', '/admin/reload'}
+
+# Class names by index, as in format_prediction
+CLASSES = ('focused', 'distracted')
+
+# Per-session majority vote for /api/focus/stream; sessions idle past the
+# timeout are evicted even if their connection is never closed cleanly
+stream_smoother = TemporalSmoother(
+    window=STREAM_WINDOW, idle_timeout=STREAM_IDLE_SECONDS, max_identities=MAX_STREAMS,
+)
+active_streams = 0
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Admission control and request metrics.
+
+    At most `limit` non-exempt requests are handled at once; the rest get an
+    immediate 503 with Retry-After. The counter is only touched on the event
+    loop thread, so it needs no lock.
+    """
+
+    def __init__(self, app, limit: int):
+        self.app = app
+        self.limit = limit
+        self.active = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        path = scope['path']
+        endpoint = ENDPOINTS.get(path, 'unknown')
+        limited = path not in EXEMPT_PATHS
+
+        if limited and self.active >= self.limit:
+            metrics.REJECTED.inc(endpoint=endpoint)
+            metrics.REQUESTS.inc(endpoint=endpoint, status=503)
+            metrics.ERRORS.inc(endpoint=endpoint)
+            response = JSONResponse(
+                {'error': 'Server busy, retry shortly'}, status_code=503, headers={'Retry-After': '1'}
+            )
+            await response(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        if limited:
+            self.active += 1
+        metrics.IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if limited:
+                self.active -= 1
+            metrics.IN_FLIGHT.dec()
+            metrics.REQUESTS.inc(endpoint=endpoint, status=status)
+            if status >= 400:
+                metrics.ERRORS.inc(endpoint=endpoint)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+def preprocess_single(image_data):
+    """Base64 data URL to uint8 pixels [1, 48, 48] (runs on the executor)."""
+    with STAGES['decode'].time():
+        image_bytes = decode_base64(image_data)
+
+    with STAGES['preprocess'].time():
+        return decode_image_bytes(image_bytes)[np.newaxis]
+
+
+async def predict(pixels):
+    """
+    Probabilities for uint8 pixels [N, 48, 48]; async counterpart of serving.predict_pixels.
+
+    Cached frames are answered directly; the misses await the shared
+    micro-batcher without blocking an executor thread. As in predict_pixels,
+    the batcher is read after the cache lookup.
+    """
+    with STAGES['inference'].time():
+        cache = serving.cache
+        if cache is None:
+            return await asyncio.wrap_future(serving.batcher.submit(pixels_to_input(pixels)))
+
+        keys, results, misses, generation = cache.lookup(pixels)
+        if misses:
+            batch = pixels_to_input(pixels[misses])
+            probabilities = await asyncio.wrap_future(serving.batcher.submit(batch))
+            cache.store(keys, results, misses, probabilities, generation)
+        return np.stack(results)
+
+
+async def check_focus(request):
+    """
+    Endpoint to check focus level from webcam image.
+    Expects: { "image": "base64_encoded_image" }
+    Returns: { "prediction": "focused"|"distracted", "confidence": 0.0-1.0 }
+    """
+    if serving.batcher is None:
+        body, status = serving.unavailable()
+        return JSONResponse(body, status_code=status)
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or 'image' not in data:
+        return JSONResponse({'error': 'No image provided'}, status_code=400)
+
+    try:
+        loop = asyncio.get_running_loop()
+        pixels = await loop.run_in_executor(executor, preprocess_single, data['image'])
+        probabilities = await predict(pixels)
+
+        with STAGES['serialize'].time():
+            return JSONResponse(format_prediction(probabilities[0]))
+
+    except Exception as e:
+        print(f"Error during inference: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def check_focus_batch(request):
+    """
+    Endpoint to check focus level for many frames in one binary request.
+    Expects: multipart file parts or a raw body (see preprocessing.decode_frames)
+    Returns: { "classes": ["focused", "distracted"], "probs": [[p_focused, p_distracted], ...] }
+    """
+    if serving.batcher is None:
+        body, status = serving.unavailable()
+        return JSONResponse(body, status_code=status)
+
+    frame_format = request.query_params.get('format', 'image')
+    loop = asyncio.get_running_loop()
+
+    try:
+        if request.headers.get('content-type', '').startswith('multipart/form-data'):
+            form = await request.form()
+            parts = [await value.read() for _, value in form.multi_items() if isinstance(value, UploadFile)]
+            job = lambda: batch_pixels(frame_format, parts=parts)
+        else:
+            body = await request.body()
+            job = lambda: batch_pixels(frame_format, body=body)
+
+        with STAGES['preprocess'].time():
+            pixels = await loop.run_in_executor(executor, job)
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+
+    try:
+        probabilities = await predict(pixels)
+
+        with STAGES['serialize'].time():
+            return JSONResponse(format_batch(probabilities))
+
+    except Exception as e:
+        print(f"Error during batch inference: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def focus_stream(websocket):
+    """
+    Stream focus predictions over one WebSocket connection per session.
+    Expects: binary messages with one frame each, ?format=image|gray8 (see
+        preprocessing.decode_frames); the text message "reset" clears the
+        session's smoothing window
+    Returns: one JSON message per frame with the format_prediction fields plus
+        "smoothed" (majority over the session's last STREAM_WINDOW frames)
+        and "frame" (1-based sequence number)
+    """
+    global active_streams
+
+    frame_format = websocket.query_params.get('format', 'image')
+    if serving.batcher is None:
+        body, status = serving.unavailable()
+        await websocket.close(code=1013 if status == 503 else 1011, reason=body['error'])
+        return
+    if frame_format not in ('image', 'gray8'):
+        await websocket.close(code=1003, reason=f"Unknown format: {frame_format}")
+        return
+    if active_streams >= MAX_STREAMS:
+        metrics.REJECTED.inc(endpoint='focus_stream')
+        await websocket.close(code=1013, reason='Server busy, retry shortly')
+        return
+
+    await websocket.accept()
+    session = uuid.uuid4().hex
+    active_streams += 1
+    metrics.STREAM_SESSIONS.inc()
+    loop = asyncio.get_running_loop()
+    frames = 0
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), timeout=STREAM_IDLE_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1001, reason='Idle timeout')
+                break
+            if message['type'] == 'websocket.disconnect':
+                break
+
+            if message.get('bytes') is None:
+                if message.get('text') == 'reset':
+                    stream_smoother.reset(session)
+                else:
+                    await websocket.send_json({'error': 'Expected a binary frame or "reset"'})
+                continue
+
+            try:
+                with STAGES['preprocess'].time():
+                    if frame_format == 'gray8':
+                        pixels = decode_frames('gray8', parts=[message['bytes']])
+                    else:
+                        pixels = await loop.run_in_executor(executor, decode_frames, 'image', [message['bytes']])
+            except Exception as e:
+                await websocket.send_json({'error': str(e)})
+                continue
+
+            probabilities = (await predict(pixels))[0]
+            smoothed = stream_smoother.update(session, int(probabilities[1] >= probabilities[0]))
+            frames += 1
+            metrics.STREAM_FRAMES.inc()
+
+            with STAGES['serialize'].time():
+                response = {**format_prediction(probabilities), 'smoothed': CLASSES[smoothed], 'frame': frames}
+            await websocket.send_json(response)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Error during stream inference: {e}")
+        await websocket.close(code=1011)
+    finally:
+        stream_smoother.reset(session)
+        active_streams -= 1
+        metrics.STREAM_SESSIONS.dec()
+
+
+async def health_check(request):
+    """Health check endpoint (503 until the model is loaded and warmed up)."""
+    body = health()
+    return JSONResponse(body, status_code=200 if body['ready'] else 503)
+
+
+async def admin_reload(request):
+    """
+    Reload the model file and swap it in without dropping in-flight requests.
+    Requires: Authorization: Bearer <ADMIN_TOKEN> (disabled when ADMIN_TOKEN is unset)
+    """
+    if not serving.authorized(request.headers.get('authorization')):
+        return JSONResponse({'error': 'Forbidden'}, status_code=403)
+
+    try:
+        # Loading and warmup block, so they run off the event loop
+        return JSONResponse(await asyncio.get_running_loop().run_in_executor(None, serving.reload))
+    except Exception as e:
+        print(f"Error reloading model: {e}")
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+async def metrics_endpoint(request):
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+app = Starlette(
+    routes=[
+        Route('/api/focus/check', check_focus, methods=['POST']),
+        Route('/api/focus/check/batch', check_focus_batch, methods=['POST']),
+        Route('/api/focus/health', health_check, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+        Route('/admin/reload', admin_reload, methods=['POST']),
+        WebSocketRoute('/api/focus/stream', focus_stream),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        Middleware(ConcurrencyLimitMiddleware, limit=MAX_CONCURRENCY),
+    ],
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 5001))
+    print(f"Starting Focus Detection ASGI API on port {port} "
+          f"(max_concurrency={MAX_CONCURRENCY}, executor_workers={EXECUTOR_WORKERS})...")
+    uvicorn.run(
+        app,
+        host='0.0.0.0',
+        port=port,
+        timeout_keep_alive=int(os.environ.get('KEEPALIVE_SECONDS', ASGI_KEEPALIVE_SECONDS)),
+        backlog=2048,
+    )
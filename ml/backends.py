@@ -0,0 +1,147 @@
+"""Pluggable inference backends for the focus detection API server."""
+
+import os
+
+import numpy as np
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Numerically stable softmax over the class axis."""
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TorchBackend:
+    """
+    Runs `FocusCNN` eagerly with PyTorch.
+
+    Args:
+        model_path: Path to the trained .pth checkpoint
+        num_threads: Intra-op threads for torch (None keeps the torch default)
+    """
+
+    name = "torch"
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        import torch
+        from ml.model import get_model
+
+        self._torch = torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.model = get_model(pretrained_path=str(model_path))
+        self.model.eval()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Map a float32 [N, 1, 48, 48] batch to class probabilities [N, 2]."""
+        torch = self._torch
+        with torch.no_grad():
+            output = self.model(torch.from_numpy(batch))
+            return torch.softmax(output, dim=1).numpy()
+
+
+class TorchScriptBackend(TorchBackend):
+    """
+    Runs the frozen TorchScript artifact from `prepare_for_inference`
+    (BatchNorm folded, Dropout removed, Conv+ReLU fused on oneDNN CPUs).
+
+    Args:
+        model_path: Path to the .ts file written by export.py
+        num_threads: Intra-op threads for torch (None keeps the torch default)
+    """
+
+    name = "torchscript"
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        import torch
+        from ml.model import load_inference_model
+
+        self._torch = torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.model = load_inference_model(model_path)
+
+
+class OnnxBackend:
+    """
+    Runs the exported ONNX graph with an onnxruntime `InferenceSession`.
+
+    Does not import torch, which keeps startup time and resident memory low.
+
+    Args:
+        model_path: Path to the .onnx file produced by export.py
+        num_threads: Intra-op threads (None lets onnxruntime use all cores)
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # A single small CNN graph has no parallel branches to schedule
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            str(model_path), sess_options=options, providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        """Map a float32 [N, 1, 48, 48] batch to class probabilities [N, 2]."""
+        logits = self.session.run(None, {self.input_name: batch})[0]
+        return softmax(logits)
+
+
+BACKENDS = {
+    'torch': TorchBackend,
+    'torchscript': TorchScriptBackend,
+    'onnx': OnnxBackend,
+}
+
+
+def load_backend(name: str, model_path: str, num_threads: int = None):
+    """
+    Create an inference backend by name.
+
+    Args:
+        name: One of BACKENDS ('torch', 'torchscript', 'onnx')
+        model_path: Model file for that backend
+        num_threads: Intra-op thread count
+
+    Returns:
+        Backend instance exposing `name` and `predict(batch)`
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    return BACKENDS[name](model_path, num_threads=num_threads)
+
+
+def check_parity(backend, reference, num_samples: int = 16, atol: float = 1e-4, seed: int = 0) -> float:
+    """
+    Compare two backends on the same random batch.
+
+    Raises:
+        AssertionError: If any probability differs by more than `atol`
+
+    Returns:
+        Maximum absolute difference between the two backends' probabilities
+    """
+    rng = np.random.default_rng(seed)
+    batch = rng.random((num_samples, 1, 48, 48), dtype=np.float32)
+
+    max_diff = float(np.abs(backend.predict(batch) - reference.predict(batch)).max())
+    if max_diff > atol:
+        raise AssertionError(
+            f"{backend.name} backend differs from {reference.name} by {max_diff:.2e} (atol={atol:.0e})"
+        )
+    return max_diff
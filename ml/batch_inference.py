@@ -0,0 +1,350 @@
+"""
+Offline focus scoring for recorded sessions.
+
+Streams frames from video files or image directories through a generator
+pipeline (read -> detect/track faces -> 48x48 crops -> batched forward pass
+-> writer), so memory stays constant whatever the video length. Face crops
+are batched across frames, and files are processed concurrently in a pool of
+worker processes that each load the model once.
+
+Usage:
+    python batch_inference.py session1.mp4 session2.mp4 frames_dir/ --output-dir predictions
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from config import BASE_DIR, CLASS_NAMES, BATCH_INFERENCE_SIZE
+from face_tracking import FaceTracker
+from inference import FocusDetector
+from smoothing import TemporalSmoother
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v'}
+CSV_FIELDS = [
+    'source', 'frame', 'timestamp', 'file', 'face', 'track_id', 'x', 'y', 'w', 'h',
+    'prediction', 'confidence', 'focused_prob', 'smoothed',
+]
+
+# Per-process detector, created once by the pool initializer
+_detector = None
+
+
+def iter_video_frames(path: Path, stride: int = 1):
+    """Yield (frame_index, timestamp_seconds, None, frame) for every `stride`-th frame."""
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Could not open video {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+    index = 0
+    try:
+        while True:
+            if index % stride:
+                # grab() skips decoding into a frame buffer
+                if not cap.grab():
+                    break
+                index += 1
+                continue
+            ret, frame = cap.read()
+            if not ret:
+                break
+            timestamp = index / fps if fps > 0 else cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            yield index, round(timestamp, 3), None, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def iter_image_frames(directory: Path, stride: int = 1):
+    """Yield (frame_index, None, file_name, image) for every `stride`-th image in a directory, sorted by name."""
+    files = sorted(
+        p for p in directory.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    # Indices count every file, as frame numbers do in iter_video_frames
+    for index, path in enumerate(files):
+        if index % stride:
+            continue
+        image = cv2.imread(str(path))
+        if image is None:
+            continue
+        yield index, None, str(path.relative_to(directory)), image
+
+
+def iter_faces(frames, tracker: FaceTracker):
+    """
+    Attach face crops to each frame.
+
+    Yields (meta, crops, boxes, track_ids) where crops is a uint8 [k, 48, 48]
+    array; the full frame is not kept, so nothing large outlives its frame.
+    """
+    for index, timestamp, file_name, frame in frames:
+        tracked = tracker.update(frame)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        crops = np.empty((len(tracked), 48, 48), dtype=np.uint8)
+        for i, (_, (x, y, w, h)) in enumerate(tracked):
+            crops[i] = cv2.resize(gray[y:y+h, x:x+w], (48, 48))
+        meta = {'frame': index, 'timestamp': timestamp, 'file': file_name}
+        yield meta, crops, [box for _, box in tracked], [track_id for track_id, _ in tracked]
+
+
+def iter_batches(faces, batch_size: int):
+    """Group consecutive frames until their faces fill `batch_size` rows (frames are never split)."""
+    pending, rows = [], 0
+    for item in faces:
+        pending.append(item)
+        rows += len(item[1])
+        if rows >= batch_size:
+            yield pending
+            pending, rows = [], 0
+    if pending:
+        yield pending
+
+
+def score_batches(batches, detector: FocusDetector, smoother: TemporalSmoother = None):
+    """
+    Run one forward pass per batch and yield a record per frame.
+
+    Args:
+        batches: Lists of (meta, crops, boxes, track_ids) from iter_batches
+        detector: Loaded FocusDetector
+        smoother: Per-track majority vote (None for independent images)
+    """
+    for batch in batches:
+        crops = np.concatenate([item[1] for item in batch])
+        if len(crops):
+            inputs = torch.from_numpy(crops).unsqueeze(1).float().div_(255.0).to(detector.device)
+            with torch.no_grad():
+                probs = F.softmax(detector.model(inputs), dim=1).cpu().numpy()
+        else:
+            probs = np.empty((0, len(CLASS_NAMES)), dtype=np.float32)
+
+        offset = 0
+        for meta, frame_crops, boxes, track_ids in batch:
+            faces = []
+            for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
+                p = probs[offset + i]
+                predicted = int(p.argmax())
+                smoothed = smoother.update(track_id, predicted) if smoother is not None else predicted
+                faces.append({
+                    'track_id': track_id,
+                    'box': [int(v) for v in box],
+                    'prediction': CLASS_NAMES[predicted],
+                    'confidence': round(float(p[predicted]), 4),
+                    'focused_prob': round(float(p[0]), 4),
+                    'smoothed': CLASS_NAMES[smoothed],
+                })
+            offset += len(frame_crops)
+            yield dict(meta, faces=faces)
+
+
+class JsonlWriter:
+    """One JSON object per frame."""
+
+    def __init__(self, f, source: str):
+        self.f = f
+        self.source = source
+
+    def write(self, record: dict):
+        record = {'source': self.source, **{k: v for k, v in record.items() if v is not None}}
+        self.f.write(json.dumps(record) + '\n')
+
+
+class CsvWriter:
+    """One row per face; frames without faces get a row with empty face columns."""
+
+    def __init__(self, f, source: str):
+        self.writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        self.writer.writeheader()
+        self.source = source
+
+    def write(self, record: dict):
+        base = {
+            'source': self.source, 'frame': record['frame'],
+            'timestamp': record['timestamp'], 'file': record['file'],
+        }
+        if not record['faces']:
+            self.writer.writerow(base)
+        for i, face in enumerate(record['faces']):
+            x, y, w, h = face['box']
+            self.writer.writerow(dict(
+                base, face=i, track_id=face['track_id'], x=x, y=y, w=w, h=h,
+                prediction=face['prediction'], confidence=face['confidence'],
+                focused_prob=face['focused_prob'], smoothed=face['smoothed'],
+            ))
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter}
+
+
+def _init_worker(model_path: str, num_threads: int):
+    """Pool initializer: bound thread pools and load the model once per process."""
+    global _detector
+    torch.set_num_threads(num_threads)
+    cv2.setNumThreads(1)
+    _detector = FocusDetector(model_path)
+
+
+def process_input(source: str, output_path: str, output_format: str = 'jsonl',
+                  batch_size: int = BATCH_INFERENCE_SIZE, stride: int = 1) -> dict:
+    """
+    Score one video file or image directory and stream records to `output_path`.
+
+    Returns:
+        Summary dict (frames, faces, seconds, fps)
+    """
+    detector = _detector
+    path = Path(source)
+    start = time.perf_counter()
+
+    if path.is_dir():
+        frames = iter_image_frames(path, stride)
+        # Unrelated stills: detect in every image, no temporal smoothing
+        tracker = FaceTracker(detector.face_cascade, detect_every=1)
+        smoother = None
+    else:
+        frames = iter_video_frames(path, stride)
+        tracker = FaceTracker(detector.face_cascade)
+        smoother = TemporalSmoother(detector.smoothing_window)
+
+    num_frames = num_faces = focused = 0
+    with open(output_path, 'w', newline='') as f:
+        writer = WRITERS[output_format](f, str(source))
+        batches = iter_batches(iter_faces(frames, tracker), batch_size)
+        for record in score_batches(batches, detector, smoother):
+            writer.write(record)
+            num_frames += 1
+            num_faces += len(record['faces'])
+            focused += sum(face['smoothed'] == CLASS_NAMES[0] for face in record['faces'])
+
+    elapsed = time.perf_counter() - start
+    return {
+        'source': str(source),
+        'output': str(output_path),
+        'frames': num_frames,
+        'faces': num_faces,
+        'focused_rate': focused / num_faces if num_faces else None,
+        'seconds': elapsed,
+        'fps': num_frames / elapsed if elapsed > 0 else 0.0,
+        'detections': tracker.detections,
+    }
+
+
+def output_paths(sources, output_dir: Path, output_format: str) -> list:
+    """One output file per input, named after it (deduplicated)."""
+    used = set()
+    paths = []
+    for source in sources:
+        stem = Path(source).stem or Path(source).name
+        name, n = stem, 1
+        while name in used:
+            n += 1
+            name = f"{stem}-{n}"
+        used.add(name)
+        paths.append(output_dir / f"{name}.{output_format}")
+    return paths
+
+
+def run(sources, output_dir: str = str(BASE_DIR / "predictions"), output_format: str = 'jsonl',
+        model_path: str = None, workers: int = None, threads_per_worker: int = 1,
+        batch_size: int = BATCH_INFERENCE_SIZE, stride: int = 1) -> list:
+    """
+    Score every input, in parallel across processes.
+
+    Args:
+        sources: Video files and/or image directories
+        output_dir: Directory for one JSONL/CSV file per input
+        output_format: 'jsonl' or 'csv'
+        model_path: Checkpoint (defaults to MODEL_PATH)
+        workers: Worker processes (default: one per core, capped at the number of inputs)
+        threads_per_worker: torch intra-op threads in each worker
+        batch_size: Face crops per forward pass
+        stride: Process every `stride`-th frame / image
+
+    Returns:
+        List of per-input summaries
+    """
+    print("=" * 50)
+    print("Focus Detection - Batch Inference")
+    print("=" * 50)
+
+    for source in sources:
+        path = Path(source)
+        if not path.is_dir() and path.suffix.lower() not in VIDEO_EXTENSIONS:
+            raise ValueError(f"{source} is neither a directory nor a video ({', '.join(sorted(VIDEO_EXTENSIONS))})")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = output_paths(sources, output_dir, output_format)
+
+    cpu_count = os.cpu_count() or 1
+    workers = workers or max(1, cpu_count // threads_per_worker)
+    workers = min(workers, len(sources))
+    print(f"{len(sources)} inputs, {workers} workers x {threads_per_worker} threads, batch size {batch_size}")
+
+    start = time.perf_counter()
+    summaries = []
+
+    def report(summary):
+        summaries.append(summary)
+        rate = summary['focused_rate']
+        print(f"  {summary['source']}: {summary['frames']} frames, {summary['faces']} faces, "
+              f"{summary['fps']:.1f} frames/s, focused {'-' if rate is None else f'{100 * rate:.1f}%'}"
+              f" -> {summary['output']}")
+
+    if workers == 1:
+        _init_worker(model_path, threads_per_worker)
+        for source, output in zip(sources, outputs):
+            try:
+                report(process_input(source, str(output), output_format, batch_size, stride))
+            except Exception as e:
+                print(f"  {source}: FAILED ({e})")
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(model_path, threads_per_worker)
+        ) as pool:
+            futures = {
+                pool.submit(process_input, source, str(output), output_format, batch_size, stride): source
+                for source, output in zip(sources, outputs)
+            }
+            for future in as_completed(futures):
+                try:
+                    report(future.result())
+                except Exception as e:
+                    print(f"  {futures[future]}: FAILED ({e})")
+
+    elapsed = time.perf_counter() - start
+    total_frames = sum(s['frames'] for s in summaries)
+    total_faces = sum(s['faces'] for s in summaries)
+    print("\n" + "=" * 50)
+    print(f"Processed {total_frames} frames ({total_faces} faces) in {elapsed:.1f}s")
+    print(f"Throughput: {total_frames / elapsed:.1f} frames/s, {total_faces / elapsed:.1f} faces/s")
+    print("=" * 50)
+    return summaries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score recorded sessions offline")
+    parser.add_argument("inputs", nargs="+", help="Video files and/or image directories")
+    parser.add_argument("--output-dir", type=str, default=str(BASE_DIR / "predictions"))
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--model", type=str, default=None, help="Checkpoint path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: one per core)")
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_INFERENCE_SIZE,
+                        help="Face crops per forward pass")
+    parser.add_argument("--stride", type=int, default=1, help="Process every Nth frame")
+    args = parser.parse_args()
+
+    run(args.inputs, args.output_dir, args.format, args.model, args.workers,
+        args.threads_per_worker, args.batch_size, max(1, args.stride))
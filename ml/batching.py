@@ -0,0 +1,187 @@
+"""Dynamic micro-batching for the focus detection API server."""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects concurrent inference requests into batched forward passes.
+
+    Request handlers call `predict()` (or `submit()`) with a float32
+    `[k, 1, 48, 48]` array. A single worker thread waits for the first pending
+    request, then keeps collecting until either `max_batch_size` rows are queued or
+    `max_wait_ms` has passed, runs one forward pass over the concatenated
+    batch and hands each caller back its own slice of the output.
+
+    Args:
+        predict_fn: Callable mapping a `[N, 1, 48, 48]` batch to `[N, C]` outputs
+        max_batch_size: Maximum number of rows in one forward pass
+        max_wait_ms: Maximum time to hold the first request while filling a batch
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000.0
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, batch: np.ndarray) -> Future:
+        """Queue a `[k, 1, 48, 48]` array; the future resolves to its `[k, C]` outputs."""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+
+        future = Future()
+        self._queue.put((batch, future))
+        return future
+
+    def predict(self, batch: np.ndarray, timeout: float = None) -> np.ndarray:
+        """Blocking convenience wrapper around `submit()`."""
+        return self.submit(batch).result(timeout=timeout)
+
+    def close(self):
+        """Stop the worker thread after draining already-queued requests."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _collect(self) -> Tuple[List, bool]:
+        """Block for the first request, then fill the batch until full or timed out."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        rows = first[0].shape[0]
+        deadline = time.perf_counter() + self.max_wait
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if item is None:
+                return batch, True
+
+            batch.append(item)
+            rows += item[0].shape[0]
+
+        return batch, False
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: List):
+        # Skip requests whose caller already gave up
+        batch = [(inputs, future) for inputs, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        try:
+            inputs = np.concatenate([inputs for inputs, _ in batch], axis=0)
+            outputs = self.predict_fn(inputs)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for request_inputs, future in batch:
+            rows = request_inputs.shape[0]
+            future.set_result(outputs[offset:offset + rows])
+            offset += rows
+
+
+def _benchmark(num_clients: int = 32, requests_per_client: int = 50,
+               max_batch_size: int = 32, max_wait_ms: float = 5.0):
+    """Compare one-at-a-time inference against micro-batching under concurrent load."""
+    import torch
+    from model import FocusCNN
+
+    model = FocusCNN()
+    model.eval()
+
+    def forward(batch):
+        with torch.no_grad():
+            return torch.softmax(model(torch.from_numpy(batch)), dim=1).numpy()
+
+    def run_clients(call):
+        latencies = []
+        lock = threading.Lock()
+
+        def client():
+            local = []
+            for _ in range(requests_per_client):
+                x = np.random.rand(1, 1, 48, 48).astype(np.float32)
+                start = time.perf_counter()
+                call(x)
+                local.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=client) for _ in range(num_clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = np.array(latencies) * 1000.0
+        return len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    # Warm up both paths
+    forward(np.random.rand(max_batch_size, 1, 48, 48).astype(np.float32))
+
+    results = {"one-at-a-time": run_clients(forward)}
+
+    batcher = MicroBatcher(forward, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    results["micro-batched"] = run_clients(batcher.predict)
+    batcher.close()
+
+    print(f"Clients: {num_clients}, requests/client: {requests_per_client}, "
+          f"max_batch_size: {max_batch_size}, max_wait_ms: {max_wait_ms}")
+    print("-" * 56)
+    print(f"{'Mode':<16}{'Req/s':>12}{'p50 (ms)':>14}{'p99 (ms)':>14}")
+    print("-" * 56)
+    for name, (throughput, p50, p99) in results.items():
+        print(f"{name:<16}{throughput:>12.1f}{p50:>14.2f}{p99:>14.2f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched inference")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    _benchmark(args.clients, args.requests, args.max_batch_size, args.max_wait_ms)
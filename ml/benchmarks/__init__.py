@@ -0,0 +1,12 @@
+"""
+Performance benchmarks for the focus detection pipeline.
+
+Run from ml/:
+
+    python -m benchmarks                    # all suites
+    python -m benchmarks model export       # selected suites
+    python -m benchmarks --quick            # fewer iterations
+    python -m benchmarks.compare old.json new.json
+
+Results are written as JSON to benchmarks/results/<timestamp>-<commit>.json.
+"""
@@ -0,0 +1,46 @@
+"""Run benchmark suites and write machine-readable JSON results."""
+
+import argparse
+import importlib
+import traceback
+
+from benchmarks.common import write_results
+
+SUITES = {
+    "preprocess": "benchmarks.bench_preprocess",
+    "model": "benchmarks.bench_model",
+    "export": "benchmarks.bench_export",
+    "dataset": "benchmarks.bench_dataset",
+    "api": "benchmarks.load_test",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run NeuroLearn ML benchmarks")
+    parser.add_argument("suites", nargs="*", help=f"Suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations, for smoke runs")
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/...)")
+    parser.add_argument("--url", default=None, help="Use a running API server for the api suite")
+    args = parser.parse_args()
+
+    unknown = sorted(set(args.suites) - set(SUITES))
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    results = {}
+    for name in args.suites or list(SUITES):
+        print(f"Running {name}...")
+        module = importlib.import_module(SUITES[name])
+        kwargs = {"url": args.url} if name == "api" else {}
+        try:
+            results[name] = module.run(quick=args.quick, **kwargs)
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    output = write_results(results, args.output)
+    print(f"\nResults saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Benchmark dataset loading paths from dataset.py and dataset_cache.py."""
+
+import time
+
+from benchmarks.common import summarize
+
+
+def _timed(fn, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        timings.append(time.perf_counter() - start)
+    return out, timings
+
+
+def run(quick: bool = False) -> dict:
+    from config import DATA_DIR
+    import dataset
+    import dataset_cache
+
+    train_dir = DATA_DIR / "train"
+    if not train_dir.exists():
+        return {"skipped": f"{train_dir} not found"}
+
+    max_per_class = 100 if quick else 500
+    repeats = 1 if quick else 3
+    results = {}
+
+    (images, _), timings = _timed(lambda: dataset.load_images_from_folder(train_dir, max_per_class), repeats)
+    results["load_images_from_folder"] = summarize(timings, len(images))
+
+    (images, _, _), timings = _timed(lambda: dataset.load_images_parallel(train_dir, max_per_class), repeats)
+    results["load_images_parallel"] = summarize(timings, len(images))
+
+    # Compile outside the timed region, then time opening the memory-mapped cache
+    if not dataset_cache.is_fresh("train"):
+        dataset_cache.compile_split("train")
+    (images, _), timings = _timed(lambda: dataset_cache.load_split("train"), repeats)
+    results["dataset_cache.load_split"] = summarize(timings, len(images))
+
+    # One pass over the training loader (gather + normalize + augment)
+    train_loader, _ = dataset.get_dataloaders(max_per_class=max_per_class, streaming=False)
+    start = time.perf_counter()
+    samples = sum(len(labels) for _, labels in train_loader)
+    results["train_loader_epoch"] = summarize([time.perf_counter() - start], samples)
+
+    return results
@@ -0,0 +1,56 @@
+"""Benchmark the PyTorch model against its ONNX export (export.py) under onnxruntime."""
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import time_fn
+
+BATCH_SIZES = [1, 32, 128]
+
+
+def run(quick: bool = False) -> dict:
+    import torch
+    from config import MODEL_PATH
+    from model import get_model
+
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return {"skipped": "onnxruntime not installed"}
+
+    # Trained weights when available; timing does not depend on them
+    model = get_model(pretrained_path=str(MODEL_PATH) if MODEL_PATH.exists() else None)
+    model.eval()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        onnx_path = Path(tmp) / "focus_detector.onnx"
+        # Same export settings as export.export_to_onnx
+        torch.onnx.export(
+            model, torch.randn(1, 1, 48, 48), str(onnx_path),
+            export_params=True, opset_version=12, do_constant_folding=True,
+            input_names=['input'], output_names=['output'],
+            dynamic_axes={'input': {0: 'batch_size'}, 'output': {0: 'batch_size'}},
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(str(onnx_path), sess_options=options, providers=['CPUExecutionProvider'])
+
+        runs = 10 if quick else 100
+        for batch_size in BATCH_SIZES:
+            x = np.random.rand(batch_size, 1, 48, 48).astype(np.float32)
+            x_torch = torch.from_numpy(x)
+
+            def torch_forward():
+                with torch.no_grad():
+                    model(x_torch)
+
+            results[f"torch,batch={batch_size}"] = time_fn(torch_forward, runs=runs, items_per_call=batch_size)
+            results[f"onnx,batch={batch_size}"] = time_fn(
+                lambda: session.run(None, {'input': x}), runs=runs, items_per_call=batch_size
+            )
+
+    return results
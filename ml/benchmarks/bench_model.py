@@ -0,0 +1,42 @@
+"""Benchmark FocusCNN.forward across batch sizes and thread counts."""
+
+import os
+
+from benchmarks.common import time_fn
+
+BATCH_SIZES = [1, 8, 32, 64, 128]
+
+
+def thread_counts():
+    cores = os.cpu_count() or 1
+    return sorted({n for n in (1, 2, 4, cores) if n <= cores})
+
+
+def run(quick: bool = False) -> dict:
+    import torch
+    from model import FocusCNN
+
+    model = FocusCNN()
+    model.eval()
+
+    default_threads = torch.get_num_threads()
+    batch_sizes = BATCH_SIZES[:3] if quick else BATCH_SIZES
+    results = {}
+
+    try:
+        for threads in thread_counts():
+            torch.set_num_threads(threads)
+            for batch_size in batch_sizes:
+                x = torch.rand(batch_size, 1, 48, 48)
+
+                def forward():
+                    with torch.no_grad():
+                        model(x)
+
+                results[f"threads={threads},batch={batch_size}"] = time_fn(
+                    forward, runs=10 if quick else 50, items_per_call=batch_size
+                )
+    finally:
+        torch.set_num_threads(default_threads)
+
+    return results
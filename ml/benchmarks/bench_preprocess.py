@@ -0,0 +1,45 @@
+"""Benchmark image preprocessing in the API server and the webcam detector."""
+
+import base64
+import io
+
+import numpy as np
+
+from benchmarks.common import time_fn
+
+
+def _sample_frames():
+    """A 640x480 BGR webcam-sized frame and the 48x48 JPEG data URL the web app sends."""
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, size=(480, 640, 3), dtype=np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(frame[:48, :48]).save(buffer, format="JPEG", quality=80)
+    data_url = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+    return frame, data_url
+
+
+def run(quick: bool = False) -> dict:
+    runs = 20 if quick else 200
+    frame, data_url = _sample_frames()
+    results = {}
+
+    from preprocessing import preprocess_image
+    results["api.preprocess_image"] = time_fn(lambda: preprocess_image(data_url), runs=runs)
+
+    try:
+        from inference import FocusDetector
+    except ImportError:
+        results["FocusDetector.preprocess"] = {"skipped": "opencv not installed"}
+        return results
+
+    # preprocess() only needs `device`; skip loading the model and cascade
+    detector = FocusDetector.__new__(FocusDetector)
+    detector.device = "cpu"
+    face = frame[100:300, 200:400]
+    results["FocusDetector.preprocess"] = time_fn(lambda: detector.preprocess(face), runs=runs)
+
+    return results
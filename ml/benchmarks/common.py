@@ -0,0 +1,111 @@
+"""Timing helpers and result serialization shared by the benchmark suites."""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Make `ml/` modules (config, model, ...) and the `ml` package importable
+ML_DIR = Path(__file__).resolve().parent.parent
+for path in (ML_DIR, ML_DIR.parent):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+RESULTS_DIR = ML_DIR / "benchmarks" / "results"
+
+
+def summarize(timings, items_per_call: int = 1) -> dict:
+    """Latency percentiles (ms) and throughput (items/s) from per-call timings in seconds."""
+    timings = np.asarray(timings, dtype=np.float64)
+    ms = timings * 1000.0
+    return {
+        "runs": len(timings),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p90_ms": round(float(np.percentile(ms, 90)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "min_ms": round(float(ms.min()), 4),
+        "throughput": round(items_per_call * len(timings) / float(timings.sum()), 2),
+    }
+
+
+def time_fn(fn, warmup: int = 5, runs: int = 50, items_per_call: int = 1, min_time: float = 0.0) -> dict:
+    """
+    Time repeated calls of `fn()`.
+
+    Args:
+        fn: Zero-argument callable
+        warmup: Untimed calls before measuring
+        runs: Minimum timed calls
+        items_per_call: Items processed per call (images, requests), for throughput
+        min_time: Keep measuring until at least this many seconds have elapsed
+
+    Returns:
+        summarize() of the timed calls
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    total = 0.0
+    while len(timings) < runs or total < min_time:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+
+    return summarize(timings, items_per_call)
+
+
+def git_commit() -> str:
+    """Short hash of HEAD (with '-dirty' for uncommitted changes), or 'unknown'."""
+    try:
+        commit = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ML_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+        dirty = subprocess.call(
+            ["git", "diff", "--quiet", "HEAD"], cwd=ML_DIR, stderr=subprocess.DEVNULL
+        ) != 0
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment() -> dict:
+    """Machine and library versions recorded alongside every result file."""
+    env = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    for module in ("torch", "onnxruntime", "PIL", "cv2"):
+        try:
+            env[module] = __import__(module).__version__
+        except ImportError:
+            env[module] = None
+    return env
+
+
+def write_results(results: dict, output: Path = None) -> Path:
+    """Write {"environment", "results"} JSON; defaults to results/<timestamp>-<commit>.json."""
+    payload = {"environment": environment(), "results": results}
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{payload['environment']['commit']}.json"
+
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    return output
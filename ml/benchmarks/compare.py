@@ -0,0 +1,66 @@
+"""Compare two benchmark result files and flag regressions."""
+
+import argparse
+import json
+import sys
+
+# Metrics where lower is better; "throughput" is higher-is-better
+LATENCY_METRICS = ("p50_ms", "p99_ms")
+
+
+def _flatten(results: dict, prefix: str = ""):
+    """Yield (name, stats) for every leaf benchmark in a results dict."""
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict) and "throughput" in value:
+            yield name, value
+        elif isinstance(value, dict):
+            yield from _flatten(value, name)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """
+    Compare per-benchmark latency and throughput.
+
+    Returns:
+        List of (name, metric, baseline, candidate, change) for regressions
+        larger than `threshold` (a fraction, e.g. 0.1 for 10%)
+    """
+    base = dict(_flatten(baseline["results"]))
+    regressions = []
+
+    print(f"{'Benchmark':<48}{'Metric':<12}{'Baseline':>12}{'Candidate':>12}{'Change':>10}")
+    print("-" * 94)
+    for name, stats in _flatten(candidate["results"]):
+        if name not in base:
+            continue
+        for metric in LATENCY_METRICS + ("throughput",):
+            old, new = base[name].get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > threshold if metric in LATENCY_METRICS else change < -threshold
+            flag = "  REGRESSION" if worse else ""
+            print(f"{name:<48}{metric:<12}{old:>12.3f}{new:>12.3f}{change:>+10.1%}{flag}")
+            if worse:
+                regressions.append((name, metric, old, new, change))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare benchmark results across commits")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (default 0.10)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    print(f"Baseline:  {baseline['environment']['commit']}  Candidate: {candidate['environment']['commit']}\n")
+    regressions = compare(baseline, candidate, args.threshold)
+    print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
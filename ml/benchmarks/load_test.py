@@ -0,0 +1,118 @@
+"""End-to-end load generator for /api/focus/check against a locally started server."""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import ML_DIR, summarize
+from benchmarks.bench_preprocess import _sample_frames
+
+STARTUP_TIMEOUT = 120.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, process=None, timeout: float = STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"API server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/health", timeout=2) as response:
+                if json.load(response).get("model_loaded"):
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"API server at {base_url} not healthy after {timeout:.0f}s")
+
+
+def start_server(env: dict = None):
+    """Start api_server.py on a free local port; returns (process, base_url)."""
+    port = _free_port()
+    server_env = dict(os.environ, PORT=str(port), FLASK_ENV="production", **(env or {}))
+    process = subprocess.Popen(
+        [sys.executable, str(ML_DIR / "api_server.py")],
+        cwd=ML_DIR, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_healthy(base_url, process)
+    except Exception:
+        process.kill()
+        raise
+    return process, base_url
+
+
+def generate_load(base_url: str, concurrency: int, requests_per_client: int) -> dict:
+    """Post the sample frame from `concurrency` threads; returns latency/throughput stats."""
+    _, data_url = _sample_frames()
+    body = json.dumps({"image": data_url}).encode()
+    url = f"{base_url}/api/focus/check"
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client():
+        nonlocal errors
+        local, local_errors = [], 0
+        for _ in range(requests_per_client):
+            request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+                local.append(time.perf_counter() - start)
+            except (urllib.error.URLError, OSError):
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = summarize(latencies) if latencies else {}
+    # End-to-end throughput over wall-clock time (summarize() gives per-client)
+    result["throughput"] = round(len(latencies) / elapsed, 2)
+    result["errors"] = errors
+    result["concurrency"] = concurrency
+    return result
+
+
+def run(quick: bool = False, url: str = None, concurrency_levels=(1, 8, 32)) -> dict:
+    requests_per_client = 10 if quick else 100
+    process = None
+    if url is None:
+        process, url = start_server()
+
+    try:
+        # Warm up the server before measuring
+        generate_load(url, 1, 5)
+        return {
+            f"concurrency={c}": generate_load(url, c, requests_per_client)
+            for c in concurrency_levels
+        }
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
@@ -0,0 +1,137 @@
+"""
+Asynchronous checkpoint writing and RNG state capture for resumable training.
+
+`AsyncCheckpointWriter.save()` only copies the state to CPU memory on the
+caller's thread; serialization and disk I/O happen on a background thread,
+and every file is written to a temporary name and atomically renamed, so a
+crash never leaves a truncated checkpoint behind.
+"""
+
+import os
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+import torch
+
+
+def to_cpu(obj):
+    """Deep copy of `obj` with every tensor cloned to CPU (safe to serialize while training continues)."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: to_cpu(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(to_cpu(value) for value in obj)
+    return obj
+
+
+def rng_state() -> dict:
+    """Python, NumPy and torch (CPU and CUDA) RNG states."""
+    state = {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: dict):
+    """Restore states captured by `rng_state()`."""
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def seed_epoch(seed: int, epoch: int):
+    """
+    Seed every RNG from (seed, epoch).
+
+    Called at the start of each epoch, so an epoch's shuffling, augmentation
+    and dropout depend only on its index and a resumed run replays exactly
+    the same data order as an uninterrupted one.
+    """
+    epoch_seed = seed * 1000 + epoch
+    random.seed(epoch_seed)
+    np.random.seed(epoch_seed % 2**32)
+    torch.manual_seed(epoch_seed)
+
+
+def write_atomic(state, path: Path):
+    """torch.save to a temporary file, fsync, then rename over `path`."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        torch.save(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AsyncCheckpointWriter:
+    """
+    Writes checkpoints on a background thread.
+
+    If a newer checkpoint for the same path arrives before the previous one
+    was written, only the newer one is written, so a slow disk never builds
+    up a backlog.
+    """
+
+    def __init__(self):
+        self._pending = {}  # path -> state, in arrival order
+        self._writing = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self.errors = []
+        self._thread = threading.Thread(target=self._run, name='checkpoint-writer', daemon=True)
+        self._thread.start()
+
+    def save(self, state: dict, path: Path):
+        """Snapshot `state` to CPU and queue it; returns without touching the disk."""
+        snapshot = to_cpu(state)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('AsyncCheckpointWriter is closed')
+            self._pending.pop(str(path), None)
+            self._pending[str(path)] = snapshot
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                path = next(iter(self._pending))
+                state = self._pending.pop(path)
+                self._writing = True
+
+            try:
+                write_atomic(state, Path(path))
+            except Exception as e:
+                print(f"Checkpoint write to {path} failed: {e}")
+                self.errors.append((path, e))
+            finally:
+                with self._cond:
+                    self._writing = False
+                    self._cond.notify_all()
+
+    def flush(self):
+        """Block until every queued checkpoint is on disk."""
+        with self._cond:
+            while self._pending or self._writing:
+                self._cond.wait()
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
@@ -1,17 +1,23 @@
 """Training configuration and hyperparameters."""
 
-import torch
 from pathlib import Path
 
 # Paths
 BASE_DIR = Path(__file__).parent
 DATA_DIR = BASE_DIR / "data"
 MODEL_DIR = BASE_DIR / "models"
+CACHE_DIR = DATA_DIR / "cache"  # Preprocessed dataset cache (dataset_cache.py)
 
 # Dataset
 DATASET_URL = "https://github.com/muxspace/facial_expressions/raw/master/data/fer2013.csv"
 DATASET_PATH = DATA_DIR / "fer2013.csv"
 
+# Streaming sharded dataset (sharded_dataset.py), for corpora larger than RAM
+STREAMING_DATASET = False
+SHARD_DIR = DATA_DIR / "shards"  # Contains train/ and test/ shard directories
+SHUFFLE_BUFFER_SIZE = 8192  # Samples held in the streaming shuffle buffer
+STREAMING_WORKERS = 2
+
 # Model architecture
 INPUT_SIZE = (1, 48, 48)  # (channels, height, width)
 NUM_CLASSES = 2
@@ -35,9 +41,77 @@ LEARNING_RATE = 0.001
 WEIGHT_DECAY = 1e-4
 NUM_EPOCHS = 25
 EARLY_STOPPING_PATIENCE = 5
+SEED = 42
+
+# Knowledge distillation (train.py --teacher)
+DISTILL_TEMPERATURE = 4.0
+DISTILL_ALPHA = 0.7  # Weight of the soft-target term vs. hard-label cross-entropy
+
+# Resumable training (checkpoint.py)
+CHECKPOINT_DIR = MODEL_DIR / "checkpoints"
+CHECKPOINT_EVERY = 1  # Epochs between full training-state checkpoints
+
+# Hyperparameter sweeps (sweep.py)
+SWEEP_DIR = MODEL_DIR / "sweeps"
+SWEEP_WORKERS = 0  # 0 = one concurrent trial per SWEEP_THREADS_PER_TRIAL cores
+SWEEP_THREADS_PER_TRIAL = 2
+SWEEP_MEDIAN_WARMUP_EPOCHS = 3  # Epochs a trial always runs before it can be stopped early
+SWEEP_MEDIAN_MIN_TRIALS = 3  # Other trials that must have reached an epoch before comparing
 
 # Device
-DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# Resolved on first access so torch-free consumers (the ONNX serving
+# backend) can import this module without loading torch.
+def __getattr__(name):
+    if name == "DEVICE":
+        import torch
+        return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Model save path
 MODEL_PATH = MODEL_DIR / "focus_detector.pth"
+ONNX_MODEL_PATH = MODEL_DIR / "focus_detector.onnx"
+TORCHSCRIPT_MODEL_PATH = MODEL_DIR / "focus_detector.ts"  # Frozen, BatchNorm folded (export.py)
+WEIGHTS_MODEL_PATH = MODEL_DIR / "focus_detector.weights.pth"  # Weights only, no optimizer state (export.py)
+
+# Serving (API server backend and micro-batching)
+SERVING_BACKEND = "torch"  # "torch", "torchscript" or "onnx"
+SERVING_MAX_BATCH_SIZE = 32
+SERVING_MAX_WAIT_MS = 5.0
+MAX_FRAMES_PER_REQUEST = 64
+SERVING_BACKGROUND_LOAD = True  # Load the model on a background thread; /health reports readiness
+SERVING_WARMUP_ITERATIONS = 3  # Forward passes per warmup batch size before reporting ready
+SERVING_MODEL_WATCH_SECONDS = 0  # Poll the model file and hot-reload on change; 0 disables
+SERVING_RELOAD_DRAIN_SECONDS = 5.0  # Grace period before the replaced batcher is stopped
+
+# Prediction cache for repeated frames (prediction_cache.py)
+PREDICTION_CACHE_SIZE = 1024  # Frames held; 0 disables the cache
+PREDICTION_CACHE_TTL_SECONDS = 2.0
+PREDICTION_CACHE_MODE = "exact"  # "exact" or "perceptual" (near-duplicates share an entry)
+PREDICTION_CACHE_LEVELS = 16  # Grey levels per 4x4 block in perceptual mode
+
+# ASGI server (asgi_server.py)
+ASGI_MAX_CONCURRENCY = 64  # Requests handled at once before shedding with 503
+ASGI_EXECUTOR_WORKERS = 4  # Threads for CPU-bound decoding
+ASGI_KEEPALIVE_SECONDS = 75
+ASGI_MAX_STREAMS = 256  # Concurrent WebSocket sessions on /api/focus/stream
+ASGI_STREAM_IDLE_SECONDS = 30.0  # Streams without a frame for this long are closed
+
+# Pre-fork launcher (prefork.py)
+PREFORK_WORKERS = 0  # 0 = one worker per PREFORK_THREADS_PER_WORKER cores
+PREFORK_THREADS_PER_WORKER = 1
+PREFORK_HTTP_THREADS = 8  # waitress request threads per worker (feed its micro-batcher)
+
+# Temporal smoothing of predictions (smoothing.py)
+SMOOTHING_WINDOW = 10  # Predictions in each identity's majority vote
+SMOOTHING_IDLE_SECONDS = 5.0  # Identities not seen for this long are evicted
+MAX_SMOOTHING_IDENTITIES = 64
+
+# Webcam face detection scheduling (face_tracking.py)
+DETECT_EVERY_N_FRAMES = 5  # Run the Haar cascade at most this many frames apart
+DETECT_DOWNSCALE = 0.5  # Cascade runs on the frame resized by this factor
+TRACK_MIN_SCORE = 0.6  # Template-match score below which the cascade reruns
+TRACK_SEARCH_MARGIN = 0.25  # Search window padding, as a fraction of face size
+
+# Offline batch inference (batch_inference.py)
+BATCH_INFERENCE_SIZE = 64  # Face crops per forward pass
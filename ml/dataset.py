@@ -6,34 +6,87 @@ from typing import Tuple, List
 
 import numpy as np
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 from PIL import Image
 from tqdm import tqdm
 
-from config import DATA_DIR, EMOTION_TO_FOCUS, BATCH_SIZE
+from config import (
+    DATA_DIR, EMOTION_TO_FOCUS, BATCH_SIZE,
+    STREAMING_DATASET, SHARD_DIR, SHUFFLE_BUFFER_SIZE, STREAMING_WORKERS,
+)
+
+
+def random_horizontal_flip(images: torch.Tensor, p: float = 0.5) -> torch.Tensor:
+    """Flip a random subset (probability p each) of a [B, 1, H, W] batch left-right."""
+    flip = torch.rand(images.shape[0]) < p
+    images[flip] = images[flip].flip(3)
+    return images
+
+
+# Augmentations applied to whole training batches, in order.
+# Each takes and returns a normalized float [B, 1, 48, 48] tensor.
+BATCH_AUGMENTATIONS = [
+    random_horizontal_flip,
+]
+
+
+def prepare_batch(pixels: np.ndarray, augmentations=()) -> torch.Tensor:
+    """Normalize and augment writable uint8 [B, 48, 48] pixels into a float [B, 1, 48, 48] batch."""
+    images = torch.from_numpy(pixels).unsqueeze(1)
+    images = images.float().div_(255.0)
+    
+    for augment in augmentations:
+        images = augment(images)
+    
+    return images
 
 
 class FER2013Dataset(Dataset):
-    """FER2013 dataset from image folders."""
+    """
+    FER2013 dataset held as uint8 pixels (1 byte per pixel).
+    
+    Indexed with a list of indices (one batch from a BatchSampler), it
+    gathers the whole batch at once and normalizes and augments it with
+    vectorized tensor ops; see `make_loader`. Integer indexing still returns
+    a single (image, label) pair.
+    """
     
     def __init__(self, images: np.ndarray, labels: np.ndarray, augment: bool = False):
-        self.images = torch.FloatTensor(images).unsqueeze(1)  # Add channel dim
-        self.labels = torch.LongTensor(labels)
-        self.augment = augment
+        if images.dtype != np.uint8:
+            # Normalized float images from load_fer2013_images
+            images = np.rint(images * 255.0).astype(np.uint8)
+        self.images = images  # [N, 48, 48], may be a read-only memmap
+        self.labels = torch.from_numpy(np.asarray(labels, dtype=np.int64))
+        self.augmentations = BATCH_AUGMENTATIONS if augment else []
     
     def __len__(self) -> int:
         return len(self.labels)
     
-    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, torch.Tensor]:
-        image = self.images[idx]
-        label = self.labels[idx]
-        
-        if self.augment:
-            # Random horizontal flip
-            if torch.rand(1) > 0.5:
-                image = torch.flip(image, dims=[2])
+    def __getitem__(self, idx) -> Tuple[torch.Tensor, torch.Tensor]:
+        if isinstance(idx, (int, np.integer)):
+            images, labels = self.get_batch([idx])
+            return images[0], labels[0]
+        return self.get_batch(idx)
+    
+    def get_batch(self, indices) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Gather, normalize and augment a batch: float [B, 1, 48, 48], int64 [B]."""
+        indices = np.asarray(indices, dtype=np.int64)
         
-        return image, label
+        # Fancy indexing copies, so the batch is writable even from a memmap
+        images = prepare_batch(self.images[indices], self.augmentations)
+        return images, self.labels[torch.from_numpy(indices)]
+
+
+def make_loader(dataset: FER2013Dataset, shuffle: bool, batch_size: int = BATCH_SIZE) -> DataLoader:
+    """DataLoader that fetches whole batches of indices from the dataset at once."""
+    sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,  # Batches come pre-collated from FER2013Dataset.get_batch
+        num_workers=0,
+        pin_memory=True
+    )
 
 
 # Emotion folder names to index mapping
@@ -48,6 +101,44 @@ EMOTION_FOLDERS = {
 }
 
 
+def list_image_files(folder_path: Path, max_per_class: int = None) -> Tuple[List[Path], List[int]]:
+    """
+    List image files under the emotion folders of `folder_path`.
+    
+    Returns:
+        image_files: paths in the order load_images_from_folder reads them
+        emotions: emotion index (EMOTION_FOLDERS) of each file
+    """
+    image_files = []
+    emotions = []
+    
+    for emotion_name, emotion_idx in EMOTION_FOLDERS.items():
+        emotion_folder = folder_path / emotion_name
+        if not emotion_folder.exists():
+            continue
+        
+        files = list(emotion_folder.glob('*.jpg')) + list(emotion_folder.glob('*.png'))
+        if max_per_class:
+            files = files[:max_per_class]
+        
+        image_files.extend(files)
+        emotions.extend([emotion_idx] * len(files))
+    
+    return image_files, emotions
+
+
+def decode_image(img_path: Path) -> np.ndarray:
+    """Load an image file as 48x48 uint8 grayscale pixels."""
+    # Load image as grayscale
+    img = Image.open(img_path).convert('L')
+    
+    # Resize to 48x48 if needed
+    if img.size != (48, 48):
+        img = img.resize((48, 48), Image.Resampling.LANCZOS)
+    
+    return np.asarray(img, dtype=np.uint8)
+
+
 def load_images_from_folder(folder_path: Path, max_per_class: int = None) -> Tuple[List, List]:
     """
     Load images from a folder structure like:
@@ -85,15 +176,8 @@ def load_images_from_folder(folder_path: Path, max_per_class: int = None) -> Tup
         
         for img_path in image_files:
             try:
-                # Load image as grayscale
-                img = Image.open(img_path).convert('L')
-                
-                # Resize to 48x48 if needed
-                if img.size != (48, 48):
-                    img = img.resize((48, 48), Image.Resampling.LANCZOS)
-                
                 # Convert to numpy and normalize
-                img_array = np.array(img, dtype=np.float32) / 255.0
+                img_array = decode_image(img_path).astype(np.float32) / 255.0
                 
                 images.append(img_array)
                 labels.append(focus_label)
@@ -108,10 +192,137 @@ def load_images_from_folder(folder_path: Path, max_per_class: int = None) -> Tup
     return images, labels
 
 
-def load_fer2013_images(max_per_class: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+def _decode_chunk(image_files: List[Path]) -> Tuple[np.ndarray, np.ndarray, List[Tuple[int, str]]]:
+    """Worker: decode a chunk of files into one uint8 array."""
+    images = np.zeros((len(image_files), 48, 48), dtype=np.uint8)
+    ok = np.ones(len(image_files), dtype=bool)
+    errors = []
+    
+    for i, img_path in enumerate(image_files):
+        try:
+            images[i] = decode_image(img_path)
+        except Exception as e:
+            ok[i] = False
+            errors.append((i, f"{type(e).__name__}: {e}"))
+    
+    return images, ok, errors
+
+
+def decode_images_parallel(
+    image_files: List[Path], num_workers: int = None, chunk_size: int = None
+) -> Tuple[np.ndarray, np.ndarray, List[dict]]:
+    """
+    Decode image files across a process pool into one preallocated array.
+    
+    Args:
+        image_files: Files to decode
+        num_workers: Worker processes (default: all cores; 1 decodes in-process)
+        chunk_size: Files per task (default: ~4 chunks per worker, capped at 512)
+    
+    Returns:
+        images: uint8 [N, 48, 48] in the order of `image_files`
+        ok: bool [N], False where decoding failed (those rows are zero)
+        errors: [{"path": ..., "error": ...}] for every failed file
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    
+    num_workers = num_workers or os.cpu_count() or 1
+    images = np.empty((len(image_files), 48, 48), dtype=np.uint8)
+    ok = np.empty(len(image_files), dtype=bool)
+    errors = []
+    
+    if not image_files:
+        return images, ok, errors
+    
+    chunk_size = chunk_size or max(1, min(512, -(-len(image_files) // (num_workers * 4))))
+    starts = range(0, len(image_files), chunk_size)
+    chunks = [image_files[start:start + chunk_size] for start in starts]
+    
+    if num_workers == 1:
+        results = map(_decode_chunk, chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        results = executor.map(_decode_chunk, chunks)
+    
+    try:
+        for start, (chunk_images, chunk_ok, chunk_errors) in zip(starts, results):
+            end = start + len(chunk_images)
+            images[start:end] = chunk_images
+            ok[start:end] = chunk_ok
+            errors.extend(
+                {"path": str(image_files[start + i]), "error": message}
+                for i, message in chunk_errors
+            )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    
+    return images, ok, errors
+
+
+def load_images_parallel(
+    folder_path: Path, max_per_class: int = None, num_workers: int = None
+) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Parallel counterpart of load_images_from_folder.
+    
+    Produces exactly the same images and labels (same order, failed files
+    skipped) as the serial loader, decoded across `num_workers` processes.
+    
+    Returns:
+        images: float32 [N, 48, 48] normalized to [0, 1]
+        labels: int64 [N] focus labels (0=Focused, 1=Distracted)
+        report: {"folder", "total", "loaded", "per_class", "missing_folders",
+                 "errors", "workers", "seconds"}
+    """
+    import time
+    
+    start = time.perf_counter()
+    image_files, emotions = list_image_files(folder_path, max_per_class)
+    pixels, ok, errors = decode_images_parallel(image_files, num_workers)
+    
+    emotions = np.array(emotions, dtype=np.int64)[ok]
+    focus = np.array([EMOTION_TO_FOCUS.get(idx, 1) for idx in range(len(EMOTION_FOLDERS))], dtype=np.int64)
+    images = pixels[ok].astype(np.float32) / 255.0
+    labels = focus[emotions]
+    
+    report = {
+        "folder": str(folder_path),
+        "total": len(image_files),
+        "loaded": int(ok.sum()),
+        "per_class": {
+            name: int((emotions == idx).sum()) for name, idx in EMOTION_FOLDERS.items()
+        },
+        "missing_folders": [
+            name for name in EMOTION_FOLDERS if not (folder_path / name).exists()
+        ],
+        "errors": errors,
+        "workers": num_workers or os.cpu_count() or 1,
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return images, labels, report
+
+
+def print_ingest_report(report: dict):
+    """One-line summary of a load_images_parallel report, plus any failures."""
+    print(f"  {report['loaded']}/{report['total']} images from {report['folder']} "
+          f"in {report['seconds']:.1f}s ({report['workers']} workers)")
+    for name in report["missing_folders"]:
+        print(f"  Warning: Folder not found: {name}")
+    for error in report["errors"]:
+        print(f"  Error loading {error['path']}: {error['error']}")
+
+
+def load_fer2013_images(
+    max_per_class: int = None, num_workers: int = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
     """
     Load FER2013 dataset from image folder structure.
     
+    Images are decoded in parallel across `num_workers` processes
+    (default: all cores).
+    
     Expected structure:
     data/
         train/
@@ -129,11 +340,13 @@ def load_fer2013_images(max_per_class: int = None) -> Tuple[np.ndarray, np.ndarr
         raise FileNotFoundError(f"Training folder not found: {train_dir}")
     
     print("Loading training images...")
-    train_images, train_labels = load_images_from_folder(train_dir, max_per_class)
+    train_images, train_labels, report = load_images_parallel(train_dir, max_per_class, num_workers)
+    print_ingest_report(report)
     
     print("\nLoading test images...")
     if test_dir.exists():
-        test_images, test_labels = load_images_from_folder(test_dir, max_per_class)
+        test_images, test_labels, report = load_images_parallel(test_dir, max_per_class, num_workers)
+        print_ingest_report(report)
     else:
         # If no test folder, split training data
         print("  No test folder found, splitting training data (80/20)...")
@@ -157,17 +370,34 @@ def load_fer2013_images(max_per_class: int = None) -> Tuple[np.ndarray, np.ndarr
     )
 
 
-def get_dataloaders(max_per_class: int = None) -> Tuple[DataLoader, DataLoader]:
+def get_dataloaders(
+    max_per_class: int = None, use_cache: bool = True, streaming: bool = STREAMING_DATASET
+) -> Tuple[DataLoader, DataLoader]:
     """
     Create train and test dataloaders from image folders.
     
     Args:
         max_per_class: Limit images per emotion class (for faster testing)
+        use_cache: Read the memory-mapped dataset cache (compiled on first use)
+            instead of decoding every image
+        streaming: Stream shards from SHARD_DIR (see sharded_dataset.py)
+            with flat memory use instead of loading the whole dataset;
+            `use_cache` does not apply and `max_per_class` is not supported
     
     Returns:
         train_loader, test_loader
     """
-    train_imgs, train_lbls, test_imgs, test_lbls = load_fer2013_images(max_per_class)
+    if streaming:
+        if max_per_class is not None:
+            raise ValueError("max_per_class is not supported with streaming=True; "
+                             "write smaller shards with sharded_dataset.py instead")
+        return get_streaming_dataloaders()
+    
+    if use_cache:
+        from dataset_cache import load_fer2013_cached
+        train_imgs, train_lbls, test_imgs, test_lbls = load_fer2013_cached(max_per_class)
+    else:
+        train_imgs, train_lbls, test_imgs, test_lbls = load_fer2013_images(max_per_class)
     
     print(f"\n=== Dataset Summary ===")
     print(f"Training samples: {len(train_imgs)}")
@@ -180,29 +410,47 @@ def get_dataloaders(max_per_class: int = None) -> Tuple[DataLoader, DataLoader]:
     train_dataset = FER2013Dataset(train_imgs, train_lbls, augment=True)
     test_dataset = FER2013Dataset(test_imgs, test_lbls, augment=False)
     
-    train_loader = DataLoader(
-        train_dataset, 
-        batch_size=BATCH_SIZE, 
-        shuffle=True,
-        num_workers=0,
-        pin_memory=True
-    )
+    train_loader = make_loader(train_dataset, shuffle=True)
+    test_loader = make_loader(test_dataset, shuffle=False)
     
-    test_loader = DataLoader(
-        test_dataset, 
-        batch_size=BATCH_SIZE, 
-        shuffle=False,
-        num_workers=0,
-        pin_memory=True
+    return train_loader, test_loader
+
+
+def get_streaming_dataloaders() -> Tuple[DataLoader, DataLoader]:
+    """Create train and test dataloaders that stream shards from SHARD_DIR."""
+    from sharded_dataset import ShardedFaceDataset, make_streaming_loader
+    
+    train_dataset = ShardedFaceDataset(
+        SHARD_DIR / "train", shuffle=True, augment=True, buffer_size=SHUFFLE_BUFFER_SIZE
     )
+    test_dataset = ShardedFaceDataset(SHARD_DIR / "test", shuffle=False, augment=False)
+    
+    print(f"\n=== Dataset Summary (streaming from {SHARD_DIR}) ===")
+    for name, dataset in (("Training", train_dataset), ("Testing", test_dataset)):
+        counts = dataset.label_counts()
+        print(f"{name} samples: {dataset.num_samples} in {len(dataset.index['shards'])} shards")
+        print(f"  - Focused: {counts.get(0, 0)}")
+        print(f"  - Distracted: {counts.get(1, 0)}")
+    
+    train_loader = make_streaming_loader(train_dataset, num_workers=STREAMING_WORKERS)
+    test_loader = make_streaming_loader(test_dataset, num_workers=STREAMING_WORKERS)
     
     return train_loader, test_loader
 
 
 if __name__ == "__main__":
+    # Check the parallel loader against the serial one
+    print("Checking parallel loader against serial loader...")
+    serial_imgs, serial_lbls = load_images_from_folder(DATA_DIR / "train", max_per_class=100)
+    parallel_imgs, parallel_lbls, report = load_images_parallel(DATA_DIR / "train", max_per_class=100)
+    print_ingest_report(report)
+    assert np.array_equal(np.array(serial_imgs), parallel_imgs)
+    assert np.array_equal(np.array(serial_lbls), parallel_lbls)
+    print("Parallel loader matches serial loader\n")
+    
     # Test loading
     print("Testing dataset loading...")
-    train_loader, test_loader = get_dataloaders(max_per_class=100)
+    train_loader, test_loader = get_dataloaders(max_per_class=100, streaming=False)
     print(f"\nTrain batches: {len(train_loader)}")
     print(f"Test batches: {len(test_loader)}")
     
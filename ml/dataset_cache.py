@@ -0,0 +1,201 @@
+"""
+Preprocessed dataset cache in memory-mapped .npy format.
+
+Decoding ~36k JPEGs is the slowest part of starting training. This module
+compiles each data/ split once into:
+
+    data/cache/<split>_images.npy    uint8 [N, 48, 48]
+    data/cache/<split>_labels.npy    uint8 [N] focus labels
+    data/cache/<split>_emotions.npy  uint8 [N] emotion indices
+    data/cache/<split>.json          manifest
+
+The manifest stores a fingerprint over every source file's path, size and
+mtime plus the label mapping, so the cache is rebuilt automatically when
+data/ or EMOTION_TO_FOCUS changes. Loading is a pair of np.load(mmap_mode='r')
+calls and decodes no images.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+from config import DATA_DIR, CACHE_DIR, EMOTION_TO_FOCUS
+from dataset import EMOTION_FOLDERS, list_image_files, decode_images_parallel
+
+# Bump when the on-disk layout or preprocessing changes
+CACHE_VERSION = 1
+
+ARRAYS = ("images", "labels", "emotions")
+
+
+def _array_path(split: str, name: str) -> Path:
+    return CACHE_DIR / f"{split}_{name}.npy"
+
+
+def _manifest_path(split: str) -> Path:
+    return CACHE_DIR / f"{split}.json"
+
+
+def fingerprint(split: str) -> str:
+    """Hash of every source file's relative path, size and mtime plus the label mapping."""
+    split_dir = DATA_DIR / split
+    image_files, _ = list_image_files(split_dir)
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        "version": CACHE_VERSION,
+        "emotion_folders": EMOTION_FOLDERS,
+        "emotion_to_focus": {str(k): v for k, v in EMOTION_TO_FOCUS.items()},
+    }, sort_keys=True).encode())
+
+    for path in image_files:
+        stat = path.stat()
+        digest.update(f"{path.relative_to(split_dir).as_posix()}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+
+    return digest.hexdigest()
+
+
+def is_fresh(split: str) -> bool:
+    """True if the cached split exists and matches the current data/ contents."""
+    manifest_path = _manifest_path(split)
+    if not manifest_path.exists():
+        return False
+    if not all(_array_path(split, name).exists() for name in ARRAYS):
+        return False
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return manifest.get("fingerprint") == fingerprint(split)
+
+
+def compile_split(split: str, num_workers: int = None) -> dict:
+    """
+    Decode a data/ split once and write it to the cache.
+
+    Images are decoded across `num_workers` processes (default: all cores).
+    Files that fail to decode are skipped (as in load_images_from_folder)
+    and listed in the manifest.
+
+    Returns:
+        The written manifest
+    """
+    split_dir = DATA_DIR / split
+    if not split_dir.exists():
+        raise FileNotFoundError(f"Split folder not found: {split_dir}")
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    # Fingerprint before decoding so files changed mid-compile trigger a rebuild
+    split_fingerprint = fingerprint(split)
+    image_files, emotions = list_image_files(split_dir)
+
+    images, keep, errors = decode_images_parallel(image_files, num_workers)
+
+    emotions = np.array(emotions, dtype=np.uint8)
+    arrays = {
+        "images": images[keep],
+        "emotions": emotions[keep],
+        "labels": np.array([EMOTION_TO_FOCUS.get(int(e), 1) for e in emotions[keep]], dtype=np.uint8),
+    }
+
+    # Write arrays, then the manifest last, each via atomic rename
+    for name, array in arrays.items():
+        tmp_path = _array_path(split, name).with_suffix(".tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, _array_path(split, name))
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "split": split,
+        "fingerprint": split_fingerprint,
+        "count": int(keep.sum()),
+        "errors": errors,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    tmp_path = _manifest_path(split).with_suffix(".json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, _manifest_path(split))
+
+    print(f"  {split}: cached {manifest['count']} images in {time.perf_counter() - start:.1f}s"
+          + (f" ({len(errors)} failed)" if errors else ""))
+    return manifest
+
+
+def load_split(split: str, max_per_class: int = None, rebuild: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Open a cached split, compiling it first if missing or stale.
+
+    Args:
+        split: Folder name under data/ ("train" or "test")
+        max_per_class: Keep only the first N images of each emotion
+        rebuild: Recompile when stale (otherwise raise)
+
+    Returns:
+        images: uint8 [N, 48, 48] (memory-mapped when max_per_class is None)
+        labels: uint8 [N] focus labels (0=Focused, 1=Distracted)
+    """
+    if not is_fresh(split):
+        if not rebuild:
+            raise RuntimeError(f"Dataset cache for '{split}' is missing or stale")
+        print(f"  {split}: cache missing or stale, compiling...")
+        compile_split(split)
+
+    images = np.load(_array_path(split, "images"), mmap_mode="r")
+    labels = np.load(_array_path(split, "labels"))
+
+    if max_per_class:
+        emotions = np.load(_array_path(split, "emotions"))
+        indices = np.concatenate([
+            np.flatnonzero(emotions == emotion_idx)[:max_per_class]
+            for emotion_idx in EMOTION_FOLDERS.values()
+        ])
+        images, labels = images[indices], labels[indices]
+
+    return images, labels
+
+
+def load_fer2013_cached(max_per_class: int = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cached counterpart of dataset.load_fer2013_images.
+
+    Returns:
+        train_images, train_labels, test_images, test_labels (images as uint8)
+    """
+    train_images, train_labels = load_split("train", max_per_class)
+
+    if (DATA_DIR / "test").exists():
+        test_images, test_labels = load_split("test", max_per_class)
+    else:
+        # If no test folder, split training data
+        print("  No test folder found, splitting training data (80/20)...")
+        split_idx = int(len(train_images) * 0.8)
+        indices = np.random.permutation(len(train_images))
+        test_images, test_labels = train_images[indices[split_idx:]], train_labels[indices[split_idx:]]
+        train_images, train_labels = train_images[indices[:split_idx]], train_labels[indices[:split_idx]]
+
+    return train_images, train_labels, test_images, test_labels
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile data/ into the memory-mapped dataset cache")
+    parser.add_argument("--force", action="store_true", help="Recompile even if the cache is fresh")
+    parser.add_argument("--workers", type=int, default=None, help="Decode processes (default: all cores)")
+    args = parser.parse_args()
+
+    print(f"Compiling dataset cache into {CACHE_DIR}...")
+    for split in ("train", "test"):
+        if not (DATA_DIR / split).exists():
+            continue
+        if args.force or not is_fresh(split):
+            compile_split(split, args.workers)
+        else:
+            print(f"  {split}: up to date")
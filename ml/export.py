@@ -1,10 +1,15 @@
 """Export trained model to ONNX format for web deployment."""
 
+import argparse
+import time
+
 import torch
 from pathlib import Path
 
-from config import MODEL_DIR, MODEL_PATH, CLASS_NAMES
-from model import get_model
+from config import MODEL_DIR, MODEL_PATH, CLASS_NAMES, TORCHSCRIPT_MODEL_PATH, WEIGHTS_MODEL_PATH
+from model import (
+    get_model, strip_for_inference, prepare_for_inference, check_inference_parity, load_inference_model,
+)
 
 
 def export_to_onnx(model_path: str = None, output_path: str = None):
@@ -22,10 +27,9 @@ def export_to_onnx(model_path: str = None, output_path: str = None):
     print("Exporting Model to ONNX")
     print("=" * 50)
     
-    # Load model
+    # Load model; BatchNorm is folded and Dropout removed before export
     print(f"Loading model from: {model_path}")
-    model = get_model(pretrained_path=model_path)
-    model.eval()
+    model = strip_for_inference(get_model(pretrained_path=model_path))
     
     # Create dummy input (batch_size=1, channels=1, height=48, width=48)
     dummy_input = torch.randn(1, 1, 48, 48)
@@ -73,5 +77,102 @@ def export_to_onnx(model_path: str = None, output_path: str = None):
     print(f"Use this file with ONNX.js in your web app.")
 
 
+def export_torchscript(model_path: str = None, output_path: str = None, atol: float = 1e-4):
+    """
+    Write the frozen inference graph from `prepare_for_inference`.
+    
+    Args:
+        model_path: Path to trained .pth model
+        output_path: Output path for the .ts file
+        atol: Maximum allowed logit difference from the training graph
+    """
+    model_path = model_path or str(MODEL_PATH)
+    output_path = output_path or str(TORCHSCRIPT_MODEL_PATH)
+    
+    print("=" * 50)
+    print("Exporting Inference-Optimized TorchScript")
+    print("=" * 50)
+    
+    print(f"Loading model from: {model_path}")
+    model = get_model(pretrained_path=model_path).eval()
+    prepared = prepare_for_inference(model)
+    
+    print(f"Exporting to: {output_path}")
+    torch.jit.save(prepared, output_path)
+    
+    # Verify the artifact as the inference paths load it (fused where supported)
+    loaded = load_inference_model(output_path)
+    max_diff = check_inference_parity(model, loaded, atol=atol)
+    print(f"Parity vs training graph: PASSED (max logit diff {max_diff:.2e})")
+    
+    batch = torch.rand(1, 1, 48, 48)
+    with torch.no_grad():
+        for name, candidate in (("training graph", model), ("prepared", loaded)):
+            for _ in range(10):
+                candidate(batch)
+            start = time.perf_counter()
+            for _ in range(200):
+                candidate(batch)
+            print(f"  {name:<15} {1000 * (time.perf_counter() - start) / 200:.3f} ms / image")
+    
+    print(f"\nModel exported successfully!")
+    print(f"Serve it with INFERENCE_BACKEND=torchscript or `python inference.py --model {output_path}`.")
+
+
+def export_weights(model_path: str = None, output_path: str = None):
+    """
+    Write a slim inference checkpoint: the model weights and architecture only.
+    
+    Training checkpoints also carry the optimizer state (Adam moments, twice
+    the size of the weights) and Python objects that need a full unpickle.
+    The slim file loads with `torch.load(weights_only=True)` and `get_model`
+    reads it like any other checkpoint.
+    
+    Args:
+        model_path: Path to trained .pth model
+        output_path: Output path for the weights-only .pth file
+    """
+    model_path = model_path or str(MODEL_PATH)
+    output_path = output_path or str(WEIGHTS_MODEL_PATH)
+    
+    print("=" * 50)
+    print("Exporting Inference Weights")
+    print("=" * 50)
+    
+    print(f"Loading checkpoint from: {model_path}")
+    checkpoint = torch.load(model_path, map_location="cpu", weights_only=False)
+    slim = {
+        'model_state_dict': {key: value.detach().cpu() for key, value in checkpoint['model_state_dict'].items()},
+        'class_names': list(checkpoint.get('class_names', CLASS_NAMES)),
+    }
+    for key in ('model_name', 'model_config', 'test_acc'):
+        if key in checkpoint:
+            slim[key] = checkpoint[key]
+    
+    print(f"Exporting to: {output_path}")
+    torch.save(slim, output_path)
+    
+    # Verify it loads without unpickling arbitrary objects and matches the source
+    loaded = torch.load(output_path, map_location="cpu", weights_only=True)
+    for key, value in checkpoint['model_state_dict'].items():
+        if not torch.equal(loaded['model_state_dict'][key], value.cpu()):
+            raise AssertionError(f"Weight mismatch for {key}")
+    
+    before, after = Path(model_path).stat().st_size, Path(output_path).stat().st_size
+    print(f"Size: {before / 2**20:.2f} MB -> {after / 2**20:.2f} MB")
+    print(f"\nModel exported successfully!")
+    print(f"The API server's torch backend loads it by default when it is newer than {MODEL_PATH.name}.")
+
+
 if __name__ == "__main__":
-    export_to_onnx()
+    parser = argparse.ArgumentParser(description="Export the trained model for deployment")
+    parser.add_argument("--format", choices=["onnx", "torchscript", "weights", "all"], default="onnx")
+    parser.add_argument("--model", type=str, default=None, help="Checkpoint path")
+    args = parser.parse_args()
+    
+    if args.format in ("onnx", "all"):
+        export_to_onnx(args.model)
+    if args.format in ("torchscript", "all"):
+        export_torchscript(args.model)
+    if args.format in ("weights", "all"):
+        export_weights(args.model)
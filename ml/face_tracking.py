@@ -0,0 +1,172 @@
+"""
+Face detection scheduling for real-time inference.
+
+The Haar cascade is the most expensive per-frame step on CPU. `FaceTracker`
+runs it only every N frames (or sooner when tracking degrades), on a
+downscaled frame, and follows each face between detections by template
+matching in a small window around its last position.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from config import DETECT_EVERY_N_FRAMES, DETECT_DOWNSCALE, TRACK_MIN_SCORE, TRACK_SEARCH_MARGIN
+
+# Smallest face (in full-resolution pixels) the cascade reports
+MIN_FACE_SIZE = 80
+# Native window of haarcascade_frontalface_default.xml
+CASCADE_WINDOW = 24
+
+
+class Track:
+    """A face followed across frames."""
+
+    def __init__(self, track_id: int, box, template: np.ndarray):
+        self.id = track_id
+        self.box = box  # (x, y, w, h) in downscaled-frame pixels
+        self.template = template
+        self.score = 1.0
+
+
+def iou(a, b) -> float:
+    """Intersection over union of two (x, y, w, h) boxes."""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """
+    Detect faces every few frames and track them in between.
+
+    Args:
+        cascade: cv2.CascadeClassifier used for detection
+        detect_every: Run the cascade at least once every this many frames
+            (1 = every frame, the untracked behavior)
+        downscale: Resize factor applied before detection and tracking
+        min_score: Template-match score (TM_CCOEFF_NORMED) below which a
+            track is considered lost and the cascade reruns on that frame
+        search_margin: Padding of the tracking search window as a fraction
+            of the face size; larger follows faster motion but costs more
+    """
+
+    def __init__(
+        self,
+        cascade,
+        detect_every: int = DETECT_EVERY_N_FRAMES,
+        downscale: float = DETECT_DOWNSCALE,
+        min_score: float = TRACK_MIN_SCORE,
+        search_margin: float = TRACK_SEARCH_MARGIN,
+    ):
+        if detect_every < 1:
+            raise ValueError("detect_every must be at least 1")
+        if not 0 < downscale <= 1:
+            raise ValueError("downscale must be in (0, 1]")
+
+        self.cascade = cascade
+        self.detect_every = detect_every
+        self.downscale = downscale
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.min_size = max(CASCADE_WINDOW, int(round(MIN_FACE_SIZE * downscale)))
+
+        self.tracks = []
+        self._next_id = 0
+        self._since_detect = detect_every  # Detect on the first frame
+
+        # Stats
+        self.frames = 0
+        self.detections = 0
+        self.detect_seconds = 0.0
+        self.track_seconds = 0.0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.downscale == 1:
+            return gray
+        return cv2.resize(gray, None, fx=self.downscale, fy=self.downscale, interpolation=cv2.INTER_AREA)
+
+    def _detect(self, small: np.ndarray):
+        start = time.perf_counter()
+        boxes = self.cascade.detectMultiScale(
+            small, scaleFactor=1.1, minNeighbors=5, minSize=(self.min_size, self.min_size)
+        )
+        self.detect_seconds += time.perf_counter() - start
+        self.detections += 1
+        self._since_detect = 0
+
+        # Carry identities over to the new boxes by greedy IoU matching
+        previous = list(self.tracks)
+        tracks = []
+        for box in (tuple(int(v) for v in b) for b in boxes):
+            best = max(previous, key=lambda t: iou(t.box, box), default=None)
+            if best is not None and iou(best.box, box) > 0.3:
+                previous.remove(best)
+                track_id = best.id
+            else:
+                track_id = self._next_id
+                self._next_id += 1
+            x, y, w, h = box
+            tracks.append(Track(track_id, box, small[y:y+h, x:x+w].copy()))
+        self.tracks = tracks
+
+    def _track(self, small: np.ndarray) -> bool:
+        """Move every track to its best template match; False if any was lost."""
+        start = time.perf_counter()
+        height, width = small.shape[:2]
+        ok = True
+        for track in self.tracks:
+            x, y, w, h = track.box
+            pad_x, pad_y = int(w * self.search_margin) + 1, int(h * self.search_margin) + 1
+            x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+            x1, y1 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+            window = small[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                # Face moved partly out of frame
+                track.score = 0.0
+                ok = False
+                continue
+
+            result = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+            track.box = (x0 + dx, y0 + dy, w, h)
+            track.score = float(score)
+            ok = ok and score >= self.min_score
+        self.track_seconds += time.perf_counter() - start
+        return ok
+
+    def update(self, frame: np.ndarray) -> list:
+        """
+        Locate faces in the next frame.
+
+        Returns:
+            List of (track_id, (x, y, w, h)) in full-resolution pixels
+        """
+        self.frames += 1
+        small = self._prepare(frame)
+        self._since_detect += 1
+
+        if self._since_detect >= self.detect_every or not self.tracks or not self._track(small):
+            self._detect(small)
+
+        scale = 1.0 / self.downscale
+        return [
+            (track.id, tuple(int(round(v * scale)) for v in track.box))
+            for track in self.tracks
+        ]
+
+    def stats(self) -> dict:
+        """Detector calls, time spent, and the estimated time saved versus detecting every frame."""
+        per_detect = self.detect_seconds / self.detections if self.detections else 0.0
+        skipped = self.frames - self.detections
+        return {
+            'frames': self.frames,
+            'detections': self.detections,
+            'detect_ms': 1000 * per_detect,
+            'track_ms': 1000 * self.track_seconds / skipped if skipped else 0.0,
+            'saved_seconds': skipped * per_detect - self.track_seconds,
+        }
@@ -1,27 +1,38 @@
 """Real-time inference for focus detection using webcam."""
 
+import argparse
+import queue
+import time
+
 import cv2
 import numpy as np
 import torch
 import torch.nn.functional as F
-from collections import deque
 
-from config import DEVICE, MODEL_PATH, CLASS_NAMES
-from model import get_model
+from config import (
+    DEVICE, MODEL_PATH, CLASS_NAMES, DETECT_EVERY_N_FRAMES, DETECT_DOWNSCALE,
+    SMOOTHING_WINDOW, SMOOTHING_IDLE_SECONDS,
+)
+from face_tracking import FaceTracker
+from model import load_inference_model
+from pipeline import Pipeline, QueueClosed, StageStats
+from smoothing import TemporalSmoother
 
 
 class FocusDetector:
     """Real-time focus detection from webcam."""
     
-    def __init__(self, model_path: str = None, smoothing_window: int = 10):
+    def __init__(self, model_path: str = None, smoothing_window: int = SMOOTHING_WINDOW,
+                 idle_timeout: float = SMOOTHING_IDLE_SECONDS):
         self.device = DEVICE
         self.smoothing_window = smoothing_window
-        self.predictions = deque(maxlen=smoothing_window)
+        # One smoothing window per tracked face
+        self.smoother = TemporalSmoother(smoothing_window, idle_timeout)
         
-        # Load model
+        # Load model (a training checkpoint is stripped of BatchNorm/Dropout;
+        # a TorchScript artifact from export.py is used as is)
         path = model_path or str(MODEL_PATH)
-        self.model = get_model(pretrained_path=path).to(self.device)
-        self.model.eval()
+        self.model = load_inference_model(path, self.device)
         
         # Face detector
         self.face_cascade = cv2.CascadeClassifier(
@@ -30,39 +41,55 @@ class FocusDetector:
     
     def preprocess(self, face_img: np.ndarray) -> torch.Tensor:
         """Preprocess face image for model input."""
-        gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if len(face_img.shape) == 3 else face_img
-        resized = cv2.resize(gray, (48, 48))
-        normalized = resized.astype(np.float32) / 255.0
-        tensor = torch.FloatTensor(normalized).unsqueeze(0).unsqueeze(0)
+        return self.preprocess_batch([face_img])
+    
+    def preprocess_batch(self, face_imgs: list) -> torch.Tensor:
+        """Preprocess face crops into one [k, 1, 48, 48] model input."""
+        pixels = np.empty((len(face_imgs), 48, 48), dtype=np.uint8)
+        for i, face_img in enumerate(face_imgs):
+            gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY) if len(face_img.shape) == 3 else face_img
+            pixels[i] = cv2.resize(gray, (48, 48))
+        tensor = torch.from_numpy(pixels).unsqueeze(1).float().div_(255.0)
         return tensor.to(self.device)
     
-    def predict(self, face_img: np.ndarray) -> tuple:
+    def predict(self, face_img: np.ndarray, track_id=None) -> tuple:
         """
         Predict focus state from face image.
         
         Returns:
             (class_name, confidence, smoothed_class)
         """
-        input_tensor = self.preprocess(face_img)
+        return self.predict_batch([face_img], [track_id])[0]
+    
+    def predict_batch(self, face_imgs: list, track_ids: list = None) -> list:
+        """
+        Predict focus state for every face in a frame with one forward pass.
+        
+        Args:
+            face_imgs: Face crops (BGR or grayscale)
+            track_ids: Identity of each face for smoothing (None = one shared identity)
+        
+        Returns:
+            List of (class_name, confidence, smoothed_class), one per face
+        """
+        if not face_imgs:
+            return []
+        if track_ids is None:
+            track_ids = [None] * len(face_imgs)
+        
+        input_tensor = self.preprocess_batch(face_imgs)
         
         with torch.no_grad():
             output = self.model(input_tensor)
             probs = F.softmax(output, dim=1)
             confidence, predicted = probs.max(1)
         
-        self.predictions.append(predicted.item())
-        
-        # Smoothed prediction (majority vote)
-        if len(self.predictions) > 0:
-            smoothed = round(sum(self.predictions) / len(self.predictions))
-        else:
-            smoothed = predicted.item()
-        
-        return (
-            CLASS_NAMES[predicted.item()],
-            confidence.item() * 100,
-            CLASS_NAMES[smoothed]
-        )
+        results = []
+        for track_id, conf, pred in zip(track_ids, confidence.tolist(), predicted.tolist()):
+            # Smoothed prediction (majority vote over this face's history)
+            smoothed = self.smoother.update(track_id, pred)
+            results.append((CLASS_NAMES[pred], conf * 100, CLASS_NAMES[smoothed]))
+        return results
     
     def detect_face(self, frame: np.ndarray) -> list:
         """Detect faces in frame."""
@@ -73,83 +100,203 @@ class FocusDetector:
         return faces
 
 
-def run_webcam(model_path: str = None):
-    """Run real-time detection on webcam."""
+class FramePacket:
+    """A captured frame and the results attached to it by each pipeline stage."""
+    
+    def __init__(self, index: int, image: np.ndarray, timestamp: float):
+        self.index = index
+        self.image = image
+        self.timestamp = timestamp
+        self.faces = ()
+        self.track_ids = ()
+        self.results = []
+
+
+def open_capture(source):
+    """Open a camera index (int or digit string) or a video file path."""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source), isinstance(source, int)
+
+
+def capture_frames(cap, mirror: bool = False, pace_fps: float = None, max_frames: int = None):
+    """
+    Yield FramePackets from an open VideoCapture.
+    
+    Args:
+        cap: cv2.VideoCapture
+        mirror: Flip frames horizontally (webcam view)
+        pace_fps: Release frames no faster than this rate (replays a video
+            file like a live camera); None reads as fast as possible
+        max_frames: Stop after this many frames
+    """
+    start = time.perf_counter()
+    index = 0
+    while max_frames is None or index < max_frames:
+        if pace_fps:
+            delay = start + index / pace_fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if mirror:
+            frame = cv2.flip(frame, 1)
+        yield FramePacket(index, frame, time.perf_counter())
+        index += 1
+
+
+def draw_overlay(frame: np.ndarray, faces, results, focus_rate: float = None):
+    """Draw face boxes, confidences, the status bar and the focus rate in place."""
+    h, w = frame.shape[:2]
+    status = None
+    
+    for (x, y, fw, fh), (raw_pred, confidence, smoothed_pred) in zip(faces, results):
+        cv2.rectangle(frame, (x, y), (x+fw, y+fh), (0, 255, 0), 2)
+        cv2.putText(frame, f"{confidence:.0f}%", (x, y-10),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+        status = smoothed_pred
+    
+    # Draw status bar
+    color = (0, 180, 0) if status == "Focused" else (0, 0, 180) if status else (100, 100, 100)
+    cv2.rectangle(frame, (0, 0), (w, 60), color, -1)
+    
+    text = status.upper() if status else "NO FACE"
+    cv2.putText(frame, text, (20, 42), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+    
+    if focus_rate is not None:
+        cv2.putText(frame, f"Focus Rate: {focus_rate:.1f}%", (10, h-20),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+
+def run_webcam(model_path: str = None, source=0, headless: bool = False,
+               max_frames: int = None, every_frame: bool = False, report_every: float = 5.0,
+               detect_every: int = DETECT_EVERY_N_FRAMES, detect_scale: float = DETECT_DOWNSCALE):
+    """
+    Run real-time detection on a webcam or video file.
+    
+    Capture, face detection and inference run on their own threads connected
+    by bounded queues; rendering stays on the main thread (cv2.imshow). When a
+    stage falls behind, stale frames are dropped rather than queued.
+    
+    Args:
+        model_path: Trained checkpoint (defaults to MODEL_PATH)
+        source: Camera index or video file path
+        headless: Skip the preview window (e.g. for a video file on a server)
+        max_frames: Stop after this many frames
+        every_frame: For video files, process every frame as fast as possible
+            instead of replaying at the file's frame rate and dropping frames
+        report_every: Seconds between per-stage FPS / queue depth reports
+        detect_every: Run the face cascade at least every this many frames and
+            track faces in between (1 = detect on every frame)
+        detect_scale: Downscale factor for detection and tracking
+    """
     print("=" * 50)
     print("Focus Detection - Real-time Inference")
     print("=" * 50)
-    print("Press 'Q' to quit\n")
+    if not headless:
+        print("Press 'Q' to quit\n")
     
     detector = FocusDetector(model_path)
-    cap = cv2.VideoCapture(0)
+    cap, is_camera = open_capture(source)
     
     if not cap.isOpened():
-        print("Error: Could not open webcam")
+        print(f"Error: Could not open {'webcam' if is_camera else source}")
         return
     
+    pace_fps = None
+    if not is_camera and not every_frame:
+        pace_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    
+    tracker = FaceTracker(detector.face_cascade, detect_every=detect_every, downscale=detect_scale)
+    
+    def detect(packet):
+        tracked = tracker.update(packet.image)
+        packet.track_ids = [track_id for track_id, _ in tracked]
+        packet.faces = [box for _, box in tracked]
+        return packet
+    
+    def infer(packet):
+        crops = [packet.image[y:y+fh, x:x+fw] for (x, y, fw, fh) in packet.faces]
+        packet.results = detector.predict_batch(crops, packet.track_ids)
+        return packet
+    
+    pipeline = Pipeline(
+        capture_frames(cap, mirror=is_camera, pace_fps=pace_fps, max_frames=max_frames),
+        [("detect", detect), ("infer", infer)],
+        drop=is_camera or not every_frame,
+    ).start()
+    render_stats = StageStats()
+    
     # Stats
     focused_count = 0
     distracted_count = 0
+    total_latency = 0.0
+    last_report = time.perf_counter()
     
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame = cv2.flip(frame, 1)
-        h, w = frame.shape[:2]
-        
-        # Detect faces
-        faces = detector.detect_face(frame)
-        
-        status = None
-        
-        for (x, y, fw, fh) in faces:
-            # Draw face box
-            cv2.rectangle(frame, (x, y), (x+fw, y+fh), (0, 255, 0), 2)
+    try:
+        while True:
+            try:
+                packet = pipeline.get(timeout=0.05)
+            except queue.Empty:
+                if not headless and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                continue
+            except QueueClosed:
+                break
             
-            # Get prediction
-            face_roi = frame[y:y+fh, x:x+fw]
-            raw_pred, confidence, smoothed_pred = detector.predict(face_roi)
-            
-            status = smoothed_pred
+            start = time.perf_counter()
             
             # Track stats
-            if smoothed_pred == "Focused":
-                focused_count += 1
-            else:
-                distracted_count += 1
+            for _, _, smoothed_pred in packet.results:
+                if smoothed_pred == "Focused":
+                    focused_count += 1
+                else:
+                    distracted_count += 1
             
-            # Draw confidence
-            cv2.putText(frame, f"{confidence:.0f}%", (x, y-10),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        
-        # Draw status bar
-        color = (0, 180, 0) if status == "Focused" else (0, 0, 180) if status else (100, 100, 100)
-        cv2.rectangle(frame, (0, 0), (w, 60), color, -1)
-        
-        text = status.upper() if status else "NO FACE"
-        cv2.putText(frame, text, (20, 42), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
-        
-        # Focus rate
-        total = focused_count + distracted_count
-        if total > 0:
-            rate = 100 * focused_count / total
-            cv2.putText(frame, f"Focus Rate: {rate:.1f}%", (10, h-20),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-        
-        cv2.imshow("Focus Detection", frame)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            if not headless:
+                total = focused_count + distracted_count
+                draw_overlay(packet.image, packet.faces, packet.results,
+                             100 * focused_count / total if total else None)
+                cv2.imshow("Focus Detection", packet.image)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            
+            now = time.perf_counter()
+            render_stats.record(now - start)
+            total_latency += now - packet.timestamp
+            
+            if report_every and now - last_report >= report_every:
+                print(pipeline.report(render_stats))
+                last_report = now
+    finally:
+        pipeline.stop()
+        pipeline.join(timeout=1.0)
+        # Never release the capture under a capture stage still blocked in
+        # cap.read(); if it has not exited, process exit releases it
+        if not pipeline.stages[0].is_alive():
+            cap.release()
+        if not headless:
+            cv2.destroyAllWindows()
     
-    cap.release()
-    cv2.destroyAllWindows()
+    for stage, error in pipeline.errors():
+        print(f"Error in {stage} stage: {error}")
     
     # Summary
     print("\n" + "=" * 50)
     print("Session Summary")
     print("=" * 50)
+    print(f"{'Stage':<10}{'Frames':>8}{'FPS':>8}{'ms/frame':>10}{'Dropped':>9}")
+    for name, count, fps, busy_ms, dropped in pipeline.summary(render_stats):
+        print(f"{name:<10}{count:>8}{fps:>8.1f}{busy_ms:>10.2f}{dropped:>9}")
+    if render_stats.count:
+        print(f"Mean capture-to-render latency: {1000 * total_latency / render_stats.count:.1f} ms")
+    
+    tracking = tracker.stats()
+    if tracking['frames']:
+        print(f"Face detector ran on {tracking['detections']}/{tracking['frames']} frames "
+              f"({tracking['detect_ms']:.1f} ms each, tracking {tracking['track_ms']:.2f} ms/frame); "
+              f"saved {tracking['saved_seconds']:.2f}s")
     total = focused_count + distracted_count
     if total > 0:
         print(f"Focused: {focused_count} ({100*focused_count/total:.1f}%)")
@@ -157,4 +304,20 @@ def run_webcam(model_path: str = None):
 
 
 if __name__ == "__main__":
-    run_webcam()
+    parser = argparse.ArgumentParser(description="Real-time focus detection")
+    parser.add_argument("--model", type=str, default=None, help="Checkpoint path")
+    parser.add_argument("--source", type=str, default="0", help="Camera index or video file")
+    parser.add_argument("--headless", action="store_true", help="Run without a preview window")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--every-frame", action="store_true",
+                        help="Process every video frame instead of replaying in real time")
+    parser.add_argument("--report-every", type=float, default=5.0,
+                        help="Seconds between pipeline reports (0 to disable)")
+    parser.add_argument("--detect-every", type=int, default=DETECT_EVERY_N_FRAMES,
+                        help="Frames between face detections (1 = every frame)")
+    parser.add_argument("--detect-scale", type=float, default=DETECT_DOWNSCALE,
+                        help="Downscale factor for face detection (1 = full resolution)")
+    args = parser.parse_args()
+    
+    run_webcam(args.model, args.source, args.headless, args.max_frames,
+               args.every_frame, args.report_every, args.detect_every, args.detect_scale)
@@ -0,0 +1,239 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are plain Python objects guarded by a lock
+per labelled child, so recording a sample costs a dict lookup, a bisect and
+an integer increment. Bind label values once (`metric.labels(...)`) on hot
+paths to skip the lookup.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds; covers sub-millisecond decode steps up to multi-second stalls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric family with optional labels."""
+
+    type = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """Child metric for one combination of label values (cached)."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.labels(**labels).dec(amount)
+
+    def set(self, value: float, **labels):
+        self.labels(**labels).set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the wall-clock duration of the `with` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        return self.labels(**labels).time()
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# Focus detection API metrics
+
+REQUESTS = Counter(
+    "focus_api_requests_total", "HTTP requests handled, by endpoint and status code.",
+    ("endpoint", "status"),
+)
+ERRORS = Counter(
+    "focus_api_errors_total", "Requests that failed with a 4xx/5xx status, by endpoint.",
+    ("endpoint",),
+)
+REJECTED = Counter(
+    "focus_api_rejected_total", "Requests shed with 503 because the concurrency limit was reached.",
+    ("endpoint",),
+)
+IN_FLIGHT = Gauge(
+    "focus_api_requests_in_flight", "Requests currently being handled.",
+)
+REQUEST_SECONDS = Histogram(
+    "focus_api_request_duration_seconds", "End-to-end request latency, by endpoint.",
+    ("endpoint",),
+)
+STAGE_SECONDS = Histogram(
+    "focus_api_stage_duration_seconds",
+    "Latency of each request stage: decode (base64/body parsing), preprocess "
+    "(image decode, resize, normalize), inference (queueing + forward pass), serialize.",
+    ("stage",),
+)
+BATCH_SIZE = Histogram(
+    "focus_api_inference_batch_size", "Rows per batched forward pass.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+CACHE_HITS = Counter(
+    "focus_api_prediction_cache_hits_total", "Frames answered from the prediction cache.",
+)
+CACHE_MISSES = Counter(
+    "focus_api_prediction_cache_misses_total", "Frames that missed the prediction cache and ran the model.",
+)
+CACHE_ENTRIES = Gauge(
+    "focus_api_prediction_cache_entries", "Frames currently held in the prediction cache.",
+)
+STREAM_SESSIONS = Gauge(
+    "focus_api_stream_sessions", "Open WebSocket streaming sessions.",
+)
+STREAM_FRAMES = Counter(
+    "focus_api_stream_frames_total", "Frames scored over WebSocket streaming sessions.",
+)
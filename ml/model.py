@@ -1,8 +1,13 @@
 """Neural network architecture for focus detection."""
 
+import copy
+
 import torch
 import torch.nn as nn
 
+# File suffix of frozen TorchScript artifacts from prepare_for_inference
+TORCHSCRIPT_SUFFIX = ".ts"
+
 
 class FocusCNN(nn.Module):
     """
@@ -13,50 +18,44 @@ class FocusCNN(nn.Module):
         Conv blocks: 32 → 64 → 128 channels
         FC layers: 4608 → 256 → 2
         Output: 2 classes (focused, distracted)
+    
+    Args:
+        num_classes: Number of output classes
+        dropout: Dropout before the last layer
+        widths: Output channels of the six conv layers (two per block);
+            pruned models (prune.py) use narrower widths
+        hidden: Units in the hidden fully connected layer
     """
     
-    def __init__(self, num_classes: int = 2, dropout: float = 0.5):
+    def __init__(self, num_classes: int = 2, dropout: float = 0.5,
+                 widths=(32, 32, 64, 64, 128, 128), hidden: int = 256):
         super().__init__()
+        if len(widths) != 6:
+            raise ValueError("FocusCNN needs six conv widths (two per block)")
+        self.widths = tuple(widths)
+        self.hidden = hidden
         
-        self.features = nn.Sequential(
-            # Block 1: 48x48 → 24x24
-            nn.Conv2d(1, 32, kernel_size=3, padding=1),
-            nn.BatchNorm2d(32),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(32, 32, kernel_size=3, padding=1),
-            nn.BatchNorm2d(32),
-            nn.ReLU(inplace=True),
-            nn.MaxPool2d(2),
-            nn.Dropout2d(0.25),
-            
-            # Block 2: 24x24 → 12x12
-            nn.Conv2d(32, 64, kernel_size=3, padding=1),
-            nn.BatchNorm2d(64),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(64, 64, kernel_size=3, padding=1),
-            nn.BatchNorm2d(64),
-            nn.ReLU(inplace=True),
-            nn.MaxPool2d(2),
-            nn.Dropout2d(0.25),
-            
-            # Block 3: 12x12 → 6x6
-            nn.Conv2d(64, 128, kernel_size=3, padding=1),
-            nn.BatchNorm2d(128),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(128, 128, kernel_size=3, padding=1),
-            nn.BatchNorm2d(128),
-            nn.ReLU(inplace=True),
-            nn.MaxPool2d(2),
-            nn.Dropout2d(0.25),
-        )
+        layers = []
+        in_channels = 1
+        # Blocks: 48x48 → 24x24 → 12x12 → 6x6
+        for block in range(3):
+            for width in widths[2 * block:2 * block + 2]:
+                layers += [
+                    nn.Conv2d(in_channels, width, kernel_size=3, padding=1),
+                    nn.BatchNorm2d(width),
+                    nn.ReLU(inplace=True),
+                ]
+                in_channels = width
+            layers += [nn.MaxPool2d(2), nn.Dropout2d(0.25)]
+        self.features = nn.Sequential(*layers)
         
         self.classifier = nn.Sequential(
             nn.Flatten(),
-            nn.Linear(128 * 6 * 6, 256),
-            nn.BatchNorm1d(256),
+            nn.Linear(in_channels * 6 * 6, hidden),
+            nn.BatchNorm1d(hidden),
             nn.ReLU(inplace=True),
             nn.Dropout(dropout),
-            nn.Linear(256, num_classes),
+            nn.Linear(hidden, num_classes),
         )
     
     def forward(self, x: torch.Tensor) -> torch.Tensor:
@@ -65,21 +64,298 @@ class FocusCNN(nn.Module):
         return x
 
 
-def get_model(num_classes: int = 2, pretrained_path: str = None) -> FocusCNN:
+def conv_bn_relu(in_channels: int, out_channels: int, kernel_size: int = 3, groups: int = 1) -> list:
+    """Conv2d (same padding, no bias) -> BatchNorm2d -> ReLU."""
+    return [
+        nn.Conv2d(in_channels, out_channels, kernel_size, padding=kernel_size // 2,
+                  groups=groups, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+    ]
+
+
+def depthwise_separable(in_channels: int, out_channels: int) -> list:
+    """3x3 depthwise conv followed by a 1x1 pointwise conv, each with BatchNorm + ReLU."""
+    return (
+        conv_bn_relu(in_channels, in_channels, 3, groups=in_channels)
+        + conv_bn_relu(in_channels, out_channels, 1)
+    )
+
+
+class FocusGAP(nn.Module):
+    """
+    FocusCNN's conv blocks with a global-average-pooling head.
+    
+    Replaces the 4608 → 256 fully connected layer (most of FocusCNN's
+    parameters) with a per-channel average and a single 128 → 2 layer.
+    """
+    
+    def __init__(self, num_classes: int = 2, dropout: float = 0.3, widths=(32, 64, 128)):
+        super().__init__()
+        
+        layers = []
+        in_channels = 1
+        for width in widths:
+            layers += conv_bn_relu(in_channels, width) + conv_bn_relu(width, width)
+            layers += [nn.MaxPool2d(2)]
+            in_channels = width
+        self.features = nn.Sequential(*layers)
+        
+        self.classifier = nn.Sequential(
+            nn.AdaptiveAvgPool2d(1),
+            nn.Flatten(),
+            nn.Dropout(dropout),
+            nn.Linear(in_channels, num_classes),
+        )
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.classifier(self.features(x))
+
+
+class FocusDS(nn.Module):
+    """
+    Depthwise-separable student network.
+    
+    Architecture:
+        Stem: full 3x3 conv, 1 → widths[0]
+        Stages: two depthwise-separable convs + max pool each (48 → 24 → 12 → 6)
+        Head: global average pooling → Linear(widths[-1], num_classes)
+    """
+    
+    def __init__(self, num_classes: int = 2, dropout: float = 0.3, widths=(32, 64, 128)):
+        super().__init__()
+        
+        layers = conv_bn_relu(1, widths[0])
+        in_channels = widths[0]
+        for width in widths:
+            layers += depthwise_separable(in_channels, width) + depthwise_separable(width, width)
+            layers += [nn.MaxPool2d(2)]
+            in_channels = width
+        self.features = nn.Sequential(*layers)
+        
+        self.classifier = nn.Sequential(
+            nn.AdaptiveAvgPool2d(1),
+            nn.Flatten(),
+            nn.Dropout(dropout),
+            nn.Linear(in_channels, num_classes),
+        )
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.classifier(self.features(x))
+
+
+# Architecture name -> (class, constructor arguments)
+MODELS = {
+    'focus_cnn': (FocusCNN, {}),
+    'focus_gap': (FocusGAP, {}),
+    'focus_ds': (FocusDS, {}),
+    'focus_ds_small': (FocusDS, {'widths': (16, 32, 64)}),
+}
+DEFAULT_MODEL = 'focus_cnn'
+
+
+def create_model(name: str = DEFAULT_MODEL, num_classes: int = 2, **config) -> nn.Module:
+    """
+    Instantiate a registered architecture.
+    
+    Args:
+        name: Key of MODELS
+        num_classes: Number of output classes
+        config: Overrides for the registry's constructor arguments
+    """
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}', expected one of {sorted(MODELS)}")
+    cls, defaults = MODELS[name]
+    return cls(num_classes=num_classes, **{**defaults, **config})
+
+
+def model_metadata(name: str, **config) -> dict:
+    """Checkpoint fields that let `get_model` rebuild the architecture."""
+    _, defaults = MODELS[name]
+    merged = {**defaults, **config}
+    return {
+        'model_name': name,
+        'model_config': {k: list(v) if isinstance(v, tuple) else v for k, v in merged.items()},
+    }
+
+
+def get_model(num_classes: int = 2, pretrained_path: str = None, name: str = DEFAULT_MODEL) -> nn.Module:
     """
     Create model instance, optionally loading pretrained weights.
     
+    Checkpoints that record `model_name` / `model_config` (see
+    `model_metadata`) rebuild that architecture; older checkpoints are
+    FocusCNN.
+    
     Args:
         num_classes: Number of output classes
         pretrained_path: Path to pretrained weights (.pth file)
+        name: Architecture to create when no checkpoint is given
     
     Returns:
-        FocusCNN model instance
+        Model instance (FocusCNN by default)
     """
-    model = FocusCNN(num_classes=num_classes)
+    if not pretrained_path:
+        return create_model(name, num_classes)
+    
+    checkpoint = torch.load(pretrained_path, map_location="cpu")
+    model = create_model(
+        checkpoint.get("model_name", DEFAULT_MODEL), num_classes, **checkpoint.get("model_config", {})
+    )
+    model.load_state_dict(checkpoint["model_state_dict"])
+    
+    return model
+
+
+def count_flops(model: nn.Module, input_size=(1, 1, 48, 48)) -> int:
+    """Multiply-accumulate count of Conv2d and Linear layers for one input, times two."""
+    macs = 0
+    
+    def conv_hook(module, inputs, output):
+        nonlocal macs
+        kernel = module.kernel_size[0] * module.kernel_size[1] * module.in_channels // module.groups
+        macs += output.numel() * kernel
     
-    if pretrained_path:
-        checkpoint = torch.load(pretrained_path, map_location="cpu")
-        model.load_state_dict(checkpoint["model_state_dict"])
+    def linear_hook(module, inputs, output):
+        nonlocal macs
+        macs += output.numel() * module.in_features
     
+    hooks = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            hooks.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            hooks.append(module.register_forward_hook(linear_hook))
+    
+    was_training = model.training
+    model.eval()
+    with torch.no_grad():
+        model(torch.zeros(input_size))
+    model.train(was_training)
+    for hook in hooks:
+        hook.remove()
+    
+    return 2 * macs // input_size[0]
+
+
+def fold_batchnorm(layer: nn.Module, bn: nn.Module) -> nn.Module:
+    """
+    Fold an eval-mode BatchNorm into the Conv2d/Linear layer that feeds it.
+    
+    Returns:
+        A new layer computing layer -> bn in a single affine op
+    """
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = layer.bias if layer.bias is not None else torch.zeros_like(bn.running_mean)
+    
+    folded = copy.deepcopy(layer)
+    shape = (-1,) + (1,) * (layer.weight.dim() - 1)
+    folded.weight = nn.Parameter(layer.weight * scale.reshape(shape))
+    folded.bias = nn.Parameter((bias - bn.running_mean) * scale + bn.bias)
+    return folded
+
+
+def _fold_sequential(seq: nn.Sequential) -> nn.Sequential:
+    layers = []
+    for module in seq:
+        if isinstance(module, (nn.Dropout, nn.Dropout2d)):
+            continue  # Identity in eval mode
+        if (isinstance(module, (nn.BatchNorm1d, nn.BatchNorm2d))
+                and layers and isinstance(layers[-1], (nn.Conv2d, nn.Linear))):
+            layers[-1] = fold_batchnorm(layers[-1], module)
+            continue
+        if isinstance(module, nn.Sequential):
+            module = _fold_sequential(module)
+        layers.append(module)
+    return nn.Sequential(*layers)
+
+
+def strip_for_inference(model: nn.Module) -> nn.Module:
+    """
+    Eval-only copy of `model` with BatchNorm folded into the preceding
+    Conv/Linear layers and Dropout layers removed.
+    
+    The result is a plain eager module (usable for ONNX export as well); it
+    must not be trained.
+    """
+    model = copy.deepcopy(model).eval()
+    with torch.no_grad():
+        for name, child in list(model.named_children()):
+            if isinstance(child, nn.Sequential):
+                setattr(model, name, _fold_sequential(child))
     return model
+
+
+def optimize_frozen(module):
+    """Fuse Conv+ReLU for the oneDNN CPU backend, where torch was built with it."""
+    if torch.backends.mkldnn.is_available():
+        return torch.jit.optimize_for_inference(module)
+    return module
+
+
+def prepare_for_inference(model: nn.Module, optimize: bool = False, batch_size: int = 8):
+    """
+    Build a frozen TorchScript graph for inference.
+    
+    BatchNorm is folded and Dropout stripped (`strip_for_inference`), then
+    the model is traced and frozen (weights become constants).
+    
+    Args:
+        model: Trained model
+        optimize: Also fuse for the oneDNN backend (`optimize_frozen`). Leave
+            off for artifacts that will be saved; `load_inference_model`
+            applies it after loading
+        batch_size: Batch size of the tracing example (the graph accepts any)
+    
+    Returns:
+        torch.jit.ScriptModule mapping [N, 1, 48, 48] to logits
+    """
+    stripped = strip_for_inference(model)
+    example = torch.rand(batch_size, 1, 48, 48)
+    with torch.no_grad():
+        traced = torch.jit.trace(stripped, example)
+    frozen = torch.jit.freeze(traced.eval())
+    return optimize_frozen(frozen) if optimize else frozen
+
+
+def check_inference_parity(reference: nn.Module, prepared, num_samples: int = 32,
+                           atol: float = 1e-4, seed: int = 0) -> float:
+    """
+    Compare a prepared model against the original eval-mode model.
+    
+    Checks a single image and a full batch, so a graph specialized to the
+    tracing batch size is caught too.
+    
+    Raises:
+        AssertionError: If any logit differs by more than `atol`
+    
+    Returns:
+        Maximum absolute logit difference
+    """
+    reference = reference.eval()
+    generator = torch.Generator().manual_seed(seed)
+    batch = torch.rand(num_samples, 1, 48, 48, generator=generator)
+    
+    max_diff = 0.0
+    with torch.no_grad():
+        for inputs in (batch[:1], batch):
+            diff = (reference(inputs) - prepared(inputs)).abs().max().item()
+            max_diff = max(max_diff, diff)
+    
+    if max_diff > atol:
+        raise AssertionError(f"Prepared model differs by {max_diff:.2e} (atol={atol:.0e})")
+    return max_diff
+
+
+def load_inference_model(path: str, device="cpu") -> nn.Module:
+    """
+    Load a model for inference only.
+    
+    A TorchScript artifact from `prepare_for_inference` (TORCHSCRIPT_SUFFIX)
+    is loaded and, on CPU, fused with `optimize_frozen`; a training
+    checkpoint is loaded and stripped with `strip_for_inference`.
+    """
+    if str(path).endswith(TORCHSCRIPT_SUFFIX):
+        module = torch.jit.load(str(path), map_location=device).eval()
+        return optimize_frozen(module) if torch.device(device).type == "cpu" else module
+    return strip_for_inference(get_model(pretrained_path=str(path))).to(device)
@@ -0,0 +1,105 @@
+"""Compare the registered architectures: parameters, FLOPs, CPU latency and accuracy."""
+
+import argparse
+import json
+from pathlib import Path
+
+import torch
+
+from config import MODEL_DIR, MODEL_PATH
+from model import MODELS, DEFAULT_MODEL, create_model, get_model, count_flops, strip_for_inference
+from quantize import load_split, torch_variant, measure_latency, evaluate_variant, LATENCY_BATCH_SIZE
+
+REPORT_PATH = MODEL_DIR / "model_report.json"
+
+
+def default_checkpoint(name: str) -> Path:
+    """Where train.py saves each architecture (see train.py --arch)."""
+    return MODEL_PATH if name == DEFAULT_MODEL else MODEL_DIR / f"focus_detector_{name}.pth"
+
+
+def report_models(checkpoints: dict = None, num_threads: int = 1) -> dict:
+    """
+    Measure every architecture in model.MODELS.
+
+    Untrained architectures (no checkpoint) are still reported for size,
+    FLOPs and latency, with accuracy left empty.
+
+    Args:
+        checkpoints: Architecture name -> checkpoint path (default: train.py's output paths)
+        num_threads: Intra-op threads for the latency measurements
+
+    Returns:
+        Report dict, also written to REPORT_PATH
+    """
+    torch.set_num_threads(num_threads)
+    checkpoints = checkpoints or {name: default_checkpoint(name) for name in MODELS}
+
+    print("=" * 60)
+    print("Model Architecture Report")
+    print("=" * 60)
+
+    test_images = test_labels = None
+    if any(Path(path).exists() for path in checkpoints.values()):
+        print("Loading data/test...")
+        test_images, test_labels = load_split("test")
+
+    results = {}
+    for name in MODELS:
+        path = Path(checkpoints.get(name, default_checkpoint(name)))
+        trained = path.exists()
+        if trained:
+            # get_model rebuilds the architecture the checkpoint records, not `name`
+            recorded = torch.load(path, map_location="cpu", weights_only=False).get("model_name", DEFAULT_MODEL)
+            if recorded != name:
+                raise ValueError(f"{path} is a {recorded} checkpoint, not {name}")
+        model = get_model(pretrained_path=str(path)) if trained else create_model(name)
+        print(f"Measuring {name}{'' if trained else ' (untrained)'}...")
+
+        # Latency of the deployed form: BatchNorm folded, Dropout removed
+        predict, size_bytes = torch_variant(strip_for_inference(model))
+        sample = test_images if test_images is not None else torch.rand(LATENCY_BATCH_SIZE, 1, 48, 48).numpy()
+
+        results[name] = {
+            "checkpoint": str(path) if trained else None,
+            "params": sum(p.numel() for p in model.parameters()),
+            "mflops": round(count_flops(model) / 1e6, 2),
+            "size_mb": round(size_bytes / 2**20, 3),
+            "latency_single_ms": round(measure_latency(predict, sample[:1]), 3),
+            "latency_batch_ms": round(measure_latency(predict, sample[:LATENCY_BATCH_SIZE]), 3),
+            "accuracy": round(evaluate_variant(predict, test_images, test_labels), 2) if trained else None,
+        }
+
+    report = {
+        "test_samples": len(test_labels) if test_labels is not None else 0,
+        "batch_size": LATENCY_BATCH_SIZE,
+        "num_threads": num_threads,
+        "models": results,
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "-" * 86)
+    print(f"{'Model':<18}{'Params':>10}{'MFLOPs':>10}{'Size (MB)':>11}"
+          f"{'1 img (ms)':>12}{f'{LATENCY_BATCH_SIZE} img (ms)':>13}{'Acc (%)':>10}")
+    print("-" * 86)
+    for name, r in results.items():
+        accuracy = f"{r['accuracy']:.2f}" if r['accuracy'] is not None else "-"
+        print(f"{name:<18}{r['params']:>10,}{r['mflops']:>10.2f}{r['size_mb']:>11.3f}"
+              f"{r['latency_single_ms']:>12.3f}{r['latency_batch_ms']:>13.3f}{accuracy:>10}")
+    print("-" * 86)
+    print(f"\nReport saved to: {REPORT_PATH}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare model architectures")
+    parser.add_argument("--checkpoint", action="append", default=[], metavar="NAME=PATH",
+                        help="Checkpoint for an architecture (repeatable)")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads for latency")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.checkpoint)
+    checkpoints = {name: Path(overrides.get(name, default_checkpoint(name))) for name in MODELS}
+    report_models(checkpoints, args.threads)
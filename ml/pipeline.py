@@ -0,0 +1,280 @@
+"""
+Threaded stage pipeline for real-time frame processing.
+
+Stages run on their own threads and are connected by small bounded
+`DropQueue`s. When a downstream stage falls behind, the oldest queued item is
+discarded instead of blocking the producer, so end-to-end latency stays
+bounded by the queue sizes rather than growing with the backlog. OpenCV and
+torch release the GIL in their heavy calls, so the stages genuinely overlap.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable
+
+
+class QueueClosed(Exception):
+    """Raised by `DropQueue.get()` once the queue is closed and drained."""
+
+
+class DropQueue:
+    """
+    Bounded FIFO that drops its oldest item when full.
+
+    Args:
+        maxsize: Maximum queued items
+    """
+
+    def __init__(self, maxsize: int = 2):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item, block: bool = False):
+        """
+        Enqueue `item`.
+
+        With block=False a full queue discards its oldest item (counted in
+        `dropped`); with block=True the caller waits for space instead.
+        Items put after `close()` are discarded.
+        """
+        with self._cond:
+            while block and len(self._items) >= self.maxsize and not self.closed:
+                self._cond.wait()
+            if self.closed:
+                return
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout: float = None):
+        """
+        Dequeue the oldest item.
+
+        Raises:
+            queue.Empty: Nothing arrived within `timeout` seconds
+            QueueClosed: The queue is closed and empty
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._items:
+                if self.closed:
+                    raise QueueClosed()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty()
+                self._cond.wait(remaining)
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Stop accepting items; consumers drain what is left, then get QueueClosed."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+
+class StageStats:
+    """
+    Throughput and busy time of one stage.
+
+    Args:
+        window: Number of recent items used for the current FPS
+    """
+
+    def __init__(self, window: int = 30):
+        self.count = 0
+        self.busy = 0.0
+        self.started = time.perf_counter()
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        now = time.perf_counter()
+        with self._lock:
+            self.count += 1
+            self.busy += seconds
+            self._recent.append(now)
+
+    def fps(self) -> float:
+        """Items per second over the recent window."""
+        with self._lock:
+            recent = list(self._recent)
+        if len(recent) < 2:
+            return 0.0
+        return (len(recent) - 1) / max(recent[-1] - recent[0], 1e-9)
+
+    def average_fps(self) -> float:
+        return self.count / max(time.perf_counter() - self.started, 1e-9)
+
+    def busy_ms(self) -> float:
+        """Mean processing time per item in milliseconds."""
+        return 1000.0 * self.busy / self.count if self.count else 0.0
+
+
+class Stage(threading.Thread):
+    """
+    One pipeline stage on its own thread.
+
+    Either pulls items from `inbox` and maps them through `fn`, or (with
+    `source`) iterates a producer. Results that are not None go to `outbox`.
+    When the input ends, the stage closes `outbox` so the end of stream
+    propagates downstream.
+
+    Args:
+        name: Stage name used in reports
+        fn: Callable applied to each item (None passes items through)
+        inbox: Input queue (None for a source stage)
+        outbox: Output queue (None for a sink stage)
+        source: Iterable producing items for a source stage
+        block_output: Wait for space in `outbox` instead of dropping old items
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable = None,
+        inbox: DropQueue = None,
+        outbox: DropQueue = None,
+        source: Iterable = None,
+        block_output: bool = False,
+    ):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        if (inbox is None) == (source is None):
+            raise ValueError("A stage needs exactly one of inbox or source")
+        self.stage_name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.source = source
+        self.block_output = block_output
+        self.stats = StageStats()
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def _items(self):
+        if self.source is not None:
+            yield from self.source
+            return
+        while True:
+            try:
+                yield self.inbox.get()
+            except QueueClosed:
+                return
+
+    def run(self):
+        items = iter(self._items())
+        try:
+            while not self._stop_event.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                if self.source is not None:
+                    # A source's work is producing the item (e.g. cap.read())
+                    result = item
+                else:
+                    # Time spent waiting on the inbox is not work
+                    start = time.perf_counter()
+                    result = self.fn(item) if self.fn is not None else item
+                self.stats.record(time.perf_counter() - start)
+                if result is not None and self.outbox is not None:
+                    self.outbox.put(result, block=self.block_output)
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.outbox is not None:
+                self.outbox.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class Pipeline:
+    """
+    A chain of stages: a source followed by mapping stages.
+
+    The last queue is left for the caller to consume with `get()`, so the
+    final stage (e.g. rendering with cv2.imshow) can run on the main thread.
+
+    Args:
+        source: Iterable producing items
+        stages: (name, fn) pairs applied in order
+        queue_size: Capacity of each queue between stages
+        source_name: Name of the source stage
+        drop: Drop stale items when a stage falls behind; False blocks
+            producers instead so every item is processed
+    """
+
+    def __init__(
+        self,
+        source: Iterable,
+        stages,
+        queue_size: int = 2,
+        source_name: str = "capture",
+        drop: bool = True,
+    ):
+        self.queues = [DropQueue(queue_size) for _ in range(len(stages) + 1)]
+        self.stages = [Stage(source_name, source=source, outbox=self.queues[0], block_output=not drop)]
+        for i, (name, fn) in enumerate(stages):
+            self.stages.append(Stage(
+                name, fn, inbox=self.queues[i], outbox=self.queues[i + 1], block_output=not drop,
+            ))
+        self.output = self.queues[-1]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def get(self, timeout: float = None):
+        """Next output item; raises queue.Empty on timeout and QueueClosed at end of stream."""
+        return self.output.get(timeout)
+
+    def stop(self):
+        """Stop all stages and unblock anything waiting on a queue."""
+        for stage in self.stages:
+            stage.stop()
+        for q in self.queues:
+            q.close()
+
+    def join(self, timeout: float = None):
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def errors(self) -> list:
+        return [(stage.stage_name, stage.error) for stage in self.stages if stage.error is not None]
+
+    def report(self, sink: StageStats = None, sink_name: str = "render") -> str:
+        """One-line summary: per-stage FPS, queue depth in front of each stage and drops."""
+        parts = [f"{self.stages[0].stage_name} {self.stages[0].stats.fps():.1f} fps"]
+        for stage, q in zip(self.stages[1:], self.queues):
+            parts.append(f"{stage.stage_name} {stage.stats.fps():.1f} fps (q={q.qsize()})")
+        if sink is not None:
+            parts.append(f"{sink_name} {sink.fps():.1f} fps (q={self.output.qsize()})")
+        dropped = sum(q.dropped for q in self.queues)
+        return " | ".join(parts) + f" | dropped {dropped}"
+
+    def summary(self, sink: StageStats = None, sink_name: str = "render") -> list:
+        """Per-stage rows: (name, frames, average fps, busy ms/frame, dropped at input)."""
+        rows = [(self.stages[0].stage_name, self.stages[0].stats, 0)]
+        rows += [(stage.stage_name, stage.stats, q.dropped) for stage, q in zip(self.stages[1:], self.queues)]
+        if sink is not None:
+            rows.append((sink_name, sink, self.output.dropped))
+        return [
+            (name, stats.count, stats.average_fps(), stats.busy_ms(), dropped)
+            for name, stats, dropped in rows
+        ]
@@ -0,0 +1,155 @@
+"""
+Content-hash cache of focus predictions.
+
+A student sitting still sends the same (or nearly the same) 48x48 frame over
+and over. `PredictionCache` maps a hash of the decoded grayscale pixels to the
+model's probabilities, so repeated frames skip the forward pass. Entries
+expire after `ttl` seconds and the least recently used are evicted beyond
+`max_entries`. `clear()` starts a new generation: results computed for a
+lookup made before it are not stored, so a model swap never leaves the old
+model's answers behind.
+
+Key modes:
+    exact: blake2b of the raw pixels; a hit returns exactly what the model
+        would have returned for those pixels
+    perceptual: blake2b of 4x4 block means quantized to `levels` grey levels,
+        so frames differing only by sensor noise or compression share an entry
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml import metrics
+
+MODES = ('exact', 'perceptual')
+
+# Perceptual mode averages BLOCK x BLOCK pixel blocks (48x48 -> 12x12)
+BLOCK = 4
+
+
+class PredictionCache:
+    """
+    Bounded LRU + TTL cache of per-frame probabilities, safe across threads.
+
+    Args:
+        max_entries: Frames held at once (least recently used evicted first)
+        ttl: Seconds an entry stays valid
+        mode: 'exact' or 'perceptual' (see module docstring)
+        levels: Grey levels per block in perceptual mode
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 2.0, mode: str = 'exact', levels: int = 16):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cache mode '{mode}'. Available: {', '.join(MODES)}")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.mode = mode
+        self.levels = levels
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()  # key -> (probabilities, expiry), least recently used first
+        self._lock = threading.Lock()
+
+    def key(self, pixels: np.ndarray) -> bytes:
+        """Cache key for one uint8 [48, 48] frame."""
+        if self.mode == 'perceptual':
+            height, width = pixels.shape
+            blocks = pixels.reshape(height // BLOCK, BLOCK, width // BLOCK, BLOCK).mean(axis=(1, 3))
+            pixels = (blocks * (self.levels / 256.0)).astype(np.uint8)
+        return hashlib.blake2b(np.ascontiguousarray(pixels).tobytes(), digest_size=16).digest()
+
+    def get(self, key: bytes):
+        """Cached probabilities for `key`, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: bytes, probabilities: np.ndarray, generation: int = None):
+        """
+        Store one frame's probabilities, evicting the least recently used beyond max_entries.
+
+        Dropped if `generation` is given and the cache has been cleared since.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (probabilities, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            metrics.CACHE_ENTRIES.set(len(self._entries))
+
+    def lookup(self, pixels: np.ndarray):
+        """
+        Look up every frame of a uint8 [N, 48, 48] batch.
+
+        Returns:
+            keys: Cache key per frame
+            results: Cached probabilities per frame (None for misses)
+            misses: Indices of the frames that need a forward pass
+            generation: Cache generation to pass back to `store`
+        """
+        generation = self.generation
+        keys = [self.key(frame) for frame in pixels]
+        results = [self.get(key) for key in keys]
+        misses = [i for i, result in enumerate(results) if result is None]
+
+        hits = len(keys) - len(misses)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(misses)
+        if hits:
+            metrics.CACHE_HITS.inc(hits)
+        if misses:
+            metrics.CACHE_MISSES.inc(len(misses))
+        return keys, results, misses, generation
+
+    def store(self, keys: list, results: list, misses: list, probabilities: np.ndarray, generation: int):
+        """
+        Fill the `misses` slots of `results` (in place) with fresh probabilities and cache them.
+
+        Nothing is cached if the cache was cleared after the `lookup` that
+        returned `generation`; the probabilities may come from a replaced model.
+        """
+        for i, row in zip(misses, probabilities):
+            row = np.array(row)  # Own copy, so the entry does not pin the whole batch output
+            results[i] = row
+            self.put(keys[i], row, generation)
+
+    def clear(self):
+        """Drop every entry and start a new generation (e.g. after the model changes)."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            metrics.CACHE_ENTRIES.set(0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'mode': self.mode,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+            }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,220 @@
+"""
+Pre-fork launcher for the focus detection API.
+
+The parent process loads the PyTorch checkpoint once, freezes the garbage
+collector and forks N worker processes that all accept connections from one
+shared listening socket. Workers share the weight pages copy-on-write and
+each gets its own small torch thread pool, so concurrent requests spread
+across cores without oversubscribing them. Each worker serves the Flask app
+with waitress, a production WSGI server that accepts a pre-bound socket.
+The parent restarts any worker that exits.
+
+Usage:
+    python prefork.py --workers 4 --threads-per-worker 1
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.config import PREFORK_WORKERS, PREFORK_THREADS_PER_WORKER, PREFORK_HTTP_THREADS
+
+# A worker that exits sooner than this after starting is restarted with a delay
+MIN_WORKER_UPTIME = 5.0
+RESTART_DELAY = 1.0
+
+
+def default_workers(threads_per_worker: int) -> int:
+    """One worker per `threads_per_worker` cores."""
+    return max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+
+def limit_threads(threads_per_worker: int):
+    """
+    Cap math library thread pools before torch/onnxruntime are imported.
+
+    Any pool created in the parent would otherwise be sized for every core and
+    inherited (without its threads) by each worker.
+    """
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'INFERENCE_THREADS'):
+        os.environ[var] = str(threads_per_worker)
+
+
+def configure_worker_threads(threads_per_worker: int):
+    """Per-worker torch intra-op/inter-op thread settings (no-op without torch)."""
+    torch = sys.modules.get('torch')
+    if torch is None:
+        return
+    torch.set_num_threads(threads_per_worker)
+    try:
+        # One graph per request batch: nothing to run concurrently between ops
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed if the parent ran inter-op work before forking
+        pass
+
+
+def create_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket inherited by every worker."""
+    sock = socket.create_server((host, port), backlog=backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_worker(sock: socket.socket, threads_per_worker: int, http_threads: int = PREFORK_HTTP_THREADS):
+    """Worker body: set up per-process state, then serve from the shared socket."""
+    from waitress import create_server
+    from ml import serving
+    from ml.api_server import app
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker_threads(threads_per_worker)
+
+    # Threads (micro-batcher, onnxruntime pools) do not survive fork, so they
+    # are created here; a torch model loaded by the parent is reused as is
+    serving.start()
+
+    # Every worker polls the same listening socket; a worker that loses the
+    # race for a connection gets EAGAIN, which waitress ignores
+    server = create_server(app, sockets=[sock], threads=http_threads, ident='focus-api')
+
+    def stop(signum, frame):
+        # waitress stops its loop on SystemExit and lets running requests finish
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    server.run()
+    if serving.batcher is not None:
+        serving.batcher.close()
+
+
+class Supervisor:
+    """
+    Forks and supervises API worker processes.
+
+    Args:
+        sock: Listening socket shared by all workers
+        num_workers: Number of worker processes to keep running
+        threads_per_worker: torch intra-op threads per worker
+        http_threads: waitress request threads per worker
+    """
+
+    def __init__(self, sock: socket.socket, num_workers: int, threads_per_worker: int,
+                 http_threads: int = PREFORK_HTTP_THREADS):
+        self.sock = sock
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.http_threads = http_threads
+        self.workers = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self):
+        sys.stdout.flush()  # Otherwise buffered output is repeated by the child
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_worker(self.sock, self.threads_per_worker, self.http_threads)
+            except BaseException as e:
+                print(f"Worker {os.getpid()} crashed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+
+        self.workers[pid] = time.monotonic()
+        print(f"Started worker {pid}")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+        for pid in list(self.workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        """Start all workers and restart them as they exit until stopped."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        for _ in range(self.num_workers):
+            self.spawn()
+
+        while self.workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            if self.stopping:
+                print(f"Worker {pid} stopped")
+                continue
+
+            print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting")
+            if time.monotonic() - started < MIN_WORKER_UPTIME:
+                # Avoid a tight fork loop when workers die on startup
+                time.sleep(RESTART_DELAY)
+            if not self.stopping:
+                self.spawn()
+
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork multi-worker focus detection API")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 5001)))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get('WORKERS', PREFORK_WORKERS)),
+                        help="Worker processes (0 = cores / threads-per-worker)")
+    parser.add_argument("--threads-per-worker", type=int,
+                        default=int(os.environ.get('THREADS_PER_WORKER', PREFORK_THREADS_PER_WORKER)),
+                        help="torch intra-op threads in each worker")
+    parser.add_argument("--http-threads", type=int,
+                        default=int(os.environ.get('HTTP_THREADS', PREFORK_HTTP_THREADS)),
+                        help="waitress request threads in each worker")
+    args = parser.parse_args()
+
+    threads_per_worker = max(1, args.threads_per_worker)
+    num_workers = args.workers or default_workers(threads_per_worker)
+
+    limit_threads(threads_per_worker)
+
+    # Load the model once in the parent, but start no threads before forking
+    os.environ['SERVING_AUTOSTART'] = '0'
+    from ml import serving
+    # Import Flask and the app here too, so workers share those pages as well
+    from ml import api_server
+    if serving.BACKEND_NAME == 'torch':
+        serving.backend = serving.load_model()
+
+    sock = create_socket(args.host, args.port)
+
+    # Move everything allocated so far out of the collector's generations, so
+    # collections in the workers do not write to (and copy) shared pages
+    gc.collect()
+    gc.freeze()
+
+    print("=" * 50)
+    print(f"Serving on {args.host}:{args.port} with {num_workers} workers "
+          f"x {threads_per_worker} threads, {args.http_threads} HTTP threads each "
+          f"({serving.BACKEND_NAME} backend)")
+    print("=" * 50)
+
+    Supervisor(sock, num_workers, threads_per_worker, args.http_threads).run()
+
+
+if __name__ == "__main__":
+    main()
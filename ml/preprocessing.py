@@ -0,0 +1,110 @@
+"""Image preprocessing shared by the focus detection API servers."""
+
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Raw gray8 frames are 48x48 single-channel uint8 pixels
+FRAME_BYTES = 48 * 48
+
+
+def decode_image_bytes(image_bytes):
+    """Decode encoded image bytes (JPEG/PNG/...) to 48x48 uint8 grayscale pixels."""
+    image = Image.open(BytesIO(image_bytes))
+    
+    # Convert to grayscale
+    image = image.convert('L')
+    
+    # Resize to 48x48
+    image = image.resize((48, 48))
+    
+    return np.asarray(image, dtype=np.uint8)
+
+
+def decode_base64(image_data):
+    """Decode a base64 string or data URL to the encoded image bytes."""
+    return base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
+
+
+def decode_base64_image(image_data):
+    """Decode a base64 string or data URL to 48x48 uint8 grayscale pixels."""
+    return decode_image_bytes(decode_base64(image_data))
+
+
+def pixels_to_input(pixels):
+    """Convert uint8 grayscale pixels [N, 48, 48] to a normalized float32 model input [N, 1, 48, 48]."""
+    img_array = pixels.astype(np.float32) / 255.0
+    return img_array[:, np.newaxis]
+
+
+def preprocess_image(image_data):
+    """Convert base64 image to model input array."""
+    pixels = decode_base64_image(image_data)
+    
+    # Add batch and channel dimensions [1, 1, 48, 48]
+    return pixels_to_input(pixels[np.newaxis])
+
+
+def split_length_prefixed(body):
+    """Split a body of [uint32 big-endian length][payload] records into payloads."""
+    view = memoryview(body)
+    frames = []
+    offset = 0
+    while offset < len(view):
+        if offset + 4 > len(view):
+            raise ValueError('Truncated length prefix')
+        length = int.from_bytes(view[offset:offset + 4], 'big')
+        offset += 4
+        if offset + length > len(view):
+            raise ValueError('Truncated frame payload')
+        frames.append(view[offset:offset + length])
+        offset += length
+    return frames
+
+
+def decode_frames(frame_format, parts=None, body=None, max_frames: int = None):
+    """
+    Decode a binary multi-frame submission to uint8 pixels [N, 48, 48].
+    
+    Frame encoding (`frame_format`):
+        image: encoded images (JPEG/PNG/...) decoded with PIL
+        gray8: raw 48x48 uint8 grayscale pixels, copied straight into the input
+    
+    Frames come either as separate `parts` (e.g. multipart files) or as one
+    `body`. Encoded images in a body are length-prefixed ([uint32 big-endian
+    length][bytes] per frame); gray8 bodies are plain concatenations of
+    FRAME_BYTES-sized frames.
+    
+    More than `max_frames` frames are rejected before anything is decoded.
+    """
+    if frame_format not in ('image', 'gray8'):
+        raise ValueError(f"Unknown format: {frame_format}")
+    
+    if parts is None:
+        if frame_format == 'gray8':
+            if len(body) % FRAME_BYTES:
+                raise ValueError(f"gray8 body must be a multiple of {FRAME_BYTES} bytes")
+            pixels = np.frombuffer(body, dtype=np.uint8).reshape(-1, 48, 48)
+            if len(pixels) == 0:
+                raise ValueError('No frames provided')
+            if max_frames is not None and len(pixels) > max_frames:
+                raise ValueError(f"At most {max_frames} frames per request")
+            return pixels
+        parts = split_length_prefixed(body)
+    
+    if len(parts) == 0:
+        raise ValueError('No frames provided')
+    if max_frames is not None and len(parts) > max_frames:
+        raise ValueError(f"At most {max_frames} frames per request")
+    
+    if frame_format == 'gray8':
+        if any(len(part) != FRAME_BYTES for part in parts):
+            raise ValueError(f"gray8 frames must be exactly {FRAME_BYTES} bytes")
+        return np.frombuffer(b''.join(parts), dtype=np.uint8).reshape(-1, 48, 48)
+    
+    pixels = np.empty((len(parts), 48, 48), dtype=np.uint8)
+    for i, part in enumerate(parts):
+        pixels[i] = decode_image_bytes(part)
+    return pixels
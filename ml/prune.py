@@ -0,0 +1,231 @@
+"""
+Structured channel pruning of FocusCNN.
+
+Each conv layer's output channels are scored by the magnitude of the
+following BatchNorm's gamma (a channel whose gamma is near zero contributes
+almost nothing after normalization). The lowest-scoring channels are removed
+and every following layer is rewritten to match, giving a smaller *dense*
+FocusCNN (narrower `widths`) that runs faster on CPU without sparse kernels.
+Each pruned model is fine-tuned with `train_epoch` and saved with its widths,
+so `get_model` loads it like any other checkpoint.
+
+Usage:
+    python prune.py --ratios 0.25 0.5 0.75 --epochs 3
+"""
+
+import argparse
+import json
+
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from config import DEVICE, MODEL_DIR, MODEL_PATH, CLASS_NAMES, LEARNING_RATE, WEIGHT_DECAY
+from dataset import get_dataloaders
+from model import FocusCNN, get_model, model_metadata, strip_for_inference, count_flops
+from quantize import torch_variant, measure_latency, LATENCY_BATCH_SIZE
+from train import train_epoch, evaluate
+
+REPORT_PATH = MODEL_DIR / "pruning_report.json"
+
+# Never prune a layer below this many channels / units
+MIN_CHANNELS = 4
+
+
+def _keep_indices(bn: nn.Module, ratio: float) -> torch.Tensor:
+    """Sorted indices of the channels to keep: the largest |gamma| after removing `ratio`."""
+    scores = bn.weight.detach().abs()
+    keep = max(MIN_CHANNELS, int(round(len(scores) * (1 - ratio))))
+    keep = min(keep, len(scores))
+    return scores.topk(keep).indices.sort().values
+
+
+def _copy_bn(src: nn.Module, dst: nn.Module, keep: torch.Tensor):
+    dst.weight.copy_(src.weight[keep])
+    dst.bias.copy_(src.bias[keep])
+    dst.running_mean.copy_(src.running_mean[keep])
+    dst.running_var.copy_(src.running_var[keep])
+    dst.num_batches_tracked.copy_(src.num_batches_tracked)
+
+
+def prune_focus_cnn(model: FocusCNN, ratio: float, prune_hidden: bool = True) -> FocusCNN:
+    """
+    Remove the `ratio` lowest-|gamma| channels from every conv layer.
+
+    Args:
+        model: Trained FocusCNN
+        ratio: Fraction of channels to remove from each layer (0 to 1)
+        prune_hidden: Also prune the hidden FC units by their BatchNorm1d gamma
+
+    Returns:
+        A new, smaller FocusCNN with the surviving weights copied in
+    """
+    convs = [m for m in model.features if isinstance(m, nn.Conv2d)]
+    bns = [m for m in model.features if isinstance(m, nn.BatchNorm2d)]
+    fc1, bn1d, fc2 = model.classifier[1], model.classifier[2], model.classifier[5]
+
+    keeps = [_keep_indices(bn, ratio) for bn in bns]
+    hidden_keep = _keep_indices(bn1d, ratio) if prune_hidden else torch.arange(fc1.out_features)
+
+    pruned = FocusCNN(
+        num_classes=fc2.out_features,
+        dropout=model.classifier[4].p,
+        widths=[len(k) for k in keeps],
+        hidden=len(hidden_keep),
+    )
+    new_convs = [m for m in pruned.features if isinstance(m, nn.Conv2d)]
+    new_bns = [m for m in pruned.features if isinstance(m, nn.BatchNorm2d)]
+
+    with torch.no_grad():
+        in_keep = torch.arange(1)  # Single grayscale input channel
+        for conv, bn, new_conv, new_bn, keep in zip(convs, bns, new_convs, new_bns, keeps):
+            new_conv.weight.copy_(conv.weight[keep][:, in_keep])
+            new_conv.bias.copy_(conv.bias[keep])
+            _copy_bn(bn, new_bn, keep)
+            in_keep = keep
+
+        # Flatten order is channel-major: feature index = channel * 36 + position
+        spatial = 6 * 6
+        columns = (in_keep[:, None] * spatial + torch.arange(spatial)).flatten()
+        new_fc1, new_bn1d, new_fc2 = pruned.classifier[1], pruned.classifier[2], pruned.classifier[5]
+        new_fc1.weight.copy_(fc1.weight[hidden_keep][:, columns])
+        new_fc1.bias.copy_(fc1.bias[hidden_keep])
+        _copy_bn(bn1d, new_bn1d, hidden_keep)
+        new_fc2.weight.copy_(fc2.weight[:, hidden_keep])
+        new_fc2.bias.copy_(fc2.bias)
+
+    return pruned
+
+
+def measure(model: nn.Module, test_loader, criterion, num_threads: int = 1) -> dict:
+    """Parameters, FLOPs, CPU latency (1 and LATENCY_BATCH_SIZE images) and accuracy."""
+    _, accuracy = evaluate(model, test_loader, criterion, DEVICE)
+
+    deployed = strip_for_inference(model).cpu()
+    predict, size_bytes = torch_variant(deployed)
+    batch = torch.rand(LATENCY_BATCH_SIZE, 1, 48, 48).numpy()
+
+    training_threads = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        latency_single = measure_latency(predict, batch[:1])
+        latency_batch = measure_latency(predict, batch)
+    finally:
+        torch.set_num_threads(training_threads)
+
+    return {
+        "params": sum(p.numel() for p in model.parameters()),
+        "mflops": round(count_flops(deployed) / 1e6, 2),
+        "size_mb": round(size_bytes / 2**20, 3),
+        "latency_single_ms": round(latency_single, 3),
+        "latency_batch_ms": round(latency_batch, 3),
+        "accuracy": round(accuracy, 2),
+    }
+
+
+def prune(model_path: str = None, ratios=(0.25, 0.5, 0.75), epochs: int = 3,
+          lr: float = LEARNING_RATE / 10, prune_hidden: bool = True, num_threads: int = 1) -> dict:
+    """
+    Prune a trained FocusCNN at several levels, fine-tune and report each.
+
+    Args:
+        model_path: Trained FocusCNN checkpoint (default: MODEL_PATH)
+        ratios: Fractions of channels removed per layer, one model each
+        epochs: Fine-tuning epochs per pruned model
+        lr: Fine-tuning learning rate
+        prune_hidden: Also prune the hidden FC layer
+        num_threads: Intra-op threads for latency measurements
+
+    Returns:
+        Report dict, also written to REPORT_PATH
+    """
+    model_path = model_path or str(MODEL_PATH)
+
+    print("=" * 60)
+    print("Structured Channel Pruning")
+    print("=" * 60)
+
+    base = get_model(len(CLASS_NAMES), pretrained_path=model_path)
+    if not isinstance(base, FocusCNN):
+        raise ValueError(f"{model_path} is not a FocusCNN checkpoint")
+
+    print("\nLoading dataset...")
+    train_loader, test_loader = get_dataloaders()
+    criterion = nn.CrossEntropyLoss()
+
+    base = base.to(DEVICE)
+    results = {"baseline": dict(measure(base, test_loader, criterion, num_threads),
+                                widths=list(base.widths), hidden=base.hidden)}
+
+    for ratio in ratios:
+        name = f"pruned_{int(round(ratio * 100))}"
+        print(f"\n{name}: removing {ratio:.0%} of channels per layer")
+        model = prune_focus_cnn(base.cpu(), ratio, prune_hidden).to(DEVICE)
+        print(f"  widths {list(model.widths)}, hidden {model.hidden}")
+
+        _, before = evaluate(model, test_loader, criterion, DEVICE)
+        print(f"  accuracy before fine-tuning: {before:.2f}%")
+
+        optimizer = optim.AdamW(model.parameters(), lr=lr, weight_decay=WEIGHT_DECAY)
+        best_acc, best_state = before, {k: v.clone() for k, v in model.state_dict().items()}
+        for epoch in range(epochs):
+            train_loss, _, _ = train_epoch(model, train_loader, criterion, optimizer, DEVICE)
+            _, test_acc = evaluate(model, test_loader, criterion, DEVICE)
+            print(f"  epoch {epoch + 1}: train loss {train_loss:.4f}, test acc {test_acc:.2f}%")
+            if test_acc > best_acc:
+                best_acc, best_state = test_acc, {k: v.clone() for k, v in model.state_dict().items()}
+        model.load_state_dict(best_state)
+
+        output_path = MODEL_DIR / f"focus_detector_{name}.pth"
+        torch.save({
+            'model_state_dict': model.state_dict(),
+            'test_acc': best_acc,
+            'class_names': CLASS_NAMES,
+            'pruned_from': str(model_path),
+            'prune_ratio': ratio,
+            **model_metadata('focus_cnn', widths=model.widths, hidden=model.hidden),
+        }, output_path)
+
+        results[name] = dict(
+            measure(model, test_loader, criterion, num_threads),
+            widths=list(model.widths), hidden=model.hidden, ratio=ratio,
+            accuracy_before_finetune=round(before, 2), checkpoint=str(output_path),
+        )
+
+    report = {"source": str(model_path), "num_threads": num_threads,
+              "batch_size": LATENCY_BATCH_SIZE, "fine_tune_epochs": epochs, "models": results}
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = results["baseline"]
+    print("\n" + "-" * 92)
+    print(f"{'Model':<14}{'Params':>11}{'MFLOPs':>9}{'1 img (ms)':>12}{f'{LATENCY_BATCH_SIZE} img (ms)':>13}"
+          f"{'Speedup':>9}{'Acc (%)':>9}{'Δ Acc':>8}")
+    print("-" * 92)
+    for name, r in results.items():
+        speedup = baseline["latency_batch_ms"] / r["latency_batch_ms"]
+        print(f"{name:<14}{r['params']:>11,}{r['mflops']:>9.2f}{r['latency_single_ms']:>12.3f}"
+              f"{r['latency_batch_ms']:>13.3f}{speedup:>8.2f}x{r['accuracy']:>9.2f}"
+              f"{r['accuracy'] - baseline['accuracy']:>+8.2f}")
+    print("-" * 92)
+    print(f"\nReport saved to: {REPORT_PATH}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune FocusCNN channels by BatchNorm gamma and fine-tune")
+    parser.add_argument("--model", type=str, default=None, help="Trained FocusCNN checkpoint")
+    parser.add_argument("--ratios", type=float, nargs="+", default=[0.25, 0.5, 0.75],
+                        help="Fractions of channels to remove per layer")
+    parser.add_argument("--epochs", type=int, default=3, help="Fine-tuning epochs per level")
+    parser.add_argument("--lr", type=float, default=LEARNING_RATE / 10)
+    parser.add_argument("--keep-hidden", action="store_true", help="Do not prune the hidden FC layer")
+    parser.add_argument("--threads", type=int, default=1, help="Intra-op threads for latency")
+    args = parser.parse_args()
+
+    for ratio in args.ratios:
+        if not 0 < ratio < 1:
+            parser.error(f"ratio {ratio} must be between 0 and 1")
+
+    prune(args.model, args.ratios, args.epochs, args.lr, not args.keep_hidden, args.threads)
@@ -0,0 +1,232 @@
+"""INT8 quantization of the focus detection model with an accuracy/latency report."""
+
+import io
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from config import DATA_DIR, MODEL_DIR, MODEL_PATH
+from dataset import load_images_from_folder
+from export import export_to_onnx
+from model import get_model
+
+# Exported from the checkpoint being quantized on every run, so all variants
+# in the report come from the same weights (never a stale focus_detector.onnx)
+FP32_ONNX_PATH = MODEL_DIR / "focus_detector.fp32.onnx"
+DYNAMIC_ONNX_PATH = MODEL_DIR / "focus_detector.int8_dynamic.onnx"
+STATIC_ONNX_PATH = MODEL_DIR / "focus_detector.int8_static.onnx"
+REPORT_PATH = MODEL_DIR / "quantization_report.json"
+
+# Calibration sample drawn from data/train (per emotion folder)
+CALIBRATION_PER_CLASS = 100
+CALIBRATION_BATCH_SIZE = 32
+
+# Latency measurement
+LATENCY_BATCH_SIZE = 64
+LATENCY_WARMUP = 10
+LATENCY_RUNS = 100
+
+
+def load_split(split: str, max_per_class: int = None):
+    """Load a data/ split as float32 [N, 1, 48, 48] images and int64 labels."""
+    images, labels = load_images_from_folder(DATA_DIR / split, max_per_class)
+    return np.array(images, dtype=np.float32)[:, np.newaxis], np.array(labels, dtype=np.int64)
+
+
+class CalibrationReader:
+    """onnxruntime CalibrationDataReader over an in-memory image array."""
+
+    def __init__(self, images: np.ndarray, input_name: str, batch_size: int = CALIBRATION_BATCH_SIZE):
+        self.batches = iter([
+            {input_name: images[i:i + batch_size]}
+            for i in range(0, len(images), batch_size)
+        ])
+
+    def get_next(self):
+        return next(self.batches, None)
+
+
+def quantize_onnx_dynamic(fp32_path: Path, output_path: Path):
+    """Dynamic INT8 quantization: weights offline, activations scaled per call."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    # ConvInteger on the CPU provider only accepts uint8 weights
+    quantize_dynamic(str(fp32_path), str(output_path), weight_type=QuantType.QUInt8)
+
+
+def quantize_onnx_static(fp32_path: Path, output_path: Path, calibration_images: np.ndarray):
+    """Static INT8 quantization with activation ranges calibrated on training images."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import (
+        quantize_static, CalibrationMethod, QuantFormat, QuantType
+    )
+
+    input_name = ort.InferenceSession(str(fp32_path)).get_inputs()[0].name
+    quantize_static(
+        str(fp32_path),
+        str(output_path),
+        CalibrationReader(calibration_images, input_name),
+        quant_format=QuantFormat.QOperator,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+
+
+def torch_variant(model: nn.Module):
+    """Wrap a PyTorch model as (predict_fn, size_bytes)."""
+    model.eval()
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        with torch.no_grad():
+            return model(torch.from_numpy(batch)).numpy()
+
+    return predict, buffer.tell()
+
+
+def onnx_variant(path: Path, num_threads: int = None):
+    """Wrap an ONNX file as (predict_fn, size_bytes)."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if num_threads:
+        options.intra_op_num_threads = num_threads
+    session = ort.InferenceSession(str(path), sess_options=options, providers=['CPUExecutionProvider'])
+    input_name = session.get_inputs()[0].name
+
+    def predict(batch: np.ndarray) -> np.ndarray:
+        return session.run(None, {input_name: batch})[0]
+
+    return predict, path.stat().st_size
+
+
+def measure_latency(predict, batch: np.ndarray) -> float:
+    """Median wall-clock latency of predict(batch) in milliseconds."""
+    for _ in range(LATENCY_WARMUP):
+        predict(batch)
+
+    timings = []
+    for _ in range(LATENCY_RUNS):
+        start = time.perf_counter()
+        predict(batch)
+        timings.append(time.perf_counter() - start)
+
+    return float(np.median(timings) * 1000.0)
+
+
+def evaluate_variant(predict, images: np.ndarray, labels: np.ndarray) -> float:
+    """Top-1 accuracy (%) on the given images."""
+    correct = 0
+    for i in range(0, len(images), LATENCY_BATCH_SIZE):
+        logits = predict(images[i:i + LATENCY_BATCH_SIZE])
+        correct += int((logits.argmax(axis=1) == labels[i:i + LATENCY_BATCH_SIZE]).sum())
+    return 100.0 * correct / len(labels)
+
+
+def quantize(model_path: str = None, num_threads: int = None):
+    """
+    Build INT8 variants of FocusCNN and compare them against FP32.
+
+    Variants:
+        torch_fp32:          Eager PyTorch checkpoint
+        torch_int8_dynamic:  PyTorch dynamic quantization of the Linear layers
+        onnx_fp32:           ONNX graph from export.py
+        onnx_int8_dynamic:   onnxruntime dynamic quantization
+        onnx_int8_static:    onnxruntime static quantization calibrated on data/train
+
+    Args:
+        model_path: Path to trained .pth model
+        num_threads: Intra-op threads used for the latency measurements
+
+    Returns:
+        Report dict, also written to REPORT_PATH
+    """
+    model_path = model_path or str(MODEL_PATH)
+    if num_threads:
+        torch.set_num_threads(num_threads)
+
+    print("=" * 60)
+    print("INT8 Quantization")
+    print("=" * 60)
+
+    export_to_onnx(model_path, str(FP32_ONNX_PATH))
+
+    # Quantize
+    print(f"\nLoading calibration sample ({CALIBRATION_PER_CLASS} per class) from data/train...")
+    calibration_images, _ = load_split("train", CALIBRATION_PER_CLASS)
+
+    print(f"\nDynamic quantization -> {DYNAMIC_ONNX_PATH}")
+    quantize_onnx_dynamic(FP32_ONNX_PATH, DYNAMIC_ONNX_PATH)
+
+    print(f"Static quantization ({len(calibration_images)} calibration images) -> {STATIC_ONNX_PATH}")
+    quantize_onnx_static(FP32_ONNX_PATH, STATIC_ONNX_PATH, calibration_images)
+
+    fp32_model = get_model(pretrained_path=model_path)
+    fp32_model.eval()
+    int8_model = torch.ao.quantization.quantize_dynamic(fp32_model, {nn.Linear}, dtype=torch.qint8)
+
+    variants = {
+        "torch_fp32": torch_variant(fp32_model),
+        "torch_int8_dynamic": torch_variant(int8_model),
+        "onnx_fp32": onnx_variant(FP32_ONNX_PATH, num_threads),
+        "onnx_int8_dynamic": onnx_variant(DYNAMIC_ONNX_PATH, num_threads),
+        "onnx_int8_static": onnx_variant(STATIC_ONNX_PATH, num_threads),
+    }
+
+    # Evaluate
+    print("\nLoading data/test...")
+    test_images, test_labels = load_split("test")
+    single = test_images[:1]
+    batched = test_images[:LATENCY_BATCH_SIZE]
+
+    results = {}
+    for name, (predict, size_bytes) in variants.items():
+        print(f"Evaluating {name}...")
+        results[name] = {
+            "accuracy": round(evaluate_variant(predict, test_images, test_labels), 2),
+            "size_mb": round(size_bytes / 2**20, 3),
+            "latency_single_ms": round(measure_latency(predict, single), 3),
+            "latency_batch_ms": round(measure_latency(predict, batched), 3),
+        }
+
+    report = {
+        "test_samples": len(test_labels),
+        "calibration_samples": len(calibration_images),
+        "batch_size": LATENCY_BATCH_SIZE,
+        "num_threads": torch.get_num_threads(),
+        "variants": results,
+    }
+    with open(REPORT_PATH, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = results["torch_fp32"]["accuracy"]
+    print("\n" + "-" * 84)
+    print(f"{'Variant':<22}{'Acc (%)':<10}{'Δ Acc':<9}{'Size (MB)':<12}"
+          f"{'1 img (ms)':<13}{f'{LATENCY_BATCH_SIZE} img (ms)':<13}")
+    print("-" * 84)
+    for name, r in results.items():
+        print(f"{name:<22}{r['accuracy']:<10.2f}{r['accuracy'] - baseline:<+9.2f}{r['size_mb']:<12.3f}"
+              f"{r['latency_single_ms']:<13.3f}{r['latency_batch_ms']:<13.3f}")
+    print("-" * 84)
+    print(f"\nReport saved to: {REPORT_PATH}")
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Quantize the focus model to INT8 and report accuracy/latency")
+    parser.add_argument("--model", default=None, help="Path to trained .pth model")
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads for torch and onnxruntime")
+    args = parser.parse_args()
+
+    quantize(args.model, args.threads)
@@ -0,0 +1,374 @@
+"""
+Model loading and request handling shared by the focus detection servers.
+
+Both the Flask app (api_server.py) and the ASGI app (asgi_server.py) import
+this module; the backend and micro-batcher are created once per process at
+import time unless SERVING_AUTOSTART=0, in which case `start()` does it.
+
+By default the model is loaded and warmed up on a background thread, so the
+server accepts connections immediately and `/health` answers 503 until the
+model is ready. `reload()` (admin endpoint or model file watch) loads a new
+model next to the serving one and swaps both references at once; requests
+already queued on the old micro-batcher still complete.
+"""
+
+import hmac
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.backends import load_backend, check_parity
+from ml.batching import MicroBatcher
+from ml.prediction_cache import PredictionCache
+from ml.preprocessing import decode_frames, pixels_to_input
+from ml import metrics
+from ml.config import (
+    MODEL_PATH, ONNX_MODEL_PATH, TORCHSCRIPT_MODEL_PATH, WEIGHTS_MODEL_PATH, SERVING_BACKEND,
+    SERVING_MAX_BATCH_SIZE, SERVING_MAX_WAIT_MS, MAX_FRAMES_PER_REQUEST,
+    SERVING_BACKGROUND_LOAD, SERVING_WARMUP_ITERATIONS, SERVING_MODEL_WATCH_SECONDS, SERVING_RELOAD_DRAIN_SECONDS,
+    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS, PREDICTION_CACHE_MODE, PREDICTION_CACHE_LEVELS,
+)
+
+
+def default_torch_path():
+    """The slim weights file from `export.py --format weights` unless the training checkpoint is newer."""
+    if WEIGHTS_MODEL_PATH.exists() and (
+        not MODEL_PATH.exists() or WEIGHTS_MODEL_PATH.stat().st_mtime >= MODEL_PATH.stat().st_mtime
+    ):
+        return str(WEIGHTS_MODEL_PATH)
+    return str(MODEL_PATH)
+
+
+# Inference backend selection
+BACKEND_NAME = os.environ.get('INFERENCE_BACKEND', SERVING_BACKEND)
+BACKEND_MODEL_PATHS = {
+    'torch': os.environ.get('MODEL_PATH'),  # None: default_torch_path() at each load
+    'torchscript': os.environ.get('TORCHSCRIPT_MODEL_PATH', str(TORCHSCRIPT_MODEL_PATH)),
+    'onnx': os.environ.get('ONNX_MODEL_PATH', str(ONNX_MODEL_PATH)),
+}
+INFERENCE_THREADS = int(os.environ.get('INFERENCE_THREADS', 0)) or None
+PARITY_CHECK = os.environ.get('BACKEND_PARITY_CHECK', '1') == '1'
+
+# Startup and hot reload
+BACKGROUND_LOAD = os.environ.get('BACKGROUND_LOAD', '1' if SERVING_BACKGROUND_LOAD else '0') == '1'
+WARMUP_ITERATIONS = int(os.environ.get('WARMUP_ITERATIONS', SERVING_WARMUP_ITERATIONS))
+MODEL_WATCH_SECONDS = float(os.environ.get('MODEL_WATCH_SECONDS', SERVING_MODEL_WATCH_SECONDS))
+RELOAD_DRAIN_SECONDS = float(os.environ.get('RELOAD_DRAIN_SECONDS', SERVING_RELOAD_DRAIN_SECONDS))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Unset disables /admin/reload
+
+# Prediction cache for repeated frames
+CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', PREDICTION_CACHE_SIZE))
+CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', PREDICTION_CACHE_TTL_SECONDS))
+CACHE_MODE = os.environ.get('PREDICTION_CACHE_MODE', PREDICTION_CACHE_MODE)
+
+# Per-stage latency histograms, bound once for the hot path
+STAGES = {
+    stage: metrics.STAGE_SECONDS.labels(stage=stage)
+    for stage in ('decode', 'preprocess', 'inference', 'serialize')
+}
+
+
+def torch_model_path():
+    """PyTorch checkpoint to load now: MODEL_PATH if set, else the newer of the two torch files."""
+    return BACKEND_MODEL_PATHS['torch'] or default_torch_path()
+
+
+def model_path():
+    """Model file the configured backend would load now."""
+    if BACKEND_NAME == 'torch':
+        return torch_model_path()
+    return BACKEND_MODEL_PATHS.get(BACKEND_NAME, '')
+
+
+def watched_paths():
+    """Files whose changes trigger a reload (both torch files unless MODEL_PATH is set)."""
+    if BACKEND_NAME == 'torch' and BACKEND_MODEL_PATHS['torch'] is None:
+        return [str(MODEL_PATH), str(WEIGHTS_MODEL_PATH)]
+    return [model_path()]
+
+
+def load_checked(path: str = None):
+    """Load the configured backend from `path` (default: model_path()) and run the parity check; raises on failure."""
+    path = path or model_path()
+    backend = load_backend(BACKEND_NAME, path, INFERENCE_THREADS)
+    print(f"Model loaded successfully from {path}")
+    
+    # Verify a non-default backend against the PyTorch checkpoint
+    if PARITY_CHECK and BACKEND_NAME != 'torch':
+        try:
+            reference = load_backend('torch', torch_model_path())
+        except (ImportError, FileNotFoundError) as e:
+            print(f"Parity check vs torch: SKIPPED ({e})")
+        else:
+            max_diff = check_parity(backend, reference)
+            del reference
+            print(f"Parity check vs torch: PASSED (max diff {max_diff:.2e})")
+    
+    return backend
+
+
+def load_model():
+    """Load the configured backend, running the parity check; None on failure."""
+    print(f"Loading focus detection model ({BACKEND_NAME} backend)...")
+    try:
+        return load_checked()
+    except Exception as e:
+        print(f"Error loading model: {e}")
+        return None
+
+
+def warmup(backend, batch_size: int):
+    """
+    Run a few forward passes at batch sizes 1 and `batch_size` before serving.
+    
+    The first passes pay for lazy initialization (allocator pools, oneDNN
+    primitive creation, onnxruntime arenas); doing them here keeps that
+    cost off the first user requests.
+    """
+    start = time.perf_counter()
+    for size in sorted({1, batch_size}):
+        batch = np.zeros((size, 1, 48, 48), dtype=np.float32)
+        for _ in range(WARMUP_ITERATIONS):
+            backend.predict(batch)
+    print(f"Warmup finished in {1000 * (time.perf_counter() - start):.0f} ms")
+
+
+def create_batcher(backend):
+    """Micro-batcher over `backend.predict` that records batch sizes."""
+    def run_batch(batch):
+        metrics.BATCH_SIZE.observe(len(batch))
+        return backend.predict(batch)
+    
+    # Concurrent requests are grouped into one forward pass
+    batcher = MicroBatcher(
+        run_batch,
+        max_batch_size=int(os.environ.get('MAX_BATCH_SIZE', SERVING_MAX_BATCH_SIZE)),
+        max_wait_ms=float(os.environ.get('MAX_BATCH_WAIT_MS', SERVING_MAX_WAIT_MS)),
+    )
+    print(f"Micro-batching enabled (max_batch_size={batcher.max_batch_size}, "
+          f"max_wait_ms={batcher.max_wait * 1000:.1f})")
+    return batcher
+
+
+def batch_pixels(frame_format, parts=None, body=None):
+    """Decode a binary batch submission to uint8 pixels [N, 48, 48] (see decode_frames)."""
+    return decode_frames(frame_format, parts=parts, body=body, max_frames=MAX_FRAMES_PER_REQUEST)
+
+
+def create_cache():
+    """Prediction cache from the environment; None when PREDICTION_CACHE_SIZE is 0."""
+    if CACHE_SIZE <= 0:
+        return None
+    cache = PredictionCache(CACHE_SIZE, CACHE_TTL, CACHE_MODE, PREDICTION_CACHE_LEVELS)
+    print(f"Prediction cache enabled (mode={cache.mode}, max_entries={cache.max_entries}, "
+          f"ttl={cache.ttl:g}s)")
+    return cache
+
+
+def predict_pixels(pixels):
+    """
+    Probabilities [N, 2] for uint8 pixels [N, 48, 48].
+    
+    Frames found in the prediction cache are answered from it; only the
+    misses go through the micro-batcher and are then cached. The batcher is
+    read after the lookup, so a lookup made after a model swap (which clears
+    the cache) always runs on the new model.
+    """
+    if cache is None:
+        return batcher.predict(pixels_to_input(pixels))
+    
+    keys, results, misses, generation = cache.lookup(pixels)
+    if misses:
+        probabilities = batcher.predict(pixels_to_input(pixels[misses]))
+        cache.store(keys, results, misses, probabilities, generation)
+    return np.stack(results)
+
+
+def format_prediction(probabilities):
+    """Response body for one frame's [p_focused, p_distracted]."""
+    focused_prob = float(probabilities[0])
+    distracted_prob = float(probabilities[1])
+    
+    prediction = 'focused' if focused_prob > distracted_prob else 'distracted'
+    confidence = max(focused_prob, distracted_prob)
+    
+    return {
+        'prediction': prediction,
+        'confidence': round(confidence, 3),
+        'focused_prob': round(focused_prob, 3),
+        'distracted_prob': round(distracted_prob, 3),
+    }
+
+
+def format_batch(probabilities):
+    """Compact response body for [N, 2] probabilities."""
+    return {
+        'classes': ['focused', 'distracted'],
+        'probs': np.round(probabilities, 3).tolist(),
+    }
+
+
+def is_ready():
+    return status == 'ready' and batcher is not None
+
+
+def health():
+    """Health check response body (servers answer 503 until `ready`)."""
+    ready = is_ready()
+    return {
+        'status': 'ok' if ready else status,
+        'ready': ready,
+        'model_loaded': ready,
+        'backend': BACKEND_NAME,
+        'model_path': model_path(),
+        'loaded_at': loaded_at,
+        'reloads': reloads,
+        'prediction_cache': cache.stats() if cache is not None else None,
+    }
+
+
+def unavailable():
+    """Error body and status code for a request that arrives without a ready model."""
+    if status == 'loading':
+        return {'error': 'Model loading, retry shortly'}, 503
+    return {'error': 'Model not loaded'}, 500
+
+
+def authorized(header):
+    """True if an `Authorization: Bearer <ADMIN_TOKEN>` header matches (never when ADMIN_TOKEN is unset)."""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(header or '', f"Bearer {ADMIN_TOKEN}")
+
+
+def activate(new_backend):
+    """
+    Warm up `new_backend` and swap it in with a fresh micro-batcher.
+    
+    Handlers read `batcher` once per request, so each request runs entirely
+    on either the old or the new model. The old batcher keeps serving what
+    was already submitted to it and is closed after RELOAD_DRAIN_SECONDS.
+    The prediction cache is cleared right after the swap; results of
+    lookups made before that are not cached (see PredictionCache.store).
+    """
+    global backend, batcher, status, loaded_at
+    new_batcher = create_batcher(new_backend)
+    warmup(new_backend, new_batcher.max_batch_size)
+    
+    with _swap_lock:
+        old_batcher = batcher
+        backend, batcher = new_backend, new_batcher
+        status = 'ready'
+        loaded_at = time.time()
+        if cache is not None:
+            cache.clear()
+    
+    if old_batcher is not None:
+        threading.Timer(RELOAD_DRAIN_SECONDS, old_batcher.close).start()
+
+
+def reload():
+    """
+    Load the model file again and swap it in without dropping requests.
+    
+    The current model keeps serving while the new one loads and warms up;
+    if loading fails it stays in place and the error is raised.
+    
+    Returns:
+        Summary dict for the admin endpoint
+    """
+    global reloads
+    with _reload_lock:
+        start_time = time.perf_counter()
+        # Chosen again on every reload, so a retrain that writes a checkpoint
+        # newer than the slim weights file is picked up
+        path = model_path()
+        print(f"Reloading focus detection model from {path}...")
+        activate(load_checked(path))
+        reloads += 1
+        seconds = time.perf_counter() - start_time
+        print(f"Model reloaded in {seconds:.2f}s")
+        return {'status': 'reloaded', 'backend': BACKEND_NAME, 'model_path': path,
+                'seconds': round(seconds, 3)}
+
+
+def watch_model(interval: float):
+    """
+    Reload whenever a watched model file changes (polled every `interval` seconds).
+    
+    A change is acted on once the modification times have been stable for
+    one interval, so a file that is still being written is not loaded.
+    """
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def mtimes():
+        return tuple(mtime(path) for path in watched_paths())
+    
+    current = seen = mtimes()
+    while True:
+        time.sleep(interval)
+        latest = mtimes()
+        if any(t is not None for t in latest) and latest != current and latest == seen:
+            current = latest
+            try:
+                reload()
+            except Exception as e:
+                print(f"Model reload failed, keeping the current model: {e}")
+        seen = latest
+
+
+def start(background: bool = None):
+    """
+    Load the backend (unless already loaded), warm it up and start the micro-batcher.
+    
+    Args:
+        background: Do it on a background thread (default: BACKGROUND_LOAD)
+    """
+    global status, _watcher
+    if batcher is not None or status == 'loading':
+        return
+    background = BACKGROUND_LOAD if background is None else background
+    status = 'loading'
+    
+    def load():
+        global status
+        model = backend if backend is not None else load_model()
+        if model is None:
+            status = 'error'
+            return
+        try:
+            activate(model)
+        except Exception as e:
+            print(f"Error warming up model: {e}")
+            status = 'error'
+    
+    if background:
+        threading.Thread(target=load, name='model-loader', daemon=True).start()
+    else:
+        load()
+    
+    if MODEL_WATCH_SECONDS > 0 and _watcher is None:
+        _watcher = threading.Thread(target=watch_model, args=(MODEL_WATCH_SECONDS,), name='model-watcher', daemon=True)
+        _watcher.start()
+
+
+backend = None
+batcher = None
+cache = create_cache()
+status = 'stopped'  # 'stopped', 'loading', 'ready' or 'error'
+loaded_at = None
+reloads = 0
+_swap_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_watcher = None
+
+# Load model once at startup (prefork.py defers this to its workers)
+if os.environ.get('SERVING_AUTOSTART', '1') == '1':
+    start()
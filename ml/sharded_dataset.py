@@ -0,0 +1,265 @@
+"""
+Streaming sharded dataset for corpora larger than RAM.
+
+A shard directory holds packed uint8 arrays plus an index:
+
+    <shard_dir>/index.json                  {"total", "labels", "shards": [{"name", "count"}]}
+    <shard_dir>/shard-00000.images.npy      uint8 [n, 48, 48]
+    <shard_dir>/shard-00000.labels.npy      uint8 [n] focus labels
+
+`ShardedFaceDataset` streams shards sequentially through a bounded shuffle
+buffer, so memory stays flat regardless of dataset size, and splits shards
+across DataLoader workers. It yields whole batches, so it exposes
+`num_samples` and `num_batches` instead of `len()`.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, DataLoader, get_worker_info
+
+from config import DATA_DIR, BATCH_SIZE, EMOTION_TO_FOCUS
+from dataset import BATCH_AUGMENTATIONS, prepare_batch, list_image_files, decode_images_parallel
+
+INDEX_FILE = "index.json"
+
+
+class ShardWriter:
+    """
+    Writes (images, labels) into fixed-size shards.
+
+    Args:
+        shard_dir: Output directory
+        shard_size: Samples per shard
+    """
+
+    def __init__(self, shard_dir: Path, shard_size: int = 4096):
+        self.shard_dir = Path(shard_dir)
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+
+        self.shards = []
+        self.label_counts = {}
+        self._images = np.empty((shard_size, 48, 48), dtype=np.uint8)
+        self._labels = np.empty(shard_size, dtype=np.uint8)
+        self._fill = 0
+
+    def add(self, images: np.ndarray, labels: np.ndarray):
+        """Append uint8 [k, 48, 48] images and their labels."""
+        offset = 0
+        while offset < len(images):
+            take = min(self.shard_size - self._fill, len(images) - offset)
+            self._images[self._fill:self._fill + take] = images[offset:offset + take]
+            self._labels[self._fill:self._fill + take] = labels[offset:offset + take]
+            self._fill += take
+            offset += take
+
+            if self._fill == self.shard_size:
+                self._flush()
+
+    def close(self) -> dict:
+        """Flush the last partial shard and write the index."""
+        if self._fill:
+            self._flush()
+
+        index = {
+            "total": sum(shard["count"] for shard in self.shards),
+            "labels": {str(k): v for k, v in sorted(self.label_counts.items())},
+            "shards": self.shards,
+        }
+        tmp_path = self.shard_dir / (INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.shard_dir / INDEX_FILE)
+        return index
+
+    def _flush(self):
+        name = f"shard-{len(self.shards):05d}"
+        np.save(self.shard_dir / f"{name}.images.npy", self._images[:self._fill])
+        np.save(self.shard_dir / f"{name}.labels.npy", self._labels[:self._fill])
+
+        for label, count in zip(*np.unique(self._labels[:self._fill], return_counts=True)):
+            self.label_counts[int(label)] = self.label_counts.get(int(label), 0) + int(count)
+
+        self.shards.append({"name": name, "count": self._fill})
+        self._fill = 0
+
+
+def write_shards_from_folder(
+    folder_path: Path, shard_dir: Path, shard_size: int = 4096, seed: int = 0, num_workers: int = None
+) -> dict:
+    """
+    Decode an emotion-folder tree into shards, one shard's worth at a time.
+
+    Files are shuffled before sharding so every shard mixes all classes.
+    """
+    image_files, emotions = list_image_files(Path(folder_path))
+    order = np.random.default_rng(seed).permutation(len(image_files))
+    focus = np.array([EMOTION_TO_FOCUS.get(e, 1) for e in emotions], dtype=np.uint8)
+
+    writer = ShardWriter(shard_dir, shard_size)
+    for start in range(0, len(order), shard_size):
+        chunk = order[start:start + shard_size]
+        images, ok, errors = decode_images_parallel([image_files[i] for i in chunk], num_workers)
+        for error in errors:
+            print(f"  Error loading {error['path']}: {error['error']}")
+        writer.add(images[ok], focus[chunk][ok])
+
+    return writer.close()
+
+
+class ShardedFaceDataset(IterableDataset):
+    """
+    Streams pre-collated batches from a shard directory.
+
+    Each iteration (epoch) draws a fresh seed: shard order is shuffled
+    identically in every worker, each worker takes every `num_workers`-th
+    shard, reads its shards sequentially through a `buffer_size` shuffle
+    buffer and yields normalized, augmented batches.
+
+    Args:
+        shard_dir: Directory written by ShardWriter
+        batch_size: Samples per yielded batch
+        shuffle: Shuffle shard order and samples (through the buffer)
+        augment: Apply BATCH_AUGMENTATIONS to each batch
+        buffer_size: Shuffle buffer capacity in samples
+    """
+
+    def __init__(self, shard_dir: Path, batch_size: int = BATCH_SIZE, shuffle: bool = True,
+                 augment: bool = False, buffer_size: int = 8192):
+        self.shard_dir = Path(shard_dir)
+        with open(self.shard_dir / INDEX_FILE) as f:
+            self.index = json.load(f)
+
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.augmentations = BATCH_AUGMENTATIONS if augment else []
+        # Blocks of batch_size samples are swapped through the buffer at once
+        self.buffer_size = max(buffer_size, batch_size)
+
+    # No __len__: a DataLoader over this dataset would report it as its batch
+    # count, while len() of every other dataset in the repo counts samples
+
+    @property
+    def num_samples(self) -> int:
+        """Samples per epoch."""
+        return self.index["total"]
+
+    @property
+    def num_batches(self) -> int:
+        """Approximate batches per epoch (each worker may yield one partial batch)."""
+        return -(-self.num_samples // self.batch_size)
+
+    def label_counts(self) -> dict:
+        return {int(k): v for k, v in self.index["labels"].items()}
+
+    def _iter_shard(self, name: str) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (images, labels) blocks of one shard, reading it sequentially."""
+        images = np.load(self.shard_dir / f"{name}.images.npy", mmap_mode="r")
+        labels = np.load(self.shard_dir / f"{name}.labels.npy", mmap_mode="r")
+        for start in range(0, len(labels), self.batch_size):
+            yield images[start:start + self.batch_size], labels[start:start + self.batch_size]
+
+    def _iter_samples(self, shards, rng) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (images, labels) blocks, shuffled through a bounded buffer when enabled."""
+        if not self.shuffle:
+            for name in shards:
+                yield from self._iter_shard(name)
+            return
+
+        buffer_images = np.empty((self.buffer_size, 48, 48), dtype=np.uint8)
+        buffer_labels = np.empty(self.buffer_size, dtype=np.uint8)
+        fill = 0
+
+        for name in shards:
+            for images, labels in self._iter_shard(name):
+                # Fill the buffer first
+                take = min(self.buffer_size - fill, len(labels))
+                buffer_images[fill:fill + take] = images[:take]
+                buffer_labels[fill:fill + take] = labels[:take]
+                fill += take
+
+                # Buffer full: emit random resident samples and put the new ones in their slots
+                rest = len(labels) - take
+                if rest:
+                    slots = rng.choice(self.buffer_size, size=rest, replace=False)
+                    yield buffer_images[slots], buffer_labels[slots]
+                    buffer_images[slots] = images[take:]
+                    buffer_labels[slots] = labels[take:]
+
+        # Drain what is left in random order
+        order = rng.permutation(fill)
+        yield buffer_images[order], buffer_labels[order]
+
+    def __iter__(self) -> Iterator[Tuple[torch.Tensor, torch.Tensor]]:
+        worker = get_worker_info()
+        if worker is None:
+            worker_id, num_workers = 0, 1
+            base_seed = int(torch.empty((), dtype=torch.int64).random_().item())
+        else:
+            # DataLoader draws a new base seed per epoch; worker.seed = base_seed + id
+            worker_id, num_workers = worker.id, worker.num_workers
+            base_seed = worker.seed - worker.id
+
+        shards = [shard["name"] for shard in self.index["shards"]]
+        if self.shuffle:
+            # Same permutation in every worker, so the split below is a partition
+            order = np.random.default_rng(base_seed % 2**63).permutation(len(shards))
+            shards = [shards[i] for i in order]
+        shards = shards[worker_id::num_workers]
+
+        rng = np.random.default_rng((base_seed + worker_id) % 2**63)
+        batch_images = np.empty((self.batch_size, 48, 48), dtype=np.uint8)
+        batch_labels = np.empty(self.batch_size, dtype=np.int64)
+        fill = 0
+
+        for images, labels in self._iter_samples(shards, rng):
+            offset = 0
+            while offset < len(labels):
+                take = min(self.batch_size - fill, len(labels) - offset)
+                batch_images[fill:fill + take] = images[offset:offset + take]
+                batch_labels[fill:fill + take] = labels[offset:offset + take]
+                fill += take
+                offset += take
+
+                if fill == self.batch_size:
+                    yield prepare_batch(batch_images.copy(), self.augmentations), torch.from_numpy(batch_labels.copy())
+                    fill = 0
+
+        if fill:
+            yield prepare_batch(batch_images[:fill].copy(), self.augmentations), torch.from_numpy(batch_labels[:fill].copy())
+
+
+def make_streaming_loader(dataset: ShardedFaceDataset, num_workers: int = 0) -> DataLoader:
+    """DataLoader over a ShardedFaceDataset (batches come pre-collated)."""
+    return DataLoader(
+        dataset,
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=True,
+        persistent_workers=False,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack emotion image folders into uint8 shards")
+    parser.add_argument("--source", type=Path, default=DATA_DIR, help="Folder containing train/ and test/")
+    parser.add_argument("--output", type=Path, default=None, help="Shard root (default: <source>/shards)")
+    parser.add_argument("--shard-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=None, help="Decode processes (default: all cores)")
+    args = parser.parse_args()
+
+    output = args.output or args.source / "shards"
+    for split in ("train", "test"):
+        if not (args.source / split).exists():
+            continue
+        print(f"Writing {split} shards to {output / split}...")
+        index = write_shards_from_folder(args.source / split, output / split, args.shard_size,
+                                         num_workers=args.workers)
+        print(f"  {index['total']} samples in {len(index['shards'])} shards")
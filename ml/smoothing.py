@@ -0,0 +1,80 @@
+"""Per-identity temporal smoothing of focus predictions."""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Add parent directory to path for imports (also used by the servers as ml.smoothing)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ml.config import SMOOTHING_WINDOW, SMOOTHING_IDLE_SECONDS, MAX_SMOOTHING_IDENTITIES
+
+
+class TemporalSmoother:
+    """
+    Majority vote over each identity's recent predictions.
+
+    Every identity (a tracked face, a streaming session, ...) keeps its own
+    bounded window, so histories never mix. Identities that have not been
+    updated for `idle_timeout` seconds are evicted, and at most
+    `max_identities` are kept (least recently updated go first), so memory
+    stays bounded over long sessions.
+
+    Args:
+        window: Predictions kept per identity
+        idle_timeout: Seconds without an update before an identity is evicted
+        max_identities: Upper bound on identities held at once
+    """
+
+    def __init__(
+        self,
+        window: int = SMOOTHING_WINDOW,
+        idle_timeout: float = SMOOTHING_IDLE_SECONDS,
+        max_identities: int = MAX_SMOOTHING_IDENTITIES,
+    ):
+        self.window = window
+        self.idle_timeout = idle_timeout
+        self.max_identities = max_identities
+        self._states = OrderedDict()  # key -> (history, last update), oldest first
+        self._lock = threading.Lock()
+
+    def update(self, key, predicted: int) -> int:
+        """Record a class index for `key` and return its smoothed class index."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.pop(key, None)
+            history = state[0] if state is not None else deque(maxlen=self.window)
+            history.append(predicted)
+            self._states[key] = (history, now)
+            self._evict(now)
+            return round(sum(history) / len(history))
+
+    def evict_idle(self) -> int:
+        """Drop identities idle for longer than `idle_timeout`; returns how many."""
+        with self._lock:
+            return self._evict(time.monotonic())
+
+    def _evict(self, now: float) -> int:
+        evicted = 0
+        while self._states:
+            key, (_, last_seen) = next(iter(self._states.items()))
+            if len(self._states) <= self.max_identities and now - last_seen <= self.idle_timeout:
+                break
+            del self._states[key]
+            evicted += 1
+        return evicted
+
+    def reset(self, key=None):
+        """Forget one identity, or all of them."""
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+    def __len__(self):
+        return len(self._states)
+
+    def __contains__(self, key):
+        return key in self._states
@@ -0,0 +1,399 @@
+"""
+Parallel hyperparameter sweep.
+
+Runs a grid or random search over the training hyperparameters in worker
+processes. Each trial gets `threads_per_trial` intra-op threads, and every
+worker memory-maps the same dataset cache (dataset_cache.py), so the corpus
+is decoded at most once and its pages are shared through the OS page cache
+instead of being copied into each process.
+
+Trials report their best test accuracy after every epoch. Once a trial is
+past the warmup epochs, it is stopped if that accuracy is below the median
+of the other trials at the same epoch (median stopping rule).
+
+Usage:
+    python sweep.py                                        # default grid
+    python sweep.py --param lr=3e-4,1e-3 --param batch_size=64,128
+    python sweep.py --trials 12 --param lr=1e-4:1e-2 --param weight_decay=1e-5:1e-3
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import Manager
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+
+from config import (
+    DATA_DIR, DEVICE, SEED, CLASS_NAMES, BATCH_SIZE, LEARNING_RATE, WEIGHT_DECAY,
+    EARLY_STOPPING_PATIENCE, SWEEP_DIR, SWEEP_WORKERS, SWEEP_THREADS_PER_TRIAL,
+    SWEEP_MEDIAN_WARMUP_EPOCHS, SWEEP_MEDIAN_MIN_TRIALS,
+)
+from checkpoint import seed_epoch, to_cpu, write_atomic
+from dataset import FER2013Dataset, make_loader
+from dataset_cache import is_fresh, compile_split, load_split
+from model import MODELS, DEFAULT_MODEL, create_model, model_metadata
+from train import train_epoch, evaluate
+
+# Tunable hyperparameters and their types
+PARAMS = {
+    "lr": float,
+    "weight_decay": float,
+    "batch_size": int,
+    "dropout": float,
+    "arch": str,
+}
+
+# Used when no --param is given
+DEFAULT_SPACE = {
+    "lr": [3e-4, LEARNING_RATE, 3e-3],
+    "weight_decay": [1e-5, WEIGHT_DECAY, 1e-3],
+    "batch_size": [BATCH_SIZE, 2 * BATCH_SIZE],
+}
+
+RESULT_FIELDS = ["trial", "status", "best_acc", "best_epoch", "epochs_run", "seconds", "checkpoint"]
+
+# Per-process training/test arrays, set by _init_worker
+_data = None
+
+
+def parse_param(spec: str):
+    """
+    Parse NAME=V1,V2,... (choices) or NAME=LO:HI (log-uniform range, random search only).
+
+    Returns:
+        (name, list of choices or (low, high) tuple)
+    """
+    name, sep, values = spec.partition("=")
+    if not sep or name not in PARAMS:
+        raise ValueError(f"Expected NAME=VALUES with NAME in {', '.join(PARAMS)}, got {spec!r}")
+    cast = PARAMS[name]
+
+    if ":" in values:
+        if cast is str:
+            raise ValueError(f"{name} takes a list of choices, not a range")
+        low, high = (float(v) for v in values.split(":"))
+        if not 0 < low < high:
+            raise ValueError(f"Range for {name} must satisfy 0 < LO < HI")
+        return name, (low, high)
+
+    return name, [cast(v) for v in values.split(",")]
+
+
+def grid_trials(space: dict) -> list:
+    """Every combination of the choices in `space`."""
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            raise ValueError(f"{name} is a range; ranges need random search (--trials N)")
+    names = list(space)
+    return [dict(zip(names, combo)) for combo in itertools.product(*space.values())]
+
+
+def random_trials(space: dict, num_trials: int, seed: int = SEED) -> list:
+    """`num_trials` samples: uniform over choices, log-uniform over ranges."""
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(num_trials):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                value = math.exp(rng.uniform(math.log(values[0]), math.log(values[1])))
+                params[name] = round(value) if PARAMS[name] is int else value
+            else:
+                params[name] = rng.choice(values)
+        trials.append(params)
+    return trials
+
+
+def prepare_data_cache():
+    """Compile any missing or stale split once, before workers start reading it."""
+    for split in ("train", "test"):
+        if (DATA_DIR / split).exists() and not is_fresh(split):
+            print(f"  {split}: cache missing or stale, compiling...")
+            compile_split(split)
+
+
+def load_shared_data(seed: int = SEED) -> tuple:
+    """
+    Memory-mapped train/test arrays from the dataset cache.
+
+    Without a data/test folder the train split is divided 80/20 with a fixed
+    seed, so every trial is evaluated on the same held-out images (those
+    arrays are then per-process copies rather than shared pages).
+    """
+    train_images, train_labels = load_split("train", rebuild=False)
+    if (DATA_DIR / "test").exists():
+        test_images, test_labels = load_split("test", rebuild=False)
+    else:
+        indices = np.random.RandomState(seed).permutation(len(train_images))
+        split_idx = int(len(indices) * 0.8)
+        test_images, test_labels = train_images[indices[split_idx:]], train_labels[indices[split_idx:]]
+        train_images, train_labels = train_images[indices[:split_idx]], train_labels[indices[:split_idx]]
+    return train_images, train_labels, test_images, test_labels
+
+
+def _init_worker(num_threads: int, seed: int):
+    """Pool initializer: bound the torch thread pools and map the dataset once per process."""
+    global _data
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    _data = load_shared_data(seed)
+
+
+def median_stop(history, trial: int, epoch: int, best_acc: float,
+                warmup: int = SWEEP_MEDIAN_WARMUP_EPOCHS, min_trials: int = SWEEP_MEDIAN_MIN_TRIALS) -> bool:
+    """
+    Median stopping rule.
+
+    Args:
+        history: Trial -> list of best-so-far accuracies, one per epoch (shared dict)
+        trial: This trial's id
+        epoch: Epoch just finished (0-based)
+        best_acc: This trial's best accuracy so far
+
+    Returns:
+        True if the trial should stop
+    """
+    if epoch + 1 < warmup:
+        return False
+    peers = [accs[epoch] for other, accs in history.items() if other != trial and len(accs) > epoch]
+    if len(peers) < min_trials:
+        return False
+    return best_acc < statistics.median(peers)
+
+
+def run_trial(trial: int, params: dict, num_epochs: int, seed: int, output_dir: str,
+              history=None, early_stop: bool = True) -> dict:
+    """
+    Train one configuration and save its best weights.
+
+    Args:
+        trial: Trial id (also names the checkpoint)
+        params: Hyperparameters (see PARAMS); missing ones fall back to config.py
+        num_epochs: Maximum epochs
+        seed: Seed shared by all trials, so they see the same data order
+        output_dir: Sweep directory
+        history: Shared trial -> accuracies dict for median stopping
+        early_stop: Apply the median stopping rule
+
+    Returns:
+        Result row (see RESULT_FIELDS) plus the hyperparameters
+    """
+    start = time.perf_counter()
+    train_images, train_labels, test_images, test_labels = _data if _data is not None else load_shared_data(seed)
+
+    arch = params.get("arch", DEFAULT_MODEL)
+    model_config = {"dropout": params["dropout"]} if "dropout" in params else {}
+
+    train_loader = make_loader(
+        FER2013Dataset(train_images, train_labels, augment=True),
+        shuffle=True, batch_size=params.get("batch_size", BATCH_SIZE),
+    )
+    test_loader = make_loader(FER2013Dataset(test_images, test_labels), shuffle=False)
+
+    seed_epoch(seed, -1)  # Same initial weights for every trial of an architecture
+    model = create_model(arch, num_classes=len(CLASS_NAMES), **model_config).to(DEVICE)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.AdamW(
+        model.parameters(),
+        lr=params.get("lr", LEARNING_RATE),
+        weight_decay=params.get("weight_decay", WEIGHT_DECAY)
+    )
+    scheduler = optim.lr_scheduler.ReduceLROnPlateau(optimizer, mode='max', factor=0.5, patience=3)
+
+    best_acc, best_epoch, best_state = 0.0, -1, None
+    accuracies = []
+    status = "completed"
+    patience_counter = 0
+
+    for epoch in range(num_epochs):
+        seed_epoch(seed, epoch)
+        train_epoch(model, train_loader, criterion, optimizer, DEVICE)
+        _, test_acc = evaluate(model, test_loader, criterion, DEVICE)
+        scheduler.step(test_acc)
+
+        if test_acc > best_acc:
+            best_acc, best_epoch, best_state = test_acc, epoch, to_cpu(model.state_dict())
+            patience_counter = 0
+        else:
+            patience_counter += 1
+
+        accuracies.append(best_acc)
+        if history is not None:
+            history[trial] = list(accuracies)
+
+        if early_stop and history is not None and median_stop(history, trial, epoch, best_acc):
+            status = "stopped"
+            break
+        if patience_counter >= EARLY_STOPPING_PATIENCE:
+            status = "plateaued"
+            break
+
+    checkpoint_path = Path(output_dir) / f"trial_{trial:03d}.pth"
+    write_atomic({
+        'epoch': best_epoch,
+        'model_state_dict': best_state,
+        'test_acc': best_acc,
+        'class_names': CLASS_NAMES,
+        'hyperparameters': params,
+        **model_metadata(arch, **model_config),
+    }, checkpoint_path)
+
+    return {
+        "trial": trial,
+        "status": status,
+        "best_acc": round(best_acc, 2),
+        "best_epoch": best_epoch + 1,
+        "epochs_run": len(accuracies),
+        "seconds": round(time.perf_counter() - start, 1),
+        "checkpoint": str(checkpoint_path),
+        **params,
+    }
+
+
+def write_results(results: list, output_dir: Path, param_names: list):
+    """results.csv and results.json, best first."""
+    with open(output_dir / "results.json", "w") as f:
+        json.dump(results, f, indent=2)
+    with open(output_dir / "results.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS + param_names, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def sweep(space: dict = None, num_trials: int = None, num_epochs: int = 10, workers: int = SWEEP_WORKERS,
+          threads_per_trial: int = SWEEP_THREADS_PER_TRIAL, seed: int = SEED, name: str = None,
+          early_stop: bool = True) -> list:
+    """
+    Run a hyperparameter sweep.
+
+    Args:
+        space: Name -> list of choices or (low, high) range (default: DEFAULT_SPACE)
+        num_trials: Random search with this many trials (default: full grid)
+        num_epochs: Maximum epochs per trial
+        workers: Concurrent trials (0 = cores // threads_per_trial)
+        threads_per_trial: Intra-op threads per trial
+        seed: Seed shared by every trial
+        name: Sweep directory name under SWEEP_DIR (default: timestamp)
+        early_stop: Apply the median stopping rule
+
+    Returns:
+        Result rows, best first
+    """
+    space = space or DEFAULT_SPACE
+    trials = random_trials(space, num_trials, seed) if num_trials else grid_trials(space)
+    if "arch" in space:
+        for arch in space["arch"]:
+            if arch not in MODELS:
+                raise ValueError(f"Unknown architecture '{arch}'. Available: {', '.join(MODELS)}")
+
+    output_dir = SWEEP_DIR / (name or time.strftime("%Y%m%d-%H%M%S"))
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    workers = workers or max(1, (os.cpu_count() or 1) // threads_per_trial)
+    workers = min(workers, len(trials))
+
+    print("=" * 60)
+    print("Hyperparameter Sweep")
+    print("=" * 60)
+    print(f"{len(trials)} trials ({'random' if num_trials else 'grid'}), {workers} workers x "
+          f"{threads_per_trial} threads, up to {num_epochs} epochs each")
+    print(f"Output: {output_dir}")
+
+    print("\nPreparing dataset cache...")
+    prepare_data_cache()
+
+    with open(output_dir / "space.json", "w") as f:
+        json.dump({"space": space, "trials": trials, "num_epochs": num_epochs, "seed": seed}, f, indent=2)
+
+    results = []
+    start = time.perf_counter()
+    with Manager() as manager:
+        history = manager.dict()
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(threads_per_trial, seed)
+        ) as pool:
+            futures = {
+                pool.submit(run_trial, trial, params, num_epochs, seed, str(output_dir), history, early_stop): trial
+                for trial, params in enumerate(trials)
+            }
+            for future in as_completed(futures):
+                trial = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"  trial {trial}: failed: {e}")
+                    result = {"trial": trial, "status": "failed", "best_acc": None, **trials[trial]}
+                else:
+                    print(f"  trial {trial}: {result['status']} after {result['epochs_run']} epochs, "
+                          f"best {result['best_acc']:.2f}% ({result['seconds']:.0f}s) {trials[trial]}")
+                results.append(result)
+
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda r: -1 if r["best_acc"] is None else r["best_acc"], reverse=True)
+    param_names = list(space)
+    write_results(results, output_dir, param_names)
+
+    print("\n" + "-" * 72)
+    print(f"{'Trial':<7}{'Status':<11}{'Acc (%)':>9}{'Epochs':>8}  " + "  ".join(param_names))
+    print("-" * 72)
+    for r in results:
+        accuracy = f"{r['best_acc']:.2f}" if r["best_acc"] is not None else "-"
+        values = "  ".join(f"{r[name]:g}" if isinstance(r[name], float) else str(r[name]) for name in param_names)
+        print(f"{r['trial']:<7}{r['status']:<11}{accuracy:>9}{r.get('epochs_run', 0):>8}  {values}")
+    print("-" * 72)
+    print(f"Sweep finished in {elapsed:.0f}s")
+
+    best = results[0] if results and results[0]["best_acc"] is not None else None
+    if best is None:
+        print("\nNo trial finished successfully")
+        return results
+
+    best_path = output_dir / "best.pth"
+    shutil.copyfile(best["checkpoint"], best_path)
+    print(f"\nBest trial {best['trial']}: {best['best_acc']:.2f}% with "
+          f"{ {name: best[name] for name in param_names} }")
+    print(f"Best checkpoint: {best_path}")
+    print(f"Results: {output_dir / 'results.csv'}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parallel hyperparameter sweep")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUES",
+                        help=f"Search dimension, NAME in {', '.join(PARAMS)}; VALUES is "
+                             "V1,V2,... or LO:HI (log-uniform, random search only). Repeatable")
+    parser.add_argument("--trials", type=int, default=None, help="Random search with N trials (default: grid)")
+    parser.add_argument("--epochs", type=int, default=10, help="Maximum epochs per trial")
+    parser.add_argument("--workers", type=int, default=SWEEP_WORKERS, help="Concurrent trials (0 = auto)")
+    parser.add_argument("--threads-per-trial", type=int, default=SWEEP_THREADS_PER_TRIAL)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--name", type=str, default=None, help="Sweep directory name")
+    parser.add_argument("--no-early-stop", action="store_true", help="Disable median stopping")
+    args = parser.parse_args()
+
+    try:
+        space = dict(parse_param(spec) for spec in args.param) or None
+    except ValueError as e:
+        parser.error(str(e))
+    if space and not args.trials and any(isinstance(values, tuple) for values in space.values()):
+        parser.error("LO:HI ranges need random search (--trials N)")
+
+    sweep(space, args.trials, args.epochs, args.workers, args.threads_per_trial,
+          args.seed, args.name, not args.no_early_stop)
@@ -1,5 +1,8 @@
 """Training pipeline for focus detection model."""
 
+import argparse
+import time
+
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -7,64 +10,192 @@ from pathlib import Path
 
 from config import (
     DEVICE, MODEL_DIR, MODEL_PATH, CLASS_NAMES,
-    LEARNING_RATE, WEIGHT_DECAY, NUM_EPOCHS, EARLY_STOPPING_PATIENCE
+    LEARNING_RATE, WEIGHT_DECAY, NUM_EPOCHS, EARLY_STOPPING_PATIENCE,
+    SEED, CHECKPOINT_DIR, CHECKPOINT_EVERY, DISTILL_TEMPERATURE, DISTILL_ALPHA,
 )
-from model import FocusCNN
+from model import MODELS, DEFAULT_MODEL, create_model, get_model, model_metadata
 from dataset import get_dataloaders
+from checkpoint import AsyncCheckpointWriter, rng_state, set_rng_state, seed_epoch
+
+LAST_CHECKPOINT = CHECKPOINT_DIR / "last.pth"
+
+
+class DistillationLoss(nn.Module):
+    """
+    Knowledge distillation loss (Hinton et al.).
+    
+    alpha * T^2 * KL(teacher || student at temperature T) + (1 - alpha) * cross-entropy.
+    
+    Args:
+        temperature: Softmax temperature applied to both logits
+        alpha: Weight of the distillation term
+    """
+    
+    def __init__(self, temperature: float = DISTILL_TEMPERATURE, alpha: float = DISTILL_ALPHA):
+        super().__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+        self.cross_entropy = nn.CrossEntropyLoss()
+    
+    def forward(self, student_logits, labels, teacher_logits):
+        t = self.temperature
+        soft = nn.functional.kl_div(
+            nn.functional.log_softmax(student_logits.float() / t, dim=1),
+            nn.functional.log_softmax(teacher_logits.float() / t, dim=1),
+            reduction='batchmean', log_target=True,
+        )
+        hard = self.cross_entropy(student_logits, labels)
+        return self.alpha * t * t * soft + (1 - self.alpha) * hard
 
 
-def train_epoch(model, loader, criterion, optimizer, device):
-    """Train for one epoch."""
+def bf16_supported(device) -> bool:
+    """Whether bfloat16 autocast is fast on `device` (CUDA or a CPU with native bf16)."""
+    device = torch.device(device)
+    if device.type == 'cuda':
+        return torch.cuda.is_bf16_supported()
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def _to_device(images, labels, device, channels_last: bool):
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    return (
+        images.to(device, memory_format=memory_format, non_blocking=True),
+        labels.to(device, non_blocking=True),
+    )
+
+
+def train_epoch(model, loader, criterion, optimizer, device,
+                channels_last: bool = False, autocast_dtype=None, teacher=None):
+    """
+    Train for one epoch.
+    
+    Loss and accuracy are accumulated on the device and read back once at
+    the end, so the loop never waits for the device between steps.
+    
+    Args:
+        channels_last: Feed images in channels_last memory format
+        autocast_dtype: Run the forward pass under autocast (e.g. torch.bfloat16)
+        teacher: Frozen model whose logits are passed to `criterion` as a
+            third argument (knowledge distillation, see DistillationLoss)
+    
+    Returns:
+        Mean loss, accuracy (%) and the number of samples seen
+    """
     model.train()
-    total_loss = 0.0
-    correct = 0
+    device = torch.device(device)
+    total_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), dtype=torch.long, device=device)
     total = 0
+    batches = 0
     
     for images, labels in loader:
-        images, labels = images.to(device), labels.to(device)
+        images, labels = _to_device(images, labels, device, channels_last)
         
-        optimizer.zero_grad()
-        outputs = model(images)
-        loss = criterion(outputs, labels)
+        optimizer.zero_grad(set_to_none=True)
+        with torch.autocast(device.type, dtype=autocast_dtype, enabled=autocast_dtype is not None):
+            outputs = model(images)
+            if teacher is None:
+                loss = criterion(outputs, labels)
+            else:
+                with torch.no_grad():
+                    teacher_logits = teacher(images)
+                loss = criterion(outputs, labels, teacher_logits)
         loss.backward()
         optimizer.step()
         
-        total_loss += loss.item()
-        _, predicted = outputs.max(1)
+        total_loss += loss.detach()
+        correct += outputs.argmax(1).eq(labels).sum()
         total += labels.size(0)
-        correct += predicted.eq(labels).sum().item()
+        batches += 1
     
-    return total_loss / len(loader), 100.0 * correct / total
+    return total_loss.item() / batches, 100.0 * correct.item() / total, total
 
 
-def evaluate(model, loader, criterion, device):
-    """Evaluate model on test set."""
+def evaluate(model, loader, criterion, device,
+             channels_last: bool = False, autocast_dtype=None):
+    """Evaluate model on test set (metrics accumulated on the device, as in train_epoch)."""
     model.eval()
-    total_loss = 0.0
-    correct = 0
+    device = torch.device(device)
+    total_loss = torch.zeros((), device=device)
+    correct = torch.zeros((), dtype=torch.long, device=device)
     total = 0
+    batches = 0
     
     with torch.no_grad():
         for images, labels in loader:
-            images, labels = images.to(device), labels.to(device)
-            outputs = model(images)
-            loss = criterion(outputs, labels)
+            images, labels = _to_device(images, labels, device, channels_last)
+            with torch.autocast(device.type, dtype=autocast_dtype, enabled=autocast_dtype is not None):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
             
-            total_loss += loss.item()
-            _, predicted = outputs.max(1)
+            total_loss += loss.float()
+            correct += outputs.argmax(1).eq(labels).sum()
             total += labels.size(0)
-            correct += predicted.eq(labels).sum().item()
+            batches += 1
     
-    return total_loss / len(loader), 100.0 * correct / total
+    return total_loss.item() / batches, 100.0 * correct.item() / total
+
+
+def last_checkpoint_path(output_path) -> Path:
+    """Training-state checkpoint that belongs to a run saving its best model to `output_path`."""
+    if Path(output_path) == MODEL_PATH:
+        return LAST_CHECKPOINT
+    return CHECKPOINT_DIR / f"{Path(output_path).stem}.last.pth"
 
 
-def train():
-    """Main training function."""
+def train(fast: bool = False, channels_last: bool = None, bf16: bool = None, compile_model: bool = None,
+          num_epochs: int = NUM_EPOCHS, resume: str = None, seed: int = SEED,
+          arch: str = DEFAULT_MODEL, teacher_path: str = None, output_path: str = None):
+    """
+    Main training function.
+    
+    Args:
+        fast: Enable every throughput option below that the device supports
+        channels_last: Use channels_last memory format for the model and inputs
+        bf16: bfloat16 autocast (ignored where bf16 is not natively supported)
+        compile_model: Compile the model with torch.compile
+        num_epochs: Maximum epochs
+        resume: Training checkpoint to continue from ('latest' = this run's
+            last_checkpoint_path)
+        seed: Base seed; each epoch is seeded from (seed, epoch)
+        arch: Architecture from model.MODELS
+        teacher_path: Trained checkpoint to distill from (see DistillationLoss)
+        output_path: Where the best model is saved (default: MODEL_PATH for
+            focus_cnn, models/focus_detector_<arch>.pth otherwise)
+    """
+    if output_path is None:
+        if arch == DEFAULT_MODEL and not teacher_path:
+            output_path = MODEL_PATH
+        else:
+            output_path = MODEL_DIR / f"focus_detector_{arch}.pth"
+    output_path = Path(output_path)
+    checkpoint_path = last_checkpoint_path(output_path)
+    if resume == 'latest':
+        resume = checkpoint_path
+    
+    checkpoint = None
+    if resume:
+        checkpoint = torch.load(resume, map_location="cpu", weights_only=False)
+        arch = checkpoint.get('model_name', DEFAULT_MODEL)
+
+    channels_last = fast if channels_last is None else channels_last
+    bf16 = fast if bf16 is None else bf16
+    compile_model = fast if compile_model is None else compile_model
+    
     print("=" * 60)
     print("Focus Detection Model Training")
     print("=" * 60)
     print(f"Device: {DEVICE}")
     
+    if bf16 and not bf16_supported(DEVICE):
+        print("bf16 autocast: not supported on this device, using fp32")
+        bf16 = False
+    autocast_dtype = torch.bfloat16 if bf16 else None
+    print(f"channels_last: {channels_last}, bf16 autocast: {bf16}, torch.compile: {compile_model}")
+    
     # Create directories
     MODEL_DIR.mkdir(parents=True, exist_ok=True)
     
@@ -73,14 +204,31 @@ def train():
     train_loader, test_loader = get_dataloaders()
     
     # Create model
-    print("\nInitializing model...")
-    model = FocusCNN(num_classes=len(CLASS_NAMES)).to(DEVICE)
+    print(f"\nInitializing model ({arch})...")
+    model = create_model(arch, num_classes=len(CLASS_NAMES)).to(DEVICE)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    metadata = model_metadata(arch)
     
     total_params = sum(p.numel() for p in model.parameters())
     print(f"Total parameters: {total_params:,}")
     
+    teacher = None
+    if teacher_path:
+        teacher = get_model(len(CLASS_NAMES), pretrained_path=teacher_path).to(DEVICE).eval()
+        if channels_last:
+            teacher = teacher.to(memory_format=torch.channels_last)
+        for param in teacher.parameters():
+            param.requires_grad_(False)
+        teacher_params = sum(p.numel() for p in teacher.parameters())
+        print(f"Distilling from {teacher_path} ({teacher_params:,} parameters)")
+    
+    # Compiled wrapper for the loops; `model` keeps the plain state_dict keys
+    run_model = torch.compile(model) if compile_model else model
+    
     # Loss and optimizer
     criterion = nn.CrossEntropyLoss()
+    train_criterion = DistillationLoss() if teacher is not None else criterion
     optimizer = optim.AdamW(
         model.parameters(), 
         lr=LEARNING_RATE, 
@@ -90,53 +238,113 @@ def train():
         optimizer, mode='max', factor=0.5, patience=3
     )
     
-    # Training loop
-    print("\nStarting training...")
-    print("-" * 60)
-    print(f"{'Epoch':<8}{'Train Loss':<14}{'Train Acc':<12}{'Test Loss':<14}{'Test Acc'}")
-    print("-" * 60)
-    
     best_acc = 0.0
     patience_counter = 0
+    start_epoch = 0
+    
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint['model_state_dict'])
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
+        best_acc = checkpoint['best_acc']
+        patience_counter = checkpoint['patience_counter']
+        start_epoch = checkpoint['epoch'] + 1
+        seed = checkpoint['seed']
+        set_rng_state(checkpoint['rng_state'])
+        print(f"\nResumed from {resume} (epoch {start_epoch}, best accuracy {best_acc:.2f}%)")
+        if patience_counter >= EARLY_STOPPING_PATIENCE:
+            print("Run had already stopped early; nothing to resume")
+            start_epoch = num_epochs
     
-    for epoch in range(NUM_EPOCHS):
-        train_loss, train_acc = train_epoch(
-            model, train_loader, criterion, optimizer, DEVICE
+    # Checkpoints are serialized and written on a background thread
+    writer = AsyncCheckpointWriter()
+    
+    # Training loop
+    print("\nStarting training...")
+    print("-" * 72)
+    print(f"{'Epoch':<8}{'Train Loss':<14}{'Train Acc':<12}{'Test Loss':<14}{'Test Acc':<12}{'Images/s'}")
+    print("-" * 72)
+    
+    for epoch in range(start_epoch, num_epochs):
+        seed_epoch(seed, epoch)
+        start = time.perf_counter()
+        train_loss, train_acc, num_train = train_epoch(
+            run_model, train_loader, train_criterion, optimizer, DEVICE,
+            channels_last=channels_last, autocast_dtype=autocast_dtype, teacher=teacher,
         )
+        images_per_sec = num_train / (time.perf_counter() - start)
         test_loss, test_acc = evaluate(
-            model, test_loader, criterion, DEVICE
+            run_model, test_loader, criterion, DEVICE,
+            channels_last=channels_last, autocast_dtype=autocast_dtype,
         )
         
         scheduler.step(test_acc)
         
-        print(f"{epoch+1:<8}{train_loss:<14.4f}{train_acc:<12.2f}{test_loss:<14.4f}{test_acc:.2f}")
+        print(f"{epoch+1:<8}{train_loss:<14.4f}{train_acc:<12.2f}{test_loss:<14.4f}{test_acc:<12.2f}"
+              f"{images_per_sec:.0f}")
         
         # Save best model
         if test_acc > best_acc:
             best_acc = test_acc
             patience_counter = 0
             
-            torch.save({
+            writer.save({
                 'epoch': epoch,
                 'model_state_dict': model.state_dict(),
                 'optimizer_state_dict': optimizer.state_dict(),
                 'train_acc': train_acc,
                 'test_acc': test_acc,
                 'class_names': CLASS_NAMES,
-            }, MODEL_PATH)
+                **metadata,
+            }, output_path)
         else:
             patience_counter += 1
         
+        # Full training state for --resume
+        if (epoch + 1) % CHECKPOINT_EVERY == 0:
+            writer.save({
+                'epoch': epoch,
+                'model_state_dict': model.state_dict(),
+                'optimizer_state_dict': optimizer.state_dict(),
+                'scheduler_state_dict': scheduler.state_dict(),
+                'best_acc': best_acc,
+                'patience_counter': patience_counter,
+                'seed': seed,
+                'rng_state': rng_state(),
+                'class_names': CLASS_NAMES,
+                **metadata,
+            }, checkpoint_path)
+        
         # Early stopping
         if patience_counter >= EARLY_STOPPING_PATIENCE:
             print(f"\nEarly stopping at epoch {epoch+1}")
             break
     
-    print("-" * 60)
+    writer.close()
+    
+    print("-" * 72)
     print(f"\nTraining complete!")
     print(f"Best test accuracy: {best_acc:.2f}%")
-    print(f"Model saved to: {MODEL_PATH}")
+    print(f"Model saved to: {output_path}")
 
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Train the focus detection model")
+    parser.add_argument("--fast", action="store_true",
+                        help="channels_last + bf16 autocast (if supported) + torch.compile")
+    parser.add_argument("--channels-last", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--bf16", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--compile", action=argparse.BooleanOptionalAction, default=None)
+    parser.add_argument("--epochs", type=int, default=NUM_EPOCHS)
+    parser.add_argument("--resume", nargs="?", const="latest", default=None,
+                        help=f"Continue from a training checkpoint (default: this run's latest, "
+                             f"{LAST_CHECKPOINT} for focus_cnn)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--arch", choices=sorted(MODELS), default=DEFAULT_MODEL)
+    parser.add_argument("--teacher", type=str, default=None,
+                        help="Trained checkpoint to distill from (e.g. models/focus_detector.pth)")
+    parser.add_argument("--output", type=str, default=None, help="Best model path")
+    args = parser.parse_args()
+    
+    train(args.fast, args.channels_last, args.bf16, args.compile, args.epochs, args.resume, args.seed,
+          args.arch, args.teacher, args.output)